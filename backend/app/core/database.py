@@ -45,6 +45,10 @@ engine = create_async_engine(
     connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
 )
 
+# Values per IN (...) list; longer lists are sent in chunks to stay under driver
+# parameter limits (SQLite's bound-variable cap, asyncpg's argument count)
+IN_CLAUSE_CHUNK = 500
+
 # Session factory
 SessionLocal = async_sessionmaker(
     bind=engine, 
@@ -66,7 +70,7 @@ async def get_db():
 
 # Initialize DB (create tables)
 # Import models to ensure they are registered
-from ..models import User, PortfolioSnapshot, ISINMapping
+from ..models import User, PortfolioSnapshot, ISINMapping, StoredTransaction, SchemeMetadata
 
 async def init_db():
     async with engine.begin() as conn:
@@ -3,15 +3,26 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .core.database import init_db
-from .routers import auth, portfolio
+from .services.pdf_text import shutdown_pool
+from .services.http_client import start_http_client, close_http_client
+from .services.amfi_master import start_amfi_master, stop_amfi_master
+from .services.isin_mapping_store import mapping_buffer, metadata_buffer
+from .routers import auth, portfolio, schemes
 from .middleware.auth_middleware import AuthMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
+    await start_http_client()
+    await start_amfi_master()
     yield
     # Shutdown
+    await stop_amfi_master()
+    await mapping_buffer.close()
+    await metadata_buffer.close()
+    await close_http_client()
+    shutdown_pool()
 
 app = FastAPI(
     title="WealthTrack API",
@@ -39,6 +50,7 @@ app.add_middleware(AuthMiddleware)
 # Routers
 app.include_router(auth.router)
 app.include_router(portfolio.router)
+app.include_router(schemes.router)
 
 @app.get("/")
 def read_root():
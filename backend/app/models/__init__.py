@@ -1,3 +1,5 @@
 from .user import User
 from .portfolio import PortfolioSnapshot
-from .isin_mapping import ISINMapping
\ No newline at end of file
+from .isin_mapping import ISINMapping
+from .transaction import StoredTransaction
+from .scheme_metadata import SchemeMetadata
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+class SchemeMetadata(Base):
+    """Per-ISIN scheme classification, so asset allocation needs no NAV downloads."""
+    __tablename__ = "scheme_metadata"
+
+    isin = Column(String, primary_key=True, index=True)
+    scheme_code = Column(String, index=True)
+    category = Column(String)  # AMFI / mfapi scheme category, e.g. "Equity Scheme - Flexi Cap Fund"
+    asset_class = Column(String)  # classify_fund_category(category)
+    amc = Column(String)
+    plan = Column(String)  # Direct / Regular
+    option = Column(String)  # Growth / IDCW / Bonus
+    benchmark = Column(String)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
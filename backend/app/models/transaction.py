@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+class StoredTransaction(Base):
+    """
+    One statement item a user has already uploaded (incremental ingestion).
+
+    Transactions are keyed by a fingerprint of (folio, isin, date, amount,
+    raw_desc) and their occurrence within the statement, so re-uploaded
+    history is recognised and skipped while identical same-day items are kept. Holding and
+    portfolio-summary rows are statement state: they are replaced by the
+    latest upload rather than accumulated.
+    """
+    __tablename__ = "user_transactions"
+    __table_args__ = (UniqueConstraint("user_id", "fingerprint", name="uq_user_transaction_fingerprint"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    fingerprint = Column(String(40), nullable=False)
+    date = Column(DateTime)  # Null for holdings ('Current') and summaries
+    description = Column(String)
+    isin = Column(String, index=True)
+    folio = Column(String)
+    amount = Column(Float)
+    current_value = Column(Float)
+    type = Column(String)
+    raw_desc = Column(String)
+    units = Column(Float)  # Signed: purchases +, redemptions -
+    nav = Column(Float)
+    unit_balance = Column(Float)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,20 +1,24 @@
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form
+from typing import List
 from fastapi.responses import JSONResponse
 import pandas as pd
-import io
 import os
-import tempfile
 import numpy as np  # Added for NaN handling
-from ..services.pdf_parser import parse_cam_pdf
-from ..services.portfolio_service import analyze_portfolio
+import asyncio
+from ..services.pdf_parser import iter_cam_pdf
+from ..services.excel_parser import read_excel_statement
+from ..services.transactions import to_transaction_frame, merge_statements
+from ..services.pdf_text import PDF_PARSE_WORKERS, get_pool
+from ..services.portfolio_service import analyze_portfolio, prefetch_scheme_data
+from ..services.analysis_cache import analysis_cache, analysis_key, combine_keys
+from ..services.ingestion import ingest_statement, load_history, reusable_schemes
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 from ..core.database import get_db
 from ..models import PortfolioSnapshot, User
 import datetime
 import math
-from starlette.concurrency import run_in_threadpool
 
 def clean_nans(obj):
     if isinstance(obj, float):
@@ -32,6 +36,9 @@ def clean_nans(obj):
         return float(obj)
     return obj
 
+# Larger PDF uploads are parsed from Starlette's spooled temp file instead of memory
+PDF_IN_MEMORY_MAX_BYTES = int(os.getenv("PDF_IN_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
+
 router = APIRouter(
     prefix="/portfolio",
     tags=["Portfolio"],
@@ -41,70 +48,199 @@ router = APIRouter(
 
 from ..core.deps import get_current_user
 
+async def _parse_upload(source, is_pdf: bool, password: str = None, stats: dict = None,
+                        pooled: bool = False, workers: int = None) -> pd.DataFrame:
+    """
+    Parse an uploaded statement into an item DataFrame (page / skipped-page counts go into `stats`).
+    With `pooled`, the CPU-bound work runs in the extraction process pool.
+    """
+    if is_pdf:
+        data = []
+        # Stream items page by page; start resolving each new scheme
+        # (ISIN + NAV history) while later pages are still being read
+        prefetches = {}
+        try:
+            async for page_items in iter_cam_pdf(source, password, workers=workers, stats=stats, pooled=pooled):
+                data.extend(page_items)
+                for item in page_items:
+                    isin = item.get('isin')
+                    if isin and isin not in prefetches:
+                        prefetches[isin] = asyncio.create_task(prefetch_scheme_data(isin))
+            await asyncio.gather(*prefetches.values())
+        except ValueError as ve:
+            for task in prefetches.values():
+                task.cancel()
+            raise HTTPException(status_code=400, detail=str(ve))
+        df = pd.DataFrame(data)
+            
+    elif pooled and isinstance(source, bytes):
+        # Excel: streamed row by row and mapped onto the item schema
+        df = await asyncio.get_running_loop().run_in_executor(get_pool(), read_excel_statement, source)
+    else:
+        df = await asyncio.to_thread(read_excel_statement, source)
+        
+    if df.empty:
+         raise HTTPException(status_code=400, detail="Could not extract any transactions.")
+    # Dates, amounts and categories are typed once here; analysis never re-parses them
+    return to_transaction_frame(df)
+
+async def _parse_uploads(uploads: list, password: str = None, stats: dict = None) -> pd.DataFrame:
+    """
+    Parse one or more statements into a single frame. Several statements are
+    parsed concurrently, one pool worker each (so latency tracks the slowest
+    file, not the sum), then merged into one consolidated portfolio.
+    """
+    if len(uploads) == 1:
+        upload = uploads[0]
+        return await _parse_upload(upload["source"], upload["is_pdf"], password, stats)
+
+    workers = max(1, PDF_PARSE_WORKERS // len(uploads))
+    file_stats = [{"filename": upload["filename"]} for upload in uploads]
+
+    async def parse_one(upload, upload_stats):
+        try:
+            return await _parse_upload(upload["source"], upload["is_pdf"], password, upload_stats,
+                                       pooled=True, workers=workers)
+        except HTTPException as he:
+            raise HTTPException(status_code=he.status_code, detail=f"{upload['filename']}: {he.detail}")
+
+    frames = await asyncio.gather(*(parse_one(u, st) for u, st in zip(uploads, file_stats)))
+    df, duplicates = merge_statements(frames)
+    print(f"DEBUG: Merged {len(uploads)} statements: {len(df)} items, {duplicates} duplicates dropped")
+    if stats is not None:
+        stats.update(files=file_stats, duplicates_dropped=duplicates)
+    return df
+
+async def _analyze_upload(uploads: list, password: str = None) -> dict:
+    parse_stats = {}
+    df = await _parse_uploads(uploads, password, parse_stats)
+
+    # 2. Analyze (Async lookups handled within)
+    result = await analyze_portfolio(df)
+    result["parse_stats"] = parse_stats
+    
+    # Clean NaNs
+    return clean_nans(result)
+
+async def _get_or_create_user(db: AsyncSession, email: str) -> User:
+    res = await db.execute(select(User).filter(User.email == email))
+    user = res.scalars().first()
+    
+    if not user:
+        # Fallback: Auto-create user if auth sync failed
+        # We assume email is valid since it came from Auth session
+        user = User(
+            email=email, 
+            name=email.split('@')[0], # Fallback name
+            created_at=datetime.datetime.now()
+        )
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+    return user
+
+async def _latest_ingested_snapshot(db: AsyncSession, user_id: int):
+    """
+    Newest snapshot written by incremental mode (its data carries ingest_stats).
+    Snapshots of plain uploads analyse whatever statement was uploaded, not the
+    stored history, so they are never a base for reuse.
+    """
+    res = await db.execute(
+        select(PortfolioSnapshot)
+        .filter(PortfolioSnapshot.user_id == user_id,
+                PortfolioSnapshot.data["ingest_stats"].as_string().isnot(None))
+        .order_by(desc(PortfolioSnapshot.upload_date), desc(PortfolioSnapshot.id))
+        .limit(1)
+    )
+    return res.scalars().first()
+
+async def _ingest_upload(db: AsyncSession, user: User, uploads: list, password: str = None):
+    """
+    Incremental mode: store only the items the user has not uploaded before and
+    re-analyse only the schemes they touch. Returns (result, changed).
+    """
+    parse_stats = {}
+    df = await _parse_uploads(uploads, password, parse_stats)
+    ingest_stats = await ingest_statement(db, user.id, df)
+
+    previous = await _latest_ingested_snapshot(db, user.id)
+    changed = previous is None or not previous.data or bool(ingest_stats["affected_schemes"]) \
+        or ingest_stats["new_items"] or ingest_stats["replaced_items"]
+    if changed:
+        history = await load_history(db, user.id)
+        reuse = reusable_schemes(previous.data if previous else None, ingest_stats["affected_schemes"])
+        result = await analyze_portfolio(history, reuse=reuse)
+    else:
+        # Nothing new since the last upload
+        result = dict(previous.data)
+    result["parse_stats"] = parse_stats
+    result["ingest_stats"] = ingest_stats
+    return clean_nans(result), changed
+
 @router.post("/analyze")
 async def analyze_report(
-    file: UploadFile = File(...),
+    file: UploadFile = File(None),
+    files: List[UploadFile] = File(None),
     password: str = Form(None), 
+    incremental: bool = Form(False),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user) # <--- SECURE: Verifies JWT Token
 ):
     email = user.email
 
-    if not file.filename.lower().endswith(('.pdf', '.xls', '.xlsx')):
-        raise HTTPException(status_code=400, detail="Invalid file format. Please upload PDF or Excel.")
+    # `file` (single statement) is kept for existing clients; `files` takes several
+    # statements (e.g. a CAMS and a KFintech CAS) analysed as one portfolio
+    upload_files = ([file] if file else []) + list(files or [])
+    if not upload_files:
+        raise HTTPException(status_code=400, detail="No file uploaded.")
+    for upload_file in upload_files:
+        if not upload_file.filename.lower().endswith(('.pdf', '.xls', '.xlsx')):
+            raise HTTPException(status_code=400, detail="Invalid file format. Please upload PDF or Excel.")
 
     # 1. Parse content
-    contents = await file.read()
+    # PDFs go to the parser straight from memory (no temp file). Very large
+    # uploads are already spooled to disk by Starlette, so parse from that file.
+    uploads = []
+    for upload_file in upload_files:
+        is_pdf = upload_file.filename.lower().endswith('.pdf')
+        if is_pdf and (upload_file.size or 0) > PDF_IN_MEMORY_MAX_BYTES:
+            await upload_file.seek(0)
+            source = upload_file.file
+        else:
+            source = await upload_file.read()
+        uploads.append({"source": source, "is_pdf": is_pdf, "filename": upload_file.filename})
     
     try:
-        data = []
-        if file.filename.lower().endswith('.pdf'):
-            # Save properly to temp file for pdfplumber
-            import tempfile
-            import os
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                tmp.write(contents)
-                tmp_path = tmp.name
-            
-            try:
-                data = await parse_cam_pdf(tmp_path, password)
-            except ValueError as ve:
-                raise HTTPException(status_code=400, detail=str(ve))
-            finally:
-                os.unlink(tmp_path)
-                
-        else:
-            # Excel
-            df = pd.read_excel(io.BytesIO(contents))
-            data = df.to_dict(orient='records')
-            
-        if not data:
-             raise HTTPException(status_code=400, detail="Could not extract any transactions.")
+        if incremental:
+            user = await _get_or_create_user(db, email)
+            result, changed = await _ingest_upload(db, user, uploads, password)
+            if changed:
+                db.add(PortfolioSnapshot(
+                    user_id=user.id,
+                    total_value=result.get("current_valuation", 0),
+                    total_invested=result.get("total_investment", 0),
+                    xirr=result.get("xirr", 0),
+                    data=result
+                ))
+                await db.commit()
+            return JSONResponse(content=result)
 
-        # 2. Analyze (Async lookups handled within)
-        df = pd.DataFrame(data)
-        result = await analyze_portfolio(df)
-        
-        # Clean NaNs
-        result = clean_nans(result)
+        # Identical uploads (same bytes, password, algorithm version and
+        # market-data date) reuse the cached result / in-flight computation
+        keys = [
+            await asyncio.to_thread(analysis_key, u["source"], u["filename"], password)
+            for u in uploads
+        ]
+        key = keys[0] if len(keys) == 1 else combine_keys(keys)
+        result, cached = await analysis_cache.get_or_compute(
+            key, lambda: _analyze_upload(uploads, password)
+        )
+        if cached:
+            print(f"DEBUG: Analysis cache hit ({analysis_cache.stats()})")
 
         # 3. Save to DB
         # Find user
-        res = await db.execute(select(User).filter(User.email == email))
-        user = res.scalars().first()
-        
-        if not user:
-            # Fallback: Auto-create user if auth sync failed
-            # We assume email is valid since it came from Auth session
-            user = User(
-                email=email, 
-                name=email.split('@')[0], # Fallback name
-                created_at=datetime.datetime.now()
-            )
-            db.add(user)
-            await db.commit()
-            await db.refresh(user)
+        user = await _get_or_create_user(db, email)
 
         if user:
             # Save Snapshot
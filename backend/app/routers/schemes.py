@@ -0,0 +1,16 @@
+import asyncio
+from fastapi import APIRouter, Query
+from ..services.scheme_search import search_schemes, scheme_search_ready, get_scheme_search_index
+
+router = APIRouter(
+    prefix="/schemes",
+    tags=["Schemes"],
+)
+
+@router.get("/search")
+async def search(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(10, ge=1, le=50)):
+    """Autocomplete over the AMFI scheme universe: ranked matches with ISIN, code, category and plan."""
+    if not scheme_search_ready():
+        # First use before startup finished building it: build off the event loop
+        await asyncio.to_thread(get_scheme_search_index)
+    return {"query": q, "results": search_schemes(q, limit)}
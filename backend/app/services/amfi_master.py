@@ -0,0 +1,293 @@
+"""
+Locally persisted AMFI scheme master (ISIN -> scheme code, name, category, plan, AMC).
+
+The master lives in a small SQLite file (AMFI_MASTER_PATH) so it survives
+restarts: opening it at startup takes milliseconds and lookups are indexed
+reads with no network call. A fresh deploy with no file is seeded from the
+bundled snapshot (data/amfi_master_seed.tsv.gz). A background task refreshes
+the master from AMFI's NAVAll.txt on a schedule; the new index is written to a
+temporary file and swapped in atomically, so lookups never wait on a refresh.
+
+Regenerate the bundled snapshot (needs network access):
+    cd backend && python -m app.services.amfi_master refresh
+    cd backend && python -m app.services.amfi_master export-seed
+"""
+import asyncio
+import csv
+import gzip
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from ..core.database import IN_CLAUSE_CHUNK
+from .http_client import http_get_lines
+
+AMFI_NAV_URL = "https://www.amfiindia.com/spages/NAVAll.txt"
+AMFI_MASTER_PATH = os.getenv("AMFI_MASTER_PATH", "./amfi_master.db")
+AMFI_MASTER_SEED_PATH = os.getenv(
+    "AMFI_MASTER_SEED_PATH", str(Path(__file__).resolve().parent.parent / "data" / "amfi_master_seed.tsv.gz")
+)
+AMFI_MASTER_REFRESH_HOURS = float(os.getenv("AMFI_MASTER_REFRESH_HOURS", "24"))
+# "0" disables the background refresh (the index is then only seeded / refreshed by hand)
+AMFI_MASTER_REFRESH = os.getenv("AMFI_MASTER_REFRESH", "1") not in ("0", "false", "no", "off")
+
+FIELDS = ("isin", "code", "name", "category", "plan", "amc")
+
+# "Open Ended Schemes(Equity Scheme - Flexi Cap Fund)"
+_SECTION_RE = re.compile(r'^\s*((?:Open|Close|Interval)\s*Ended\s*Schemes)\s*\((.*)\)\s*$', re.IGNORECASE)
+_ISIN_RE = re.compile(r'^INF\w{9}$')
+
+
+def scheme_plan(name: str) -> str:
+    lower = (name or "").lower()
+    if "direct" in lower:
+        return "Direct"
+    if "regular" in lower:
+        return "Regular"
+    return ""
+
+
+def scheme_option(name: str) -> str:
+    lower = (name or "").lower()
+    if "growth" in lower:
+        return "Growth"
+    if "idcw" in lower or "dividend" in lower:
+        return "IDCW"
+    if "bonus" in lower:
+        return "Bonus"
+    return ""
+
+
+def parse_navall(lines):
+    """Yield (isin, code, name, category, plan, amc) rows from NAVAll.txt lines."""
+    category = amc = ""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        parts = line.split(';')
+        if len(parts) < 4:
+            section = _SECTION_RE.match(line)
+            if section:
+                category = section.group(2).strip()
+            else:
+                amc = line  # AMC name line heading its schemes
+            continue
+        code, name = parts[0].strip(), parts[3].strip()
+        if not code.isdigit():
+            continue  # Column header row
+        for col in (1, 2):
+            isin = parts[col].strip()
+            if _ISIN_RE.match(isin):
+                yield isin, code, name, category, scheme_plan(name), amc
+
+
+def _create(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schemes ("
+                 "isin TEXT PRIMARY KEY, code TEXT, name TEXT, category TEXT, plan TEXT, amc TEXT) WITHOUT ROWID")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+
+def _current_schema(path: str) -> bool:
+    conn = sqlite3.connect(path)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(schemes)")]
+    finally:
+        conn.close()
+    return not columns or tuple(columns) == FIELDS
+
+
+def write_index(path: str, rows, source: str, fetched_at: float = None) -> int:
+    """Build a complete index file at `path` (replacing it atomically). Returns the row count."""
+    tmp = f"{path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        _create(conn)
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO schemes VALUES (?, ?, ?, ?, ?, ?)", rows)
+            count = conn.execute("SELECT COUNT(*) FROM schemes").fetchone()[0]
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ("fetched_at", str(time.time() if fetched_at is None else fetched_at)), ("source", source),
+            ])
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return count
+
+
+def read_seed(path: str):
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f, delimiter="\t"):
+            if row and row[0] != "isin":
+                yield tuple((row + [""] * len(FIELDS))[:len(FIELDS)])  # Older snapshots lack trailing columns
+
+
+class AmfiMaster:
+    def __init__(self, path: str = AMFI_MASTER_PATH, seed_path: str = AMFI_MASTER_SEED_PATH):
+        self.path = path
+        self.seed_path = seed_path
+        self._conn = None
+        self._lock = threading.Lock()
+        self.fetched_at = 0.0
+        self.source = ""
+        self.count = 0
+        self.refreshes = 0
+        self.listeners = []  # Callables run after every (re)load
+
+    def open(self):
+        """Open the on-disk index, seeding it from the bundled snapshot if there is none."""
+        started = time.perf_counter()
+        if os.path.exists(self.path) and not _current_schema(self.path):
+            os.remove(self.path)  # Written by an older version; re-seed and let the refresh rebuild it
+        if not os.path.exists(self.path) and os.path.exists(self.seed_path):
+            count = write_index(self.path, read_seed(self.seed_path), "seed", fetched_at=0.0)
+            print(f"DEBUG: AMFI master seeded from {self.seed_path} ({count} ISINs)")
+        self._load()
+        print(f"DEBUG: AMFI master loaded: {self.count} ISINs from {self.source or 'nothing'} "
+              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def _load(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        _create(conn)
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        count = conn.execute("SELECT COUNT(*) FROM schemes").fetchone()[0]
+        with self._lock:
+            old, self._conn = self._conn, conn
+            self.fetched_at = float(meta.get("fetched_at") or 0)
+            self.source = meta.get("source", "")
+            self.count = count
+        if old is not None:
+            old.close()
+        for listener in self.listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"DEBUG: AMFI master listener failed: {e}")
+
+    def _ensure_open(self):
+        if self._conn is None:
+            self.open()
+
+    def lookup_many(self, isins) -> dict:
+        """{isin: {"name", "code", "category", "plan", "amc"}} for the ISINs the master knows."""
+        isins = [i for i in isins if i]
+        if not isins:
+            return {}
+        self._ensure_open()
+        found = {}
+        with self._lock:
+            for start in range(0, len(isins), IN_CLAUSE_CHUNK):
+                chunk = isins[start:start + IN_CLAUSE_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT isin, code, name, category, plan, amc FROM schemes WHERE isin IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for isin, code, name, category, plan, amc in rows:
+                    found[isin] = {"name": name, "code": code, "category": category, "plan": plan, "amc": amc}
+        return found
+
+    def lookup(self, isin: str) -> dict:
+        return self.lookup_many([isin]).get(isin)
+
+    def rows(self):
+        """Every (isin, code, name, category, plan, amc) row, in ISIN order."""
+        self._ensure_open()
+        with self._lock:
+            return self._conn.execute("SELECT isin, code, name, category, plan, amc FROM schemes ORDER BY isin").fetchall()
+
+    def age_seconds(self) -> float:
+        return time.time() - self.fetched_at if self.fetched_at else float("inf")
+
+    def is_stale(self) -> bool:
+        return self.age_seconds() > AMFI_MASTER_REFRESH_HOURS * 3600
+
+    async def refresh(self) -> int:
+        """Download NAVAll.txt and swap in a new index. Returns the ISIN count (0 if the download failed)."""
+        lines = []
+        try:
+            async for line in http_get_lines(AMFI_NAV_URL, timeout=60):
+                lines.append(line)
+        except Exception as e:
+            print(f"DEBUG: AMFI master refresh failed: {e}")
+            return 0
+        rows = list(parse_navall(lines))
+        if not rows:
+            print("DEBUG: AMFI master refresh returned no schemes; keeping the current index")
+            return 0
+        count = await asyncio.to_thread(write_index, self.path, rows, AMFI_NAV_URL)
+        await asyncio.to_thread(self._load)
+        self.refreshes += 1
+        print(f"DEBUG: AMFI master refreshed ({count} ISINs)")
+        return count
+
+    def export_seed(self, path: str = None) -> int:
+        """Write the current index as the bundled snapshot (gzip TSV)."""
+        path = path or self.seed_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        rows = self.rows()
+        with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+            writer.writerow(FIELDS)
+            writer.writerows(rows)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "isins": self.count,
+            "source": self.source,
+            "age_hours": round(self.age_seconds() / 3600, 1) if self.fetched_at else None,
+            "refreshes": self.refreshes,
+        }
+
+
+amfi_master = AmfiMaster()
+
+
+async def run_refresher(interval_hours: float = AMFI_MASTER_REFRESH_HOURS):
+    """Background task: refresh the master whenever it is older than the interval."""
+    retry_seconds = 15 * 60
+    while True:
+        if amfi_master.is_stale():
+            count = await amfi_master.refresh()
+            await asyncio.sleep(interval_hours * 3600 if count else retry_seconds)
+        else:
+            remaining = interval_hours * 3600 - amfi_master.age_seconds()
+            await asyncio.sleep(max(remaining, 60))
+
+
+_refresher_task = None
+
+
+async def start_amfi_master():
+    """Open the index (seeding it if needed) and start the scheduled refresh."""
+    global _refresher_task
+    await asyncio.to_thread(amfi_master.open)
+    if AMFI_MASTER_REFRESH and _refresher_task is None:
+        _refresher_task = asyncio.create_task(run_refresher())
+
+
+async def stop_amfi_master():
+    global _refresher_task
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+        try:
+            await _refresher_task
+        except asyncio.CancelledError:
+            pass
+        _refresher_task = None
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "refresh":
+        print(f"{asyncio.run(amfi_master.refresh())} ISINs")
+    elif command == "export-seed":
+        print(f"Wrote {amfi_master.export_seed()} ISINs to {amfi_master.seed_path}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,154 @@
+"""
+Content-addressed cache for /portfolio/analyze results.
+
+Results are keyed by a hash of the uploaded bytes, the statement password, the
+analysis algorithm version and the market-data as-of date, so a re-upload of
+the same statement on the same day skips parsing, ISIN/NAV lookups, analytics
+and growth reconstruction. Concurrent identical uploads share one in-flight
+computation; if the request running it is cancelled (client gone), a waiting
+request recomputes from its own upload instead of failing. Entries are evicted
+LRU-first once the entry count or the approximate size budget is exceeded, and
+expire after a TTL.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from datetime import date
+
+# Bump whenever parsing or analysis output changes, so stale results are never served
+ANALYSIS_VERSION = "8"
+
+# In-flight result telling waiters the computing request was cancelled and they should retry
+_LEADER_CANCELLED = object()
+
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "128"))
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(6 * 3600)))
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def analysis_key(source, filename: str, password: str = None, as_of: date = None) -> str:
+    """
+    Cache key for an upload. `source` is the upload bytes or a seekable file object.
+
+    The password is part of the key so a cached result for an encrypted
+    statement is never served to someone who cannot open it.
+    """
+    h = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        h.update(source)
+    else:
+        source.seek(0)
+        for chunk in iter(lambda: source.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+        source.seek(0)
+    h.update(b"\0" + os.path.splitext(filename or "")[1].lower().encode())
+    h.update(b"\0" + hashlib.sha256((password or "").encode()).digest())
+    h.update(b"\0" + ANALYSIS_VERSION.encode())
+    h.update(b"\0" + (as_of or date.today()).isoformat().encode())
+    return h.hexdigest()
+
+
+def combine_keys(keys: list) -> str:
+    """Key for a multi-statement upload, from the per-file keys (in upload order)."""
+    return hashlib.sha256("\0".join(keys).encode()).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, size, result)
+        self._inflight = {}  # key -> asyncio.Future
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # Callers served by another request's in-flight computation
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, size, result = entry
+        if expires_at < time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: dict):
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, size, result)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    async def get_or_compute(self, key: str, compute):
+        """
+        Return (result, cached) for `key`, running `compute()` at most once per
+        key at a time. `cached` is True when no new computation was run.
+        """
+        while True:
+            result = self.get(key)
+            if result is not None:
+                self.hits += 1
+                return result, True
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.shared += 1
+            result = await asyncio.shield(inflight)
+            if result is not _LEADER_CANCELLED:
+                return result, True
+            # The computing request went away: retry, one waiter recomputes
+            self.shared -= 1
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            # Not future.cancel(): waiters must not be cancelled along with this request
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved; waiters (if any) still receive it
+            raise
+        else:
+            self.put(key, result)
+            future.set_result(result)
+            return result, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_inflight": self.shared,
+        }
+
+
+analysis_cache = AnalysisCache(
+    max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+    max_bytes=ANALYSIS_CACHE_MAX_BYTES,
+    ttl_seconds=ANALYSIS_CACHE_TTL_SECONDS,
+)
@@ -1,53 +1,71 @@
 
-import requests
+import asyncio
 import pandas as pd
 import numpy as np
 import yfinance as yf
-from datetime import datetime, timedelta, date
-from functools import lru_cache
+from collections import OrderedDict
+from datetime import timedelta
+from .transactions import to_day, today
+from .http_client import http_get
+from .single_flight import SingleFlight
+from .isin_lineage import isin_lineage
 
 # Benchmark Ticker (Nifty 50)
 BENCHMARK_TICKER = "^NSEI"
 RISK_FREE_RATE = 0.06
 TRADING_DAYS = 252
 
-# Common headers to avoid blocks
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Accept': 'application/json, text/plain, */*'
-}
+# Fetched NAV histories kept per process (scheme code -> result, None for failures)
+FUND_NAV_CACHE_SIZE = 100
+_fund_nav_cache = OrderedDict()
+# Concurrent requests for the same scheme share one /mf/{code} download
+fund_nav_flight = SingleFlight("fund_nav")
 
-@lru_cache(maxsize=100)
-def fetch_fund_nav(scheme_code: str):
+def _parse_fund_nav(data: dict):
+    if not data.get('data'):
+        return None
+        
+    nav_data = data['data']
+    df = pd.DataFrame(nav_data)
+    df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y')
+    df['nav'] = pd.to_numeric(df['nav'])
+    df = df.rename(columns={'nav': 'fund_nav'})
+    df = df.sort_values('date').set_index('date')
+    
+    # Extract metadata
+    meta = data.get('meta', {})
+    category = meta.get('scheme_category', 'Unknown')
+    
+    return {
+        'nav_data': df,
+        'category': category
+    }
+
+async def fetch_fund_nav(scheme_code: str):
     """Fetch historical NAV and metadata from mfapi.in"""
+    if scheme_code in _fund_nav_cache:
+        _fund_nav_cache.move_to_end(scheme_code)
+        return _fund_nav_cache[scheme_code]
+    return await fund_nav_flight.do(scheme_code, lambda: _download_fund_nav(scheme_code))
+
+async def _download_fund_nav(scheme_code: str):
     try:
         url = f"https://api.mfapi.in/mf/{scheme_code}"
-        response = requests.get(url, headers=HEADERS, timeout=10)
+        response = await http_get(url, timeout=10)
         response.raise_for_status()
         data = response.json()
         print(f"DEBUG: Successfully fetched MF data for Scheme {scheme_code}")
-        
-        if not data.get('data'):
-            return None
-            
-        nav_data = data['data']
-        df = pd.DataFrame(nav_data)
-        df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y')
-        df['nav'] = pd.to_numeric(df['nav'])
-        df = df.rename(columns={'nav': 'fund_nav'})
-        df = df.sort_values('date').set_index('date')
-        
-        # Extract metadata
-        meta = data.get('meta', {})
-        category = meta.get('scheme_category', 'Unknown')
-        
-        return {
-            'nav_data': df,
-            'category': category
-        }
+        result = _parse_fund_nav(data)
+        # Keep the classification so allocation never needs this download again
+        from .scheme_metadata import metadata_from_nav, record_scheme_metadata
+        record_scheme_metadata(metadata_from_nav(data.get('meta') or {}))
     except Exception as e:
         print(f"DEBUG: Error fetching MF data for {scheme_code} -> {e}")
-        return None
+        result = None
+    _fund_nav_cache[scheme_code] = result
+    while len(_fund_nav_cache) > FUND_NAV_CACHE_SIZE:
+        _fund_nav_cache.popitem(last=False)
+    return result
 
 def classify_fund_category(scheme_category: str) -> str:
     """Classify fund into broad asset class based on scheme category"""
@@ -72,9 +90,8 @@ def classify_fund_category(scheme_category: str) -> str:
     else:
         return 'Others'
 
-@lru_cache(maxsize=1)
-def fetch_benchmark_data():
-    """Fetch Nifty 50 data from yfinance"""
+def _download_benchmark():
+    """Fetch Nifty 50 data from yfinance (blocking)"""
     try:
         # Fetch max history to allow long fund lives
         # Note: We let yfinance handle the session/headers itself to avoid curl_cffi errors
@@ -92,10 +109,20 @@ def fetch_benchmark_data():
         print(f"DEBUG: Error fetching benchmark data -> {e}")
         return None
 
-def calculate_analytics(scheme_code: str):
+_benchmark = {}  # "data" -> fetched frame (or None), once per process
+_benchmark_lock = asyncio.Lock()
+
+async def fetch_benchmark_data():
+    """Nifty 50 history; yfinance has no async API, so it runs in a worker thread"""
+    async with _benchmark_lock:
+        if "data" not in _benchmark:
+            _benchmark["data"] = await asyncio.to_thread(_download_benchmark)
+    return _benchmark["data"]
+
+async def calculate_analytics(scheme_code: str):
     """Calculate all advanced analytics for a scheme"""
-    fund_result = fetch_fund_nav(scheme_code)
-    bench_df = fetch_benchmark_data()
+    fund_result = await fetch_fund_nav(scheme_code)
+    bench_df = await fetch_benchmark_data()
     
     if fund_result is None or bench_df is None:
         return None
@@ -202,50 +229,48 @@ def calculate_analytics(scheme_code: str):
         "rolling_pos": (rolling_3y_annual > 0).mean() if not rolling_3y_annual.empty else None,
     }
 
-def calculate_benchmark_xirr(transactions: list):
+def _naive_daily_index(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of a price frame indexed by tz-naive calendar day (last row wins on duplicates)."""
+    df = df.copy()
+    df.index = pd.to_datetime(df.index)
+    if df.index.tz is not None:
+        df.index = df.index.tz_localize(None)
+    df.index = df.index.normalize()
+    return df[~df.index.duplicated(keep='last')]
+
+async def calculate_benchmark_xirr(transactions: pd.DataFrame):
     """
     Calculate XIRR if the same transactions were invested in Nifty 50.
     """
-    bench_df = fetch_benchmark_data()
+    bench_df = await fetch_benchmark_data()
     if bench_df is None:
         return 0.0
         
     from pyxirr import xirr
     
-    dates = []
-    amounts = []
-    total_units = 0.0
+    tx = transactions[transactions['date'].notna() & transactions['amount'].notna()]
+    if tx.empty:
+        return 0.0
     
-    for t in transactions:
-        try:
-            t_date = pd.to_datetime(t['date']).date()
-            amount = float(t['amount'])
-            
-            try:
-                price = bench_df.loc[bench_df.index <= pd.Timestamp(t_date)].iloc[-1]['benchmark_nav']
-            except IndexError:
-                if t_date < bench_df.index[0].date():
-                     price = bench_df.iloc[0]['benchmark_nav']
-                else:
-                    continue
-
-            units_delta = -amount / price
-            total_units += units_delta
-            
-            dates.append(t_date)
-            amounts.append(amount)
-            
-        except Exception as e:
-            pass
+    # Benchmark close on or before each transaction date (first close for earlier dates)
+    bench_index = pd.to_datetime(bench_df.index)
+    if bench_index.tz is not None:
+        bench_index = bench_index.tz_localize(None)
+    prices = bench_df['benchmark_nav'].to_numpy(dtype=float)
+    pos = bench_index.searchsorted(tx['date'].to_numpy(), side='right') - 1
+    price = prices[np.maximum(pos, 0)]
+    
+    amounts = tx['amount'].to_numpy(dtype=float)
+    total_units = float((-amounts / price).sum())
             
-    if not dates or total_units <= 0:
+    if total_units <= 0:
         return 0.0
         
-    current_price = bench_df.iloc[-1]['benchmark_nav']
+    current_price = prices[-1]
     terminal_value = total_units * current_price
     
-    dates.append(date.today())
-    amounts.append(terminal_value)
+    dates = np.append(to_day(tx['date']), today())
+    amounts = np.append(amounts, terminal_value)
     
     try:
         res = xirr(dates, amounts)
@@ -255,11 +280,56 @@ def calculate_benchmark_xirr(transactions: list):
     except:
         return 0.0
 
-async def calculate_growth_comparison(transactions: list, held_schemes: dict = None):
+def _statement_nav_series(transactions: pd.DataFrame, isins) -> dict:
+    """ISIN -> fund_nav frame built from the NAVs printed on the scheme's transaction lines."""
+    series = {}
+    priced = transactions[transactions['nav'].notna() & transactions['date'].notna()]
+    for isin in isins:
+        rows = priced[priced['isin'] == isin]
+        if rows.empty:
+            continue
+        navs = pd.DataFrame({'fund_nav': rows['nav'].to_numpy()}, index=rows['date'].dt.normalize())
+        series[isin] = navs[~navs.index.duplicated(keep='last')].sort_index()
+    return series
+
+def stitch_nav_series(older: pd.DataFrame, newer: pd.DataFrame, effective) -> pd.DataFrame:
+    """
+    One fund_nav series across a scheme merger: `older` until `effective`,
+    then `newer` scaled by the conversion ratio at the merger, so a holding's
+    pre-merger units keep their value.
+    """
+    cut = pd.Timestamp(effective)
+    before = older.loc[older.index < cut, ['fund_nav']]
+    after = newer.loc[newer.index >= cut, ['fund_nav']]
+    if before.empty or after.empty:
+        return newer if before.empty else older
+    ratio = before['fund_nav'].iloc[-1] / after['fund_nav'].iloc[0]
+    return pd.concat([before, after * ratio])
+
+async def _stitch_merged_schemes(fund_dfs: dict):
+    """Replace the NAV series of merged (lineage) ISINs with one stitched across their predecessors."""
+    segments = {isin: isin_lineage.nav_segments(isin) for isin in fund_dfs}
+    segments = {isin: segs for isin, segs in segments.items() if segs}
+    if not segments:
+        return
+    codes = sorted({code for segs in segments.values() for code, _ in segs})
+    navs = dict(zip(codes, await asyncio.gather(*(fetch_fund_nav(code) for code in codes))))
+    for isin, segs in segments.items():
+        if any(navs[code] is None for code, _ in segs):
+            continue  # Keep the current scheme's series rather than stitch with a gap
+        series = navs[segs[0][0]]['nav_data']
+        for k, (_, effective) in enumerate(segs):
+            newer = navs[segs[k + 1][0]]['nav_data'] if k + 1 < len(segs) else fund_dfs[isin]
+            series = stitch_nav_series(series, newer, effective)
+        fund_dfs[isin] = series
+
+async def calculate_growth_comparison(transactions: pd.DataFrame, held_schemes: dict = None,
+                                      scheme_details: dict = None):
     """
     Generate daily series for Portfolio Value vs Benchmark Value.
+    `scheme_details` ({isin: details}) skips the ISIN lookups when the caller already has them.
     """
-    bench_df = fetch_benchmark_data()
+    bench_df = await fetch_benchmark_data()
     
     empty_res = {
         "chart": [],
@@ -270,40 +340,37 @@ async def calculate_growth_comparison(transactions: list, held_schemes: dict = N
     if bench_df is None:
         return empty_res
         
-    from .isin_lookup import get_scheme_details
+    from .isin_lookup import get_scheme_details_many
     
-    # 1. Prepare Fund Data
-    unique_isins = set()
-    for t in transactions:
-        if t.get('isin'):
-            clean_isin = t['isin'].strip().upper()
-            t['isin'] = clean_isin
-            unique_isins.add(clean_isin)
+    # 1. Prepare Fund Data (ISINs are already normalised by the transaction model)
+    unique_isins = set(transactions['isin'].dropna().unique())
+    missing = [i for i in unique_isins if scheme_details is None or i not in scheme_details]
+    if missing:
+        scheme_details = {**(scheme_details or {}), **await get_scheme_details_many(missing)}
             
+    # NAV histories fetched concurrently over the shared HTTP client
+    coded = [isin for isin in unique_isins if scheme_details.get(isin)]
+    fund_results = await asyncio.gather(*(fetch_fund_nav(scheme_details[isin]['code']) for isin in coded))
     fund_dfs = {}
-    for isin in unique_isins:
-        details = await get_scheme_details(isin)
-        if details:
-            code = details['code']
-            fund_result = fetch_fund_nav(code)
-            if fund_result is not None:
-                fund_dfs[isin] = fund_result['nav_data']
-            else:
-                 pass
-        else:
-             pass
+    for isin, fund_result in zip(coded, fund_results):
+        if fund_result is not None:
+            fund_dfs[isin] = fund_result['nav_data']
+    await _stitch_merged_schemes(fund_dfs)
+    
+    # Schemes without a NAV history are valued at the NAVs printed on their own statement lines
+    if 'nav' in transactions.columns:
+        for isin, fallback in _statement_nav_series(transactions, unique_isins - set(fund_dfs)).items():
+            fund_dfs[isin] = fallback
             
     if not fund_dfs:
         return empty_res
         
     valid_isins = set(fund_dfs.keys())
-    valid_txs = [t for t in transactions if t.get('isin') in valid_isins]
+    tx_df = transactions[transactions['isin'].isin(valid_isins) & transactions['date'].notna()]
     
-    if not valid_txs:
+    if tx_df.empty:
         return empty_res
 
-    tx_df = pd.DataFrame(valid_txs)
-    tx_df['date'] = pd.to_datetime(tx_df['date'])
     start_date = tx_df['date'].min()
     end_date = pd.Timestamp.now()
     
@@ -320,59 +387,51 @@ async def calculate_growth_comparison(transactions: list, held_schemes: dict = N
     
     result_series = []
     
-    # Benchmark Nav Series
-    bench_df.index = pd.to_datetime(bench_df.index).normalize()
-    if bench_df.index.tz is not None:
-        bench_df.index = bench_df.index.tz_localize(None)
-        
-    bench_df = bench_df[~bench_df.index.duplicated(keep='last')]
-    bench_daily = bench_df.reindex(pad_range).ffill().bfill()
+    # Benchmark Nav Series (normalised on a copy; the fetched frame is cached and shared)
+    bench_daily = _naive_daily_index(bench_df).reindex(pad_range).ffill().bfill()
     
     fund_daily = {}
     for isin, df in fund_dfs.items():
         fund_daily[isin] = df.reindex(pad_range).ffill().bfill()
         
-    tx_df['date'] = tx_df['date'].dt.normalize()
-    tx_df = tx_df.set_index('date').sort_index()
+    # Transactions bucketed by calendar day once, instead of an index probe per day
+    day_keys = tx_df['date'].dt.normalize()
+    # Units printed on the statement are used as-is; NAV division is only the fallback
+    if 'units' not in tx_df.columns:
+        tx_df = tx_df.assign(units=np.nan)
+    tx_by_day = {
+        day: list(zip(group['amount'].tolist(), group['isin'].astype(object).tolist(), group['units'].tolist()))
+        for day, group in tx_df.sort_values('date', kind='stable').groupby(day_keys, sort=False)
+    }
     
     for i, current_date in enumerate(date_range):
-        if current_date in tx_df.index:
-            matches = tx_df.loc[current_date]
-            if isinstance(matches, pd.Series):
-                day_txs = matches.to_frame().T
-            else:
-                day_txs = matches
-                
-            for _, t in day_txs.iterrows():
-                try:
-                    amt = float(t['amount'])
-                except (ValueError, TypeError):
-                    continue
-                    
+        if current_date in tx_by_day:
+            for amt, isin, units in tx_by_day[current_date]:
                 if pd.isna(amt) or abs(amt) < 0.01:
                     continue
                     
-                isin = t.get('isin')
                 
                 if isin in fund_daily:
                     try:
-                        val = fund_daily[isin].loc[current_date]
-                        if isinstance(val, pd.DataFrame):
-                            f_nav = val['fund_nav'].iloc[0]
-                        elif isinstance(val, pd.Series):
-                            f_nav = val['fund_nav']
+                        if pd.notna(units) and units != 0:
+                            units_delta = units
                         else:
-                             f_nav = np.nan
+                            val = fund_daily[isin].loc[current_date]
+                            if isinstance(val, pd.DataFrame):
+                                f_nav = val['fund_nav'].iloc[0]
+                            elif isinstance(val, pd.Series):
+                                f_nav = val['fund_nav']
+                            else:
+                                 f_nav = np.nan
+                            units_delta = -amt / f_nav if pd.notna(f_nav) and f_nav > 0 else np.nan
                         
-                        if pd.notna(f_nav) and f_nav > 0:
-                            if amt < 0:
+                        if pd.notna(units_delta):
+                            if units_delta > 0:
                                 buy_amt = abs(amt)
-                                units_added = buy_amt / f_nav
-                                portfolio_units[isin] += units_added
+                                portfolio_units[isin] += units_delta
                                 cost_basis[isin] += buy_amt
                             else:
-                                sell_amt = amt
-                                units_sold = sell_amt / f_nav
+                                units_sold = -units_delta
                                 current_units = portfolio_units[isin]
                                 if current_units > 0:
                                     ratio_kept = max(0, (current_units - units_sold) / current_units)
@@ -0,0 +1,225 @@
+"""
+Streaming Excel statement reader.
+
+Workbooks are opened read-only and iterated row by row, so the sheet XML is
+never loaded as a whole. The header row of each sheet is located among the
+first rows (exports often start with title / investor rows) and its columns
+are mapped onto the internal item schema (the keys the PDF parser produces)
+using the header aliases of common registrar (CAMS, KFintech, MF Central) and
+broker (Kuvera, Groww, Coin, ...) exports. Rows are collected column-wise in
+fixed-size chunks and turned straight into DataFrame blocks.
+"""
+import io
+import re
+import zipfile
+from datetime import date, datetime
+import openpyxl
+from openpyxl.utils.exceptions import InvalidFileException
+import pandas as pd
+from .line_classifier import flow_direction
+
+# Item schema shared with pdf_parser
+SCHEMA_COLUMNS = ("date", "description", "isin", "folio", "amount", "current_value", "type", "raw_desc",
+                  "units", "nav", "unit_balance")
+ITEM_TYPES = ("transaction", "holding", "portfolio_summary")
+
+# Normalised header text -> internal field
+COLUMN_ALIASES = {
+    "date": ("date", "transaction date", "trade date", "txn date", "trxn date", "tran date",
+             "order date", "nav date", "process date", "posting date"),
+    "description": ("description", "scheme", "scheme name", "fund", "fund name", "scheme description",
+                    "security name", "instrument", "instrument name", "mutual fund", "name of the scheme"),
+    "isin": ("isin", "isin code", "isin no", "scheme isin"),
+    "folio": ("folio", "folio no", "folio number", "account no", "account number"),
+    "amount": ("amount", "transaction amount", "txn amount", "trxn amount", "net amount", "gross amount",
+               "invested amount", "investment amount", "invested value", "cost value", "total cost",
+               "purchase value", "cost"),
+    "current_value": ("current value", "current valuation", "market value", "current market value",
+                      "present value", "valuation", "value"),
+    "units": ("units", "no of units", "number of units", "transaction units", "quantity", "qty"),
+    "nav": ("nav", "price", "purchase price", "nav per unit", "unit price", "rate"),
+    "unit_balance": ("unit balance", "balance units", "closing units", "cumulative units"),
+    "type": ("type", "item type"),
+    "tx_type": ("transaction type", "txn type", "trxn type", "transaction description", "transaction",
+                "trade type", "order type", "buy sell", "nature of transaction", "raw desc"),
+}
+_FIELD_BY_ALIAS = {alias: field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+# How far down a sheet to look for the header row
+HEADER_SCAN_ROWS = 25
+# Rows per DataFrame block (bounds the Python objects held at any time)
+CHUNK_ROWS = 10_000
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+_BRACKETED_RE = re.compile(r'\([^)]*\)')
+
+
+def _normalise_header(value) -> str:
+    """'Amount (INR)' -> 'amount', 'Folio No.' -> 'folio no', 'current_value' -> 'current value'."""
+    if value is None:
+        return ""
+    text = _BRACKETED_RE.sub(" ", str(value).lower())
+    return _NON_ALNUM_RE.sub(" ", text).strip()
+
+
+def map_header(row) -> dict:
+    """Internal field -> column index for a candidate header row (first matching column wins)."""
+    columns = {}
+    for i, cell in enumerate(row):
+        field = _FIELD_BY_ALIAS.get(_normalise_header(cell))
+        if field and field not in columns:
+            columns[field] = i
+    return columns
+
+
+def _is_header(columns: dict) -> bool:
+    has_name = "description" in columns or "isin" in columns
+    has_figure = "amount" in columns or "current_value" in columns
+    return has_name and has_figure
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).replace(",", "").replace("₹", "").strip()
+    if text.startswith("(") and text.endswith(")"):  # Accounting negative
+        text = "-" + text[1:-1]
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value is None or str(value).strip() == "":
+        return None
+    return str(value).strip()
+
+
+def _cell(row, columns: dict, field: str):
+    i = columns.get(field)
+    return row[i] if i is not None and i < len(row) else None
+
+
+def _normalise_row(row, columns: dict):
+    """One sheet row as an item tuple in SCHEMA_COLUMNS order, or None to skip it."""
+    description = _cell(row, columns, "description")
+    description = str(description).strip() if description is not None else ""
+    isin = _cell(row, columns, "isin")
+    isin = str(isin).strip().upper() if isin else None
+    amount = _to_float(_cell(row, columns, "amount"))
+    current_value = _to_float(_cell(row, columns, "current_value"))
+    if not (description or isin) or (amount is None and current_value is None):
+        return None  # Blank, title or footnote row
+
+    tx_type = _cell(row, columns, "tx_type")
+    tx_type = str(tx_type).strip() if tx_type is not None else ""
+    item_date = _to_date(_cell(row, columns, "date"))
+
+    item_type = str(_cell(row, columns, "type") or "").strip()
+    if item_type.lower() in ITEM_TYPES:
+        item_type = item_type.lower()
+    else:
+        # A broker "Type" column holds BUY / SELL / SIP rather than an item type
+        tx_type = tx_type or item_type
+        if description.lower().startswith("total") and not isin:
+            item_type = "portfolio_summary"
+        elif item_date is None or (current_value is not None and not tx_type):
+            item_type = "holding"
+        else:
+            item_type = "transaction"
+
+    if item_type == "transaction":
+        # Registrar exports print unsigned amounts; apply the parser's convention
+        # (outflows negative, inflows positive) whenever the type says which it is
+        tx_lower = tx_type.lower()
+        direction = flow_direction(tx_lower) or (-1 if "buy" in tx_lower else 0)
+        if direction and amount is not None:
+            amount = direction * abs(amount)
+        current_value = None
+    else:
+        if item_type == "holding":
+            item_date = "Current"
+            description = description or "Unknown Scheme"
+        else:
+            description = "Portfolio Total"
+        current_value = current_value or 0.0
+
+    units = _to_float(_cell(row, columns, "units"))
+    if units is not None and item_type == "transaction" and amount:
+        units = abs(units) if amount < 0 else -abs(units)  # Same convention as the PDF parser
+
+    folio = _cell(row, columns, "folio")
+    folio = str(folio).replace(" ", "") if folio is not None else None
+    return (item_date, description, isin, folio, amount or 0.0, current_value, item_type,
+            tx_type or description, units, _to_float(_cell(row, columns, "nav")),
+            _to_float(_cell(row, columns, "unit_balance")))
+
+
+def _iter_sheet_rows(source):
+    """Yield (sheet_title, row_tuple) for every row of every sheet, streaming where the format allows."""
+    try:
+        wb = openpyxl.load_workbook(io.BytesIO(source), read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile):
+        # Legacy .xls has no streaming reader; let pandas pick its engine
+        sheets = pd.read_excel(io.BytesIO(source), sheet_name=None, header=None)
+        for title, frame in sheets.items():
+            for row in frame.itertuples(index=False, name=None):
+                yield title, tuple(None if pd.isna(v) else v for v in row)
+        return
+    try:
+        for ws in wb.worksheets:
+            for row in ws.iter_rows(values_only=True):
+                yield ws.title, row
+    finally:
+        wb.close()  # Read-only workbooks keep the archive open until closed
+
+
+def read_excel_statement(source) -> pd.DataFrame:
+    """Read an Excel statement (bytes) into an item DataFrame with SCHEMA_COLUMNS."""
+    blocks = []
+    chunk = {c: [] for c in SCHEMA_COLUMNS}
+    current_sheet = None
+    columns = None
+    scanned = 0
+
+    def flush():
+        if chunk["type"]:
+            blocks.append(pd.DataFrame(chunk, columns=SCHEMA_COLUMNS))
+            for values in chunk.values():
+                values.clear()
+
+    for sheet, row in _iter_sheet_rows(source):
+        if sheet != current_sheet:
+            current_sheet, columns, scanned = sheet, None, 0
+        if columns is None:
+            # Still looking for this sheet's header row
+            scanned += 1
+            if scanned <= HEADER_SCAN_ROWS:
+                candidate = map_header(row)
+                if _is_header(candidate):
+                    columns = candidate
+                    print(f"DEBUG: Excel sheet '{sheet}' columns: {columns}")
+            continue
+
+        item = _normalise_row(row, columns)
+        if item is None:
+            continue
+        for name, value in zip(SCHEMA_COLUMNS, item):
+            chunk[name].append(value)
+        if len(chunk["type"]) >= CHUNK_ROWS:
+            flush()
+    flush()
+
+    if not blocks:
+        return pd.DataFrame(columns=SCHEMA_COLUMNS)
+    df = pd.concat(blocks, ignore_index=True)
+    for col in ("amount", "current_value", "units", "nav", "unit_balance"):
+        df[col] = df[col].astype(float)
+    return df
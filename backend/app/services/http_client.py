@@ -0,0 +1,98 @@
+"""
+Shared async HTTP client for upstream market-data calls (mfapi.in, AMFI).
+
+One httpx.AsyncClient is kept for the life of the app (opened / closed in the
+FastAPI lifespan), so connections are pooled and kept alive across requests
+instead of a new TCP + TLS handshake per call. Code running its own event
+loop (scripts, worker threads) gets a client of its own, leaving the app's
+pool alone. HTTP/2 is used when the
+optional `h2` package is installed. Each upstream host also gets its own
+concurrency limit, so one portfolio with many schemes cannot flood mfapi
+and a slow host does not take every pooled connection.
+"""
+import asyncio
+import os
+import weakref
+from urllib.parse import urlsplit
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "8"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+
+# Common headers to avoid blocks
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'application/json, text/plain, */*'
+}
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_clients = weakref.WeakKeyDictionary()  # event loop -> (client, {host: asyncio.Semaphore})
+
+
+def _loop_state() -> tuple:
+    """
+    (client, per-host semaphores) of the running event loop, created on first use.
+    Other loops (scripts, worker threads running their own loop) get their own
+    pair instead of replacing the app's; a loop's pair goes away with the loop.
+    """
+    loop = asyncio.get_running_loop()
+    state = _clients.get(loop)
+    if state is None or state[0].is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            headers=HEADERS,
+            timeout=HTTP_TIMEOUT_SECONDS,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+        )
+        state = _clients[loop] = (client, {})
+        print(f"DEBUG: HTTP client ready (http2={HTTP2_AVAILABLE}, per-host limit {HTTP_MAX_PER_HOST})")
+    return state
+
+
+def get_client() -> httpx.AsyncClient:
+    """The running event loop's shared client."""
+    return _loop_state()[0]
+
+
+def _host_limit(host_limits: dict, url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).hostname or ""
+    if host not in host_limits:
+        host_limits[host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+    return host_limits[host]
+
+
+async def http_get(url: str, **kwargs) -> httpx.Response:
+    """GET through the shared client, within the host's concurrency limit."""
+    client, host_limits = _loop_state()
+    async with _host_limit(host_limits, url):
+        return await client.get(url, **kwargs)
+
+
+async def http_get_lines(url: str, **kwargs):
+    """Stream a text response line by line (large files such as AMFI NAVAll.txt)."""
+    client, host_limits = _loop_state()
+    async with _host_limit(host_limits, url):
+        async with client.stream("GET", url, **kwargs) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                yield line
+
+
+async def start_http_client():
+    get_client()
+
+
+async def close_http_client():
+    """Close the running event loop's client."""
+    state = _clients.pop(asyncio.get_running_loop(), None)
+    if state is not None and not state[0].is_closed:
+        await state[0].aclose()
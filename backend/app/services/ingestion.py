@@ -0,0 +1,163 @@
+"""
+Incremental statement ingestion.
+
+Monthly CAS uploads repeat years of history. Each item of an upload is
+fingerprinted and checked against what the user has already stored, so only
+the delta is written:
+
+- transactions are keyed by (folio, isin, date, amount, raw_desc), plus an
+  occurrence number for identical transactions within one statement, and
+  accumulate across uploads;
+- holding and portfolio-summary rows are statement state: their fingerprint
+  also covers the valuation, and stale rows for the uploaded folios are
+  replaced by the upload's.
+
+The schemes touched by the delta are reported as "affected"; every other
+scheme's entry from the previous snapshot can be reused as-is by
+analyze_portfolio.
+"""
+import asyncio
+import hashlib
+import pandas as pd
+from sqlalchemy import select, delete, insert
+from ..core.database import IN_CLAUSE_CHUNK
+from ..models import StoredTransaction
+from .transactions import ItemType, to_transaction_frame, scheme_keys
+from .portfolio_service import infer_missing_isins
+from .scheme_name_index import match_scheme_names
+
+_STORED_COLUMNS = ("date", "description", "isin", "folio", "amount", "current_value", "type", "raw_desc",
+                   "units", "nav", "unit_balance")
+
+
+def fingerprints(df: pd.DataFrame) -> pd.Series:
+    """Stable per-item fingerprints for a typed transaction frame."""
+    dates = df["date"].dt.strftime("%Y-%m-%d").fillna("")
+    amounts = df["amount"].map(lambda v: "" if v != v else f"{v:.2f}")
+    values = df["current_value"].map(lambda v: "" if v != v else f"{v:.2f}")
+    isin = df["isin"].astype(object).fillna("")
+    folio = df["folio"].astype(object).fillna("")
+    raw = df["raw_desc"].astype(object).fillna(df["description"].astype(object)).fillna("")
+    kinds = df["type"].astype(object)
+
+    out = []
+    seen = {}
+    for kind, f, i, d, a, v, r in zip(kinds, folio, isin, dates, amounts, values, raw):
+        if kind == ItemType.TRANSACTION.value:
+            key = (f, i, d, a, r)
+        else:
+            key = (kind, f, i, d, a, v, r)
+        # Identical items within one statement (e.g. two same-day SIP instalments) are all kept:
+        # repeats are numbered, the first occurrence keeps the plain fingerprint
+        occurrence = seen[key] = seen.get(key, -1) + 1
+        if occurrence:
+            key += (str(occurrence),)
+        out.append(hashlib.sha1("\x1f".join(key).encode()).hexdigest())
+    return pd.Series(out, index=df.index)
+
+
+async def _existing_fingerprints(db, user_id: int, candidates: list) -> set:
+    found = set()
+    for start in range(0, len(candidates), IN_CLAUSE_CHUNK):
+        chunk = candidates[start:start + IN_CLAUSE_CHUNK]
+        res = await db.execute(
+            select(StoredTransaction.fingerprint)
+            .filter(StoredTransaction.user_id == user_id, StoredTransaction.fingerprint.in_(chunk))
+        )
+        found.update(res.scalars().all())
+    return found
+
+
+def _rows(df: pd.DataFrame, user_id: int) -> list:
+    rows = []
+    for item in df[list(_STORED_COLUMNS) + ["fingerprint"]].astype(object).itertuples(index=False):
+        row = {"user_id": user_id, "fingerprint": item.fingerprint}
+        for col in _STORED_COLUMNS:
+            value = getattr(item, col)
+            row[col] = None if value is None or value is pd.NaT or (isinstance(value, float) and value != value) else value
+        if row["date"] is not None:
+            row["date"] = pd.Timestamp(row["date"]).to_pydatetime()
+        rows.append(row)
+    return rows
+
+
+async def ingest_statement(db, user_id: int, frame: pd.DataFrame) -> dict:
+    """
+    Store the items of `frame` the user does not have yet.
+
+    Returns {"new_items", "duplicate_items", "replaced_items", "affected_schemes"};
+    affected scheme keys are ISINs (or descriptions for rows without one, plus
+    the ISIN their name matches confidently, as analyze_portfolio groups them).
+    """
+    frame = to_transaction_frame(frame)
+    frame = frame.assign(fingerprint=fingerprints(frame))
+    uploaded = frame["fingerprint"].tolist()
+    existing = await _existing_fingerprints(db, user_id, uploaded)
+    new = frame[~frame["fingerprint"].isin(existing)]
+    new_schemes = new[new["type"] != ItemType.PORTFOLIO_SUMMARY.value]
+    # analyze_portfolio keys ISIN-less schemes by their name-matched ISIN, so report that key too
+    inferred, _ = await asyncio.to_thread(infer_missing_isins, new_schemes)
+    affected = set(scheme_keys(new_schemes)) | set(scheme_keys(inferred))
+
+    # Holdings of the uploaded folios (and any summary) that the upload no longer shows are stale
+    state = frame[frame["type"] != ItemType.TRANSACTION.value]
+    folios = set(state["folio"].astype(object).dropna())
+    keep = set(state["fingerprint"])
+    stale_query = select(StoredTransaction.id, StoredTransaction.fingerprint, StoredTransaction.isin,
+                         StoredTransaction.description, StoredTransaction.folio, StoredTransaction.type) \
+        .filter(StoredTransaction.user_id == user_id, StoredTransaction.type != ItemType.TRANSACTION.value)
+    stale = []
+    for row in (await db.execute(stale_query)).all():
+        if row.fingerprint in keep:
+            continue
+        # Holdings of folios missing from this upload (e.g. another registrar's statement) are kept
+        if row.type == ItemType.PORTFOLIO_SUMMARY.value or row.folio in folios:
+            stale.append(row)
+    for start in range(0, len(stale), IN_CLAUSE_CHUNK):
+        ids = [row.id for row in stale[start:start + IN_CLAUSE_CHUNK]]
+        await db.execute(delete(StoredTransaction).filter(StoredTransaction.id.in_(ids)))
+    stale_holdings = [row for row in stale if row.type == ItemType.HOLDING.value]
+    affected.update(row.isin or row.description for row in stale_holdings)
+    unkeyed = [row.description for row in stale_holdings if not row.isin and row.description]
+    if unkeyed:
+        matches = await asyncio.to_thread(match_scheme_names, unkeyed)
+        affected.update(m["isin"] for m in matches.values() if m and m["confident"])
+
+    if not new.empty:
+        await db.execute(insert(StoredTransaction), _rows(new, user_id))
+    await db.commit()
+
+    stats = {
+        "new_items": len(new),
+        "duplicate_items": len(frame) - len(new),
+        "replaced_items": len(stale),
+        "affected_schemes": sorted(str(k) for k in affected),
+    }
+    print(f"DEBUG: Ingested upload for user {user_id}: {stats['new_items']} new, "
+          f"{stats['duplicate_items']} already stored, {len(affected)} schemes affected")
+    return stats
+
+
+async def load_history(db, user_id: int) -> pd.DataFrame:
+    """Every stored item of the user as a typed transaction frame."""
+    res = await db.execute(
+        select(*(getattr(StoredTransaction, col) for col in _STORED_COLUMNS))
+        .filter(StoredTransaction.user_id == user_id)
+        .order_by(StoredTransaction.id)
+    )
+    df = pd.DataFrame(res.all(), columns=_STORED_COLUMNS)
+    return to_transaction_frame(df)
+
+
+def reusable_schemes(previous: dict, affected) -> dict:
+    """Scheme key -> holding entry of the previous analysis, for schemes the upload did not touch."""
+    if not previous:
+        return {}
+    affected = set(affected)
+    reuse = {}
+    for entry in previous.get("holdings", []):
+        key = entry.get("isin") or entry.get("description")
+        # An ISIN-less scheme may be keyed by its inferred ISIN here and by its description in `affected`
+        if key and key not in affected and entry.get("description") not in affected:
+            reuse[key] = entry
+    return reuse
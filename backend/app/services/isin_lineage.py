@@ -0,0 +1,148 @@
+"""
+ISIN lineage index: legacy, renamed and merged ISINs.
+
+Statements keep showing ISINs that AMFI no longer lists (schemes merged into
+another, renamed plans, old option ISINs). The lineage index maps such an ISIN
+either straight to a scheme code / name, or to its successor ISIN with the
+date the change took effect; chains (A merged into B, B into C) are followed.
+
+Entries come from the bundled data file (data/isin_lineage.json) and a local
+overlay (ISIN_LINEAGE_LOCAL_PATH) that add() extends at runtime, so lineage
+learnt in production survives restarts. Lookups are dict reads, checked
+before any network step.
+
+This module has no database or app imports, so the legacy backend/isin_lookup
+module uses it too.
+"""
+import json
+import os
+import threading
+from datetime import date
+from pathlib import Path
+
+ISIN_LINEAGE_PATH = os.getenv(
+    "ISIN_LINEAGE_PATH", str(Path(__file__).resolve().parent.parent / "data" / "isin_lineage.json")
+)
+ISIN_LINEAGE_LOCAL_PATH = os.getenv("ISIN_LINEAGE_LOCAL_PATH", "./isin_lineage_local.json")
+
+_MAX_HOPS = 16  # Guards against cycles in hand-edited data
+
+
+def _read_entries(path: str) -> list:
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("entries", [])
+
+
+def _normalize(entry: dict) -> dict:
+    successor = (entry.get("successor_isin") or "").strip().upper() or None
+    effective = entry.get("effective_date") or None
+    return {
+        "isin": entry["isin"].strip().upper(),
+        "scheme_code": str(entry["scheme_code"]) if entry.get("scheme_code") else None,
+        "name": entry.get("name") or None,
+        "successor_isin": successor,
+        "effective_date": date.fromisoformat(effective) if isinstance(effective, str) else effective,
+    }
+
+
+class IsinLineage:
+    def __init__(self, path: str = ISIN_LINEAGE_PATH, local_path: str = ISIN_LINEAGE_LOCAL_PATH):
+        self.path = path
+        self.local_path = local_path
+        self._entries = {}  # isin -> normalized entry
+        self._local = {}  # Runtime additions (also in _entries)
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        entries, local = {}, {}
+        for entry in _read_entries(self.path):
+            entry = _normalize(entry)
+            entries[entry["isin"]] = entry
+        for entry in _read_entries(self.local_path):
+            entry = _normalize(entry)
+            entries[entry["isin"]] = local[entry["isin"]] = entry
+        with self._lock:
+            self._entries, self._local, self._loaded = entries, local, True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def __contains__(self, isin: str) -> bool:
+        self._ensure_loaded()
+        return isin in self._entries
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._entries)
+
+    def chain(self, isin: str) -> list:
+        """Entries from `isin` through its successors (empty when the ISIN has no lineage)."""
+        self._ensure_loaded()
+        hops = []
+        entry = self._entries.get(isin)
+        while entry is not None and len(hops) < _MAX_HOPS:
+            hops.append(entry)
+            if not entry["successor_isin"] or entry["successor_isin"] in {h["isin"] for h in hops}:
+                break
+            entry = self._entries.get(entry["successor_isin"])
+        return hops
+
+    def resolve(self, isin: str) -> dict:
+        """
+        None when the ISIN has no lineage. Otherwise {"isin", "name", "code"}
+        for the current scheme: "isin" is the last successor, and "code" /
+        "name" are None when that successor must itself be looked up (AMFI
+        master, DB, mfapi).
+        """
+        hops = self.chain(isin)
+        if not hops:
+            return None
+        last = hops[-1]
+        if last["successor_isin"] and last["successor_isin"] not in {h["isin"] for h in hops}:
+            return {"isin": last["successor_isin"], "name": None, "code": None}
+        return {"isin": last["isin"], "name": last["name"], "code": last["scheme_code"]}
+
+    def nav_segments(self, isin: str) -> list:
+        """
+        [(scheme_code, effective_date)] for the predecessors of the current
+        scheme, oldest first: each code's NAV history applies until its date,
+        after which the next scheme's NAV (converted at the merger) takes over.
+        Empty when there is nothing to stitch.
+        """
+        segments = []
+        for hop in self.chain(isin):
+            if not (hop["successor_isin"] and hop["effective_date"]):
+                break
+            if not hop["scheme_code"]:
+                return []  # A gap in the history; do not stitch partially
+            segments.append((hop["scheme_code"], hop["effective_date"]))
+        return segments
+
+    def add(self, isin: str, scheme_code: str = None, name: str = None,
+            successor_isin: str = None, effective_date: date = None, persist: bool = True):
+        """Add or replace an entry at runtime, saved to the local overlay file unless persist=False."""
+        self._ensure_loaded()
+        entry = _normalize({"isin": isin, "scheme_code": scheme_code, "name": name,
+                            "successor_isin": successor_isin, "effective_date": effective_date})
+        with self._lock:
+            self._entries[entry["isin"]] = entry
+            self._local[entry["isin"]] = entry
+            if persist and self.local_path:
+                self._save(list(self._local.values()))
+
+    def _save(self, entries: list):
+        data = {"entries": [
+            {**e, "effective_date": e["effective_date"].isoformat() if e["effective_date"] else None}
+            for e in entries
+        ]}
+        tmp = f"{self.local_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.local_path)
+
+
+isin_lineage = IsinLineage()
@@ -1,48 +1,15 @@
-import requests
+import asyncio
 import re
-from functools import lru_cache
 from sqlalchemy import select
-from ..core.database import SessionLocal
+from ..core.database import SessionLocal, IN_CLAUSE_CHUNK
 from ..models import ISINMapping
-
-AMFI_NAV_URL = "https://www.amfiindia.com/spages/NAVAll.txt"
-
-# Common headers to avoid blocks
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-}
-
-@lru_cache(maxsize=1)
-def _fetch_isin_mapping_full():
-    """
-    Directly fetch AMFI data. This is prone to timeouts on cloud IPs.
-    We'll mostly rely on get_scheme_details to handle individual lookups.
-    """
-    isin_map = {}
-    try:
-        # Using stream=True to handle large files better
-        with requests.get(AMFI_NAV_URL, headers=HEADERS, timeout=15, stream=True) as r:
-            r.raise_for_status()
-            for line in r.iter_lines(decode_unicode=True):
-                if not line: continue
-                parts = line.split(';')
-                if len(parts) >= 4:
-                    scheme_code = parts[0].strip()
-                    scheme_name = parts[3].strip()
-                    for col in [1, 2]:
-                        isin = parts[col].strip()
-                        if isin and isin.startswith('INF') and len(isin) == 12:
-                            isin_map[isin] = {"name": scheme_name, "code": scheme_code}
-        print(f"DEBUG: Successfully fetched full AMFI map ({len(isin_map)} entries)")
-    except Exception as e:
-        print(f"DEBUG: Full AMFI fetch timed out/failed: {e}")
-    return isin_map
-
-# Static mapping for old/legacy ISINs that might not be in the current AMFI file
-STATIC_MAPPING = {
-    "INF740K01031": {"name": "Parag Parikh Flexi Cap (Direct)", "code": "122639"},
-    "INF109K010A6": {"name": "ICICI Prudential Banking and PSU Debt Fund", "code": "101648"},
-}
+from .http_client import http_get
+from .amfi_master import amfi_master
+from .isin_lineage import isin_lineage
+from .scheme_cache import scheme_cache
+from .single_flight import SingleFlight
+from .isin_mapping_store import mapping_buffer
+from .scheme_metadata import metadata_from_name, record_scheme_metadata
 
 def clean_scheme_name(name: str) -> str:
     """Utility to remove junk from scheme names (PDF artifacts, direct/regular labels)"""
@@ -56,76 +23,127 @@ def clean_scheme_name(name: str) -> str:
     name = re.sub(r'\s*\([^)]*\)\s*$', '', name)
     return name.strip()
 
-async def get_scheme_details(isin: str) -> dict:
+# Concurrent uploads holding the same scheme share one mfapi.in search per ISIN
+remote_lookup_flight = SingleFlight("isin_remote")
+scheme_details_flight = SingleFlight("scheme_details")
+
+async def _fetch_remote_details(isin: str):
     """
-    Get scheme details (name, code) for an ISIN.
-    Order: 
-    1. Static Mapping
-    2. DB Cache
-    3. mfapi.in search (single isin)
-    4. Full AMFI fetch (last resort)
+    Remote lookup for one ISIN the AMFI master does not know (mfapi.in search).
+    Returns (details, raw_scheme_name) or None.
     """
-    if not isin: return None
-    isin = isin.strip().upper()
-    
-    # 1. Static Mapping
-    if isin in STATIC_MAPPING:
-        return STATIC_MAPPING[isin]
-
-    # 2. Check DB Cache
-    try:
-        async with SessionLocal() as db:
-            res = await db.execute(select(ISINMapping).filter(ISINMapping.isin == isin))
-            cached = res.scalars().first()
-            if cached:
-                return {"name": clean_scheme_name(cached.scheme_name), "code": cached.scheme_code}
-    except Exception as e:
-        print(f"DEBUG: DB Cache error: {e}")
-
-    # 3. mfapi.in Fallback (Search by ISIN)
-    # This is much faster and more reliable than the full AMFI file
     try:
         search_url = f"https://api.mfapi.in/mf/search?q={isin}"
-        response = requests.get(search_url, headers=HEADERS, timeout=10)
+        response = await http_get(search_url, timeout=10)
         if response.status_code == 200:
             data = response.json()
             if data and len(data) > 0:
                 # Take the best match
                 match = data[0]
                 details = {"name": clean_scheme_name(match['schemeName']), "code": str(match['schemeCode'])}
-                
-                # Cache it in DB for future
-                try:
-                    async with SessionLocal() as db:
-                        new_entry = ISINMapping(isin=isin, scheme_code=details['code'], scheme_name=match['schemeName'])
-                        db.add(new_entry)
-                        await db.commit()
-                except: pass
-                
-                return details
+                return details, match['schemeName']
     except Exception as e:
         print(f"DEBUG: mfapi.in lookup failed for {isin}: {e}")
 
-    # 4. Final Resort: Try to find in full AMFI (might hit timeout)
-    # Note: This is now a sync call inside our async function, might block 
-    # but it's a last resort anyway.
-    isin_map = _fetch_isin_mapping_full()
-    details = isin_map.get(isin)
-    
-    if details:
-        details['name'] = clean_scheme_name(details['name'])
-        # Cache it
+    return None
+
+# A refreshed master may know ISINs that were cached as misses
+amfi_master.listeners.append(scheme_cache.invalidate)
+
+async def get_scheme_details_many(isins) -> dict:
+    """
+    Resolve many ISINs at once. Returns {isin: {"name", "code"} or None}.
+    Order:
+    1. ISIN lineage index (legacy / merged ISINs; a successor ISIN is resolved
+       in its place), then the in-process cache (hits and remembered misses)
+    2. Local AMFI master index (no network; refreshed in the background)
+    3. DB Cache, one IN (...) query for the whole batch
+    4. mfapi.in search for the misses, concurrently (within
+       the HTTP client's per-host limit), with the new mappings queued for
+       one batched upsert
+    """
+    isins = list(dict.fromkeys(i.strip().upper() for i in isins if i and i.strip()))
+    found = {}
+
+    # 1. Lineage index
+    successors = {}  # isin -> successor isin to resolve instead
+    for isin in isins:
+        lineage = isin_lineage.resolve(isin)
+        if lineage is None:
+            continue
+        if lineage['code']:
+            found[isin] = {"name": clean_scheme_name(lineage['name']), "code": lineage['code']}
+        elif lineage['isin'] != isin:
+            successors[isin] = lineage['isin']
+    if successors:
+        resolved = await get_scheme_details_many(set(successors.values()))
+        for isin, successor in successors.items():
+            found[isin] = resolved.get(successor)
+    cached, pending = scheme_cache.get_many([i for i in isins if i not in found])
+    found.update(cached)
+    looked_up = list(pending)
+
+    # 2. AMFI master index
+    if pending:
+        try:
+            for isin, entry in amfi_master.lookup_many(pending).items():
+                found[isin] = {"name": clean_scheme_name(entry['name']), "code": entry['code'],
+                               "category": entry['category'], "plan": entry['plan']}
+        except Exception as e:
+            print(f"DEBUG: AMFI master lookup error: {e}")
+        pending = [i for i in pending if i not in found]
+
+    # 3. Check DB Cache
+    if pending:
         try:
             async with SessionLocal() as db:
-                new_entry = ISINMapping(isin=isin, scheme_code=details['code'], scheme_name=details['name'])
-                db.add(new_entry)
-                await db.commit()
-        except: pass
-        return details
-        
-    return None
+                for start in range(0, len(pending), IN_CLAUSE_CHUNK):
+                    res = await db.execute(
+                        select(ISINMapping).filter(ISINMapping.isin.in_(pending[start:start + IN_CLAUSE_CHUNK]))
+                    )
+                    for cached in res.scalars().all():
+                        found[cached.isin] = {"name": clean_scheme_name(cached.scheme_name), "code": cached.scheme_code}
+        except Exception as e:
+            print(f"DEBUG: DB Cache error: {e}")
+        pending = [i for i in pending if i not in found]
+
+    # 4. Remote lookups for the misses
+    if pending:
+        resolved = await asyncio.gather(*(remote_lookup_flight.do(i, lambda i=i: _fetch_remote_details(i)) for i in pending))
+        new_entries = []
+        for isin, hit in zip(pending, resolved):
+            if hit:
+                details, raw_name = hit
+                found[isin] = details
+                new_entries.append({"isin": isin, "scheme_code": details['code'], "scheme_name": raw_name})
+        # Written back with other requests' results in one upsert (see isin_mapping_store)
+        mapping_buffer.add(new_entries)
+        record_scheme_metadata([metadata_from_name(e['isin'], e['scheme_code'], e['scheme_name']) for e in new_entries])
+        print(f"DEBUG: Resolved {len(isins)} ISINs ({len(pending)} remote lookups, {len(new_entries)} found; "
+              f"cache {scheme_cache.stats()}, coalesced {remote_lookup_flight.stats()})")
+
+    # Remember this batch's results, including misses (shorter TTL)
+    for isin in looked_up:
+        scheme_cache.put(isin, found.get(isin))
+
+    return {isin: found.get(isin) for isin in isins}
+
+async def get_scheme_details(isin: str) -> dict:
+    """Get scheme details (name, code) for one ISIN; see get_scheme_details_many."""
+    if not isin: return None
+    isin = isin.strip().upper()
+    return await scheme_details_flight.do(isin, lambda: _get_one(isin))
+
+async def _get_one(isin: str) -> dict:
+    return (await get_scheme_details_many([isin])).get(isin)
 
 async def get_scheme_name(isin: str) -> str:
     """Helper for parsed results"""
     details = await get_scheme_details(isin)
     return details['name'] if details else ""
+
+async def get_scheme_names(isins: list) -> dict:
+    """Resolve many ISINs in one batch. Returns {isin: name} ('' when unknown)."""
+    isins = list(dict.fromkeys(i for i in isins if i))
+    details = await get_scheme_details_many(isins)
+    return {i: (details.get(i.strip().upper()) or {}).get('name', '') for i in isins}
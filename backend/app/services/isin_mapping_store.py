@@ -0,0 +1,153 @@
+"""
+Batched writes of resolved ISIN -> scheme mappings (isin_mappings table) and
+of per-ISIN scheme metadata (scheme_metadata table).
+
+Rows resolved by concurrent requests are buffered for a short window
+(ISIN_MAPPING_FLUSH_SECONDS) and written in one transaction of multi-row
+INSERT ... ON CONFLICT (isin) DO UPDATE statements, on Postgres and SQLite
+alike. A first-time 50-scheme portfolio therefore costs one write
+transaction, two requests resolving the same ISIN no longer collide on the
+primary key, and updated_at always records when a mapping was last
+confirmed. Written ISINs are invalidated in the in-process scheme cache.
+"""
+import asyncio
+import os
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from ..core.database import SessionLocal, engine
+from ..models import ISINMapping, SchemeMetadata
+from .scheme_cache import scheme_cache
+
+ISIN_MAPPING_FLUSH_SECONDS = float(os.getenv("ISIN_MAPPING_FLUSH_SECONDS", "0.5"))
+
+# Bind parameters per INSERT statement (stays under SQLite's variable limit)
+_PARAMS_PER_STATEMENT = 900
+
+_METADATA_COLUMNS = ("scheme_code", "category", "asset_class", "amc", "plan", "option", "benchmark")
+
+
+def _insert():
+    return postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert
+
+
+async def _upsert(model, rows: list, columns: tuple, keep_existing: bool = False):
+    """
+    Multi-row INSERT ... ON CONFLICT (isin) DO UPDATE of `columns`, in one transaction.
+    With keep_existing, NULLs in `rows` leave the stored values alone.
+    """
+    insert = _insert()
+    per_statement = max(1, _PARAMS_PER_STATEMENT // (len(columns) + 1))
+    async with SessionLocal() as db:
+        for start in range(0, len(rows), per_statement):
+            stmt = insert(model).values(rows[start:start + per_statement])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[model.isin],
+                set_={
+                    **{col: func.coalesce(stmt.excluded[col], getattr(model, col)) if keep_existing
+                       else stmt.excluded[col] for col in columns},
+                    "updated_at": func.now(),
+                },
+            )
+            await db.execute(stmt)
+        await db.commit()
+
+
+async def upsert_isin_mappings(rows: list, invalidate: bool = True) -> int:
+    """
+    Insert or update {"isin", "scheme_code", "scheme_name"} rows in one transaction.
+    Returns the number of rows written. `invalidate=False` keeps the scheme
+    cache entries (for writers that cached the same values themselves).
+    """
+    rows = list({row["isin"]: row for row in rows}.values())  # Last one wins within a batch
+    if not rows:
+        return 0
+    await _upsert(ISINMapping, rows, ("scheme_code", "scheme_name"))
+    if invalidate:
+        scheme_cache.invalidate(row["isin"] for row in rows)
+    return len(rows)
+
+
+async def upsert_scheme_metadata(rows: list, invalidate: bool = False) -> int:
+    """
+    Insert or update scheme_metadata rows ({"isin", ...} with any of the metadata
+    columns). Sources fill different columns (the AMFI master has no benchmark,
+    NAV metadata no plan), so missing values never overwrite stored ones.
+    """
+    rows = list({row["isin"]: row for row in rows}.values())
+    if not rows:
+        return 0
+    rows = [{"isin": row["isin"], **{col: row.get(col) for col in _METADATA_COLUMNS}} for row in rows]
+    await _upsert(SchemeMetadata, rows, _METADATA_COLUMNS, keep_existing=True)
+    return len(rows)
+
+
+class MappingWriteBuffer:
+    def __init__(self, delay_seconds: float, write=upsert_isin_mappings, label: str = "ISIN mappings"):
+        self.delay_seconds = delay_seconds
+        self.write = write
+        self.label = label
+        self._pending = {}  # isin -> row
+        self._task = None
+        self._waiting = False  # The flush task is still in its buffering window
+        self.flushes = 0
+        self.written = 0
+
+    def add(self, rows):
+        """
+        Queue rows; they are written together after the buffering window.
+        Rows come from lookups that already cached them, so flushes do not
+        invalidate the scheme cache.
+        """
+        for row in rows:
+            self._pending[row["isin"]] = row
+        if self._pending and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._flush_later())
+
+    def pending(self, isins) -> dict:
+        """Queued (not yet written) rows for the given ISINs."""
+        return {isin: self._pending[isin] for isin in isins if isin in self._pending}
+
+    def pending_by(self, column: str, values) -> list:
+        """Queued rows whose `column` is one of `values`."""
+        values = set(values)
+        return [row for row in self._pending.values() if row.get(column) in values]
+
+    async def _flush_later(self):
+        self._waiting = True
+        try:
+            await asyncio.sleep(self.delay_seconds)
+        except asyncio.CancelledError:
+            self._waiting = False
+            # Loop shutting down (e.g. asyncio.run() in a script): write what we have first
+            await self.flush()
+            raise
+        self._waiting = False
+        await self.flush()
+
+    async def flush(self):
+        """Write everything queued so far (also called on shutdown)."""
+        rows, self._pending = list(self._pending.values()), {}
+        if not rows:
+            return
+        try:
+            self.written += await self.write(rows, invalidate=False)
+            self.flushes += 1
+            print(f"DEBUG: Upserted {len(rows)} {self.label}")
+        except Exception as e:
+            print(f"DEBUG: Could not store {len(rows)} {self.label}: {e}")
+
+    async def close(self):
+        """Write everything still queued, without waiting out the buffering window."""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            if self._waiting:
+                task.cancel()  # Skip the rest of the window; the task still flushes
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+
+mapping_buffer = MappingWriteBuffer(ISIN_MAPPING_FLUSH_SECONDS)
+metadata_buffer = MappingWriteBuffer(ISIN_MAPPING_FLUSH_SECONDS, upsert_scheme_metadata, "scheme metadata rows")
@@ -0,0 +1,150 @@
+"""
+Line classifier for CAS (Consolidated Account Statement) text.
+
+Every line of a statement is labelled exactly once (folio / ISIN header /
+fund-name candidate / transaction / closing balance / summary / row holding /
+noise). All patterns are compiled at import time, each keyword group is
+matched with one compiled alternation instead of a list of `in` tests, and
+literal prefilters (such as 'folio' or 'INF') run before the regexes they
+guard, so most lines are decided after one or two scans.
+"""
+import re
+
+# Line kinds
+FOLIO = "folio"
+ISIN_HEADER = "isin_header"
+FUND_NAME = "fund_name"
+TRANSACTION = "transaction"
+CLOSING_BALANCE = "closing_balance"
+SUMMARY = "summary"
+ROW_HOLDING = "row_holding"
+NOISE = "noise"
+
+# Precompiled patterns (shared with the parser)
+FOLIO_RE = re.compile(r'Folio\s*(?:No)?:?\s*(\d+\s*/\s*\d+|\d+)', re.IGNORECASE)
+ISIN_RE = re.compile(r'(INF\w{9})')
+ISIN_LABEL_RE = re.compile(r'ISIN:?\s*INF\w{9}')
+TRAILING_BRACKET_RE = re.compile(r'\([^)]*\)\s*$')
+FUND_CODE_PREFIX_RE = re.compile(r'^[A-Z0-9]{3,8}-')
+DATE_RE = re.compile(r'^\s*(\d{2}[-./](?:[A-Za-z]{3}|\d{2})[-./]\d{4})')
+DECIMAL_RE = re.compile(r'([\d,]+\.\d+)')
+SIGNED_AMOUNT_RE = re.compile(r'(-?[\d,]+\.\d{2,4})')
+COST_VALUE_RE = re.compile(r'Total\s*Cost\s*Value:?\s*([\d,]+\.?\d*)', re.IGNORECASE)
+MARKET_VALUE_RE = re.compile(r'Market\s*Value[^:]*:\s*(?:INR\s*)?([\d,]+\.?\d*)', re.IGNORECASE)
+
+# Keyword groups
+FUND_KEYWORDS = ('equity', 'debt', 'hybrid', 'balanced', 'bluechip',
+                 'flexi', 'growth', 'liquid', 'overnight', 'gilt',
+                 'arbitrage', 'elss', 'index')
+NOISE_KEYWORDS = ('statement', 'page')
+TX_EXCLUDE_KEYWORDS = ('stamp duty', 'charges')
+INFLOW_KEYWORDS = ('redemption', 'sell', 'switch out', 'dividend payout')
+OUTFLOW_KEYWORDS = ('purchase', 'sip', 'switch in', 'reinvestment', 'systematic', 'investment')
+ROW_BLACKLIST = ('purchase', 'sip', 'redemption', 'switch', 'dividend', 'stt', 'stamp',
+                 'advisor', 'registra', 'sys. investment', 'charges')
+MUTUAL_FUND = 'mutual fund'
+CLOSING_UNIT_BALANCE = 'closing unit balance'
+
+
+def _keyword_search(keywords: tuple):
+    """One compiled alternation per keyword group: a single C-level scan instead of N `in` tests."""
+    return re.compile('|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))).search
+
+
+_has_fund_keyword = _keyword_search(FUND_KEYWORDS)
+_has_noise_keyword = _keyword_search(NOISE_KEYWORDS)
+_has_tx_exclude_keyword = _keyword_search(TX_EXCLUDE_KEYWORDS)
+_has_inflow_keyword = _keyword_search(INFLOW_KEYWORDS)
+_has_outflow_keyword = _keyword_search(OUTFLOW_KEYWORDS)
+_has_blacklisted_keyword = _keyword_search(ROW_BLACKLIST)
+
+
+def flow_direction(line_lower: str) -> int:
+    """+1 for inflows (redemption etc.), -1 for outflows (purchase etc.), 0 if unknown."""
+    if _has_inflow_keyword(line_lower):
+        return 1
+    if _has_outflow_keyword(line_lower):
+        return -1
+    return 0
+
+
+ALL_KINDS = frozenset((FOLIO, ISIN_HEADER, FUND_NAME, TRANSACTION, CLOSING_BALANCE, SUMMARY, ROW_HOLDING))
+
+
+def make_classifier(kinds=ALL_KINDS, isin_rows: bool = False):
+    """
+    Build a line classifier that only runs the checks for `kinds`.
+
+    Statement-specific parsers pass the subset their layout needs, so e.g. a
+    detailed CAS never pays for the row-holding decimal scan. With `isin_rows`,
+    an ISIN-bearing line carrying two or more amounts is a ROW_HOLDING
+    (depository layouts print ISIN, units and value on one row) instead of a
+    fund header.
+    """
+    want_folio = FOLIO in kinds
+    want_isin = ISIN_HEADER in kinds
+    want_fund = FUND_NAME in kinds
+    want_tx = TRANSACTION in kinds
+    want_closing = CLOSING_BALANCE in kinds
+    want_summary = SUMMARY in kinds
+    want_rows = ROW_HOLDING in kinds
+
+    def classify(line: str):
+        """
+        Label a raw statement line.
+
+        Returns (kind, line_strip, line_lower, match) where `match` is the regex
+        match that decided the label (folio, ISIN or date) or None.
+        """
+        line_strip = line.strip()
+        line_lower = line_strip.lower()
+
+        # 0. Folio Number (e.g., "Folio No: 21961126 / 89")
+        if want_folio and 'folio' in line_lower:
+            folio_match = FOLIO_RE.search(line_strip)
+            if folio_match:
+                return FOLIO, line_strip, line_lower, folio_match
+
+        # 1. Fund Header (ISIN/Name)
+        has_inf = 'INF' in line_strip
+        if has_inf and (want_isin or isin_rows):
+            isin_match = ISIN_RE.search(line_strip)
+            if isin_match:
+                if isin_rows and len(DECIMAL_RE.findall(line_strip)) >= 2:
+                    return ROW_HOLDING, line_strip, line_lower, isin_match
+                if want_isin:
+                    return ISIN_HEADER, line_strip, line_lower, isin_match
+
+        # Candidate fund name for the next ISIN line
+        if want_fund and not has_inf and not line_strip.startswith("("):
+            if FUND_CODE_PREFIX_RE.match(line_strip) or _has_fund_keyword(line_lower):
+                return FUND_NAME, line_strip, line_lower, None
+
+        # 2. Noise / Summary
+        if _has_noise_keyword(line_lower):
+            return NOISE, line_strip, line_lower, None
+        if line_lower.startswith("total"):
+            return (SUMMARY if want_summary else NOISE), line_strip, line_lower, None
+        if MUTUAL_FUND in line_lower:
+            return NOISE, line_strip, line_lower, None
+
+        # 3. Transactions (line starts with a date)
+        date_match = DATE_RE.match(line_strip) if line_strip[:1].isdigit() else None
+        if want_tx and date_match and not _has_tx_exclude_keyword(line_lower):
+            return TRANSACTION, line_strip, line_lower, date_match
+
+        # 4. Holdings
+        if want_closing and CLOSING_UNIT_BALANCE in line_lower:
+            return CLOSING_BALANCE, line_strip, line_lower, None
+
+        if want_rows and not date_match and len(line_strip) > 15 and not _has_blacklisted_keyword(line_lower):
+            if len(DECIMAL_RE.findall(line_strip)) >= 2:
+                return ROW_HOLDING, line_strip, line_lower, None
+
+        return NOISE, line_strip, line_lower, None
+
+    return classify
+
+
+# Generic classifier: every heuristic, for layouts no specialised parser recognises
+classify_line = make_classifier()
@@ -1,206 +1,370 @@
-
-import pdfplumber
-import pandas as pd
 import re
-from .isin_lookup import get_scheme_name as lookup_isin_name
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from .isin_lookup import get_scheme_names
+from .pdf_text import (
+    PDF_PARSE_WORKERS, PDF_PRESCAN, get_backend, describe_source, use_parallel,
+    extract_pages_parallel, scan_data_pages, is_data_page, first_page_text, worker_source,
+)
+from .line_classifier import (
+    classify_line, make_classifier, flow_direction,
+    FOLIO, ISIN_HEADER, FUND_NAME, SUMMARY, TRANSACTION, CLOSING_BALANCE, ROW_HOLDING,
+    ISIN_LABEL_RE, TRAILING_BRACKET_RE, DECIMAL_RE, SIGNED_AMOUNT_RE,
+    COST_VALUE_RE, MARKET_VALUE_RE,
+)
+from .statement_formats import StatementFormat, GENERIC, register_format, get_format, detect_format
 
-async def parse_cam_pdf(file_path: str, password: str = None):
-    print(f"Opening PDF: {file_path}")
-    items = []
+def _new_parse_state() -> dict:
+    """Context carried from line to line (and page to page) while interpreting a statement."""
+    return {
+        "fund": "Unknown Scheme",
+        "isin": None,
+        "folio": None,  # Track Folio Number
+        "pending_fund_name": None,  # Track multi-line fund names
+        "isins": {},  # Distinct ISINs seen, in order (resolved to official names after the scan)
+    }
+
+def _to_floats(numbers: list) -> list:
+    return [float(n.replace(',', '')) for n in numbers]
+
+# Units x NAV may differ from the printed amount by stamp duty / load and rounding
+UNIT_AMOUNT_TOLERANCE = 0.02
+
+def _unit_fields(numbers: list, amount: float) -> dict:
+    """
+    Units, NAV and running unit balance from a transaction line's figures
+    ("<amount> <units> <NAV> <unit balance>"). Units are signed by their effect
+    on the holding (purchases +, redemptions -). Empty when the line has no
+    such columns or they do not agree with the amount.
+    """
+    if len(numbers) < 4 or not amount:
+        return {}
+    units, nav, balance = (abs(n) for n in numbers[1:4])
+    if units <= 0 or nav <= 0 or abs(units * nav - abs(amount)) > UNIT_AMOUNT_TOLERANCE * abs(amount):
+        return {}
+    return {"units": units if amount < 0 else -units, "nav": nav, "unit_balance": balance}
+
+def _interpret_lines(lines, state: dict, items: list, classify=classify_line):
+    """Turn classified statement lines into parsed items, updating `state` as headers are seen."""
+    for line in lines:
+        kind, line_strip, line_lower, match = classify(line)
+
+        if kind == FOLIO:
+            state["folio"] = match.group(1).replace(" ", "")
+            state["pending_fund_name"] = None  # Reset pending on new folio
+
+        elif kind == ISIN_HEADER:
+            state["isin"] = match.group(1)
+            # Extract Name: Try to combine pending (previous line) + current line
+            clean_name = line_strip
+
+            # If line starts with (Demat) or similar, use pending fund name
+            pending = state["pending_fund_name"]
+            if pending and line_strip.startswith("("):
+                clean_name = pending + " " + line_strip
+
+            if "Advisor" in clean_name:
+                clean_name = clean_name.split("Advisor")[0]
+            # Remove ISIN from name
+            clean_name = ISIN_LABEL_RE.sub('', clean_name)
+            # Remove trailing brackets (Demat/Advisor info)
+            clean_name = TRAILING_BRACKET_RE.sub('', clean_name)
+            clean_name = TRAILING_BRACKET_RE.sub('', clean_name)  # Double pass for nested
+
+            state["fund"] = clean_name.strip().rstrip('-').strip()
+            # Official AMFI name is patched in after the scan (see _apply_official_names)
+            state["isins"][state["isin"]] = None
+
+            state["pending_fund_name"] = None
+
+        elif kind == FUND_NAME:
+            state["pending_fund_name"] = line_strip
+
+        elif kind == SUMMARY:
+            # Capture Global Summary if it looks like the main table total
+            # "Total 2,636,705.02 2,834,204.06"
+            numbers = DECIMAL_RE.findall(line_strip)
+            if len(numbers) >= 2:
+                clean_nums = _to_floats(numbers)
+                items.append({
+                    "type": "portfolio_summary",
+                    "description": "Portfolio Total",
+                    "amount": clean_nums[0], # Cost
+                    "current_value": clean_nums[1] # Value
+                })
+
+        elif kind == TRANSACTION:
+            numbers = SIGNED_AMOUNT_RE.findall(line_strip)
+            if numbers:
+                figures = _to_floats(numbers)
+                amount = figures[0]
+
+                # Flow Direction
+                direction = flow_direction(line_lower)
+                if direction > 0:
+                    amount = abs(amount) # Inflow (+)
+                elif direction < 0:
+                    amount = -abs(amount) # Outflow (-)
+
+                items.append({
+                    "date": match.group(1),
+                    "description": state["fund"], # Link to Fund!
+                    "isin": state["isin"],
+                    "folio": state["folio"],
+                    "amount": amount,
+                    "type": "transaction",
+                    "raw_desc": line_strip, # Keep original details
+                    **_unit_fields(figures, amount)
+                })
+
+        elif kind == CLOSING_BALANCE:
+            # Format: "Total Cost Value: 41,605.00" or "Market Value on DATE: INR 43,499.20"
+            cost_match = COST_VALUE_RE.search(line_strip)
+            value_match = MARKET_VALUE_RE.search(line_strip)
+
+            cost = float(cost_match.group(1).replace(',', '')) if cost_match else 0.0
+            val = float(value_match.group(1).replace(',', '')) if value_match else 0.0
+
+            # Fallback: use last number as value if patterns didn't match
+            if val == 0:
+                numbers = DECIMAL_RE.findall(line_strip)
+                if numbers:
+                    val = float(numbers[-1].replace(',', ''))
+
+            if val > 0:
+                items.append({
+                    "date": "Current",
+                    "description": state["fund"],
+                    "isin": state["isin"],
+                    "folio": state["folio"],
+                    "amount": cost,
+                    "current_value": val,
+                    "type": "holding"
+                })
+
+        elif kind == ROW_HOLDING:
+            # Row-based Holding (for non-Transaction PDFs). The generic classifier
+            # consumes ISIN-bearing rows as headers, so the row inherits the current
+            # context; depository layouts classify them here with their ISIN match.
+            description = state["fund"]
+            if match:
+                state["isin"] = match.group(1)
+                state["isins"][state["isin"]] = None
+                description = DECIMAL_RE.split(line_strip.replace(state["isin"], ""), 1)[0].strip()
+            sorted_nums = sorted(_to_floats(DECIMAL_RE.findall(line_strip)), reverse=True)
+            items.append({
+                "date": "Current",
+                "description": description,
+                "isin": state["isin"],
+                "folio": state["folio"],
+                "amount": sorted_nums[1],
+                "current_value": sorted_nums[0],
+                "type": "holding"
+            })
+
+# CAMS consolidated account summary row:
+# "<folio> <ISIN> <code> - <name...> <cost> <units> <NAV date> <NAV> <market value> <registrar>"
+SUMMARY_ROW_RE = re.compile(
+    r'^(\d+(?:\s*/\s*\d+)?)\s*(INF\w{9})\s+(.*?)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+'
+    r'\d{2}-[A-Za-z]{3}-\d{4}\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)\s+\S+\s*$'
+)
+
+def _interpret_summary_lines(lines, state: dict, items: list):
+    """CAMS summary: one holding per table row, fund names wrapping onto following lines."""
+    for line in lines:
+        line_strip = line.strip()
+        row = SUMMARY_ROW_RE.match(line_strip) if 'INF' in line_strip else None
+        if row:
+            folio, isin, name, cost, _units, _nav, value = row.groups()
+            state["isin"] = isin
+            state["folio"] = folio.replace(" ", "")
+            state["isins"][isin] = None
+            item = {
+                "date": "Current",
+                "description": name,
+                "isin": isin,
+                "folio": state["folio"],
+                "amount": float(cost.replace(',', '')),
+                "current_value": float(value.replace(',', '')),
+                "type": "holding"
+            }
+            items.append(item)
+            state["pending_fund_name"] = item  # Row whose name may continue on the next lines
+            continue
+
+        line_lower = line_strip.lower()
+        if line_lower.startswith("total"):
+            numbers = DECIMAL_RE.findall(line_strip)
+            if len(numbers) >= 2:
+                clean_nums = _to_floats(numbers)
+                items.append({
+                    "type": "portfolio_summary",
+                    "description": "Portfolio Total",
+                    "amount": clean_nums[0],
+                    "current_value": clean_nums[1]
+                })
+            state["pending_fund_name"] = None
+            continue
+
+        item = state["pending_fund_name"]
+        if item is None:
+            continue
+        if not line_strip or 'page' in line_lower or 'statement' in line_lower:
+            state["pending_fund_name"] = None  # Page footer / header ends the wrapped name
+            continue
+        name = item["description"] + " " + line_strip
+        item["description"] = TRAILING_BRACKET_RE.sub('', TRAILING_BRACKET_RE.sub('', name)).strip()
+
+def _lines_interpreter(classify):
+    def interpret(lines, state: dict, items: list):
+        _interpret_lines(lines, state, items, classify)
+    return interpret
+
+# Built-in layouts, in detection order (first page markers; first match wins)
+register_format(StatementFormat(
+    "nsdl_cdsl", "NSDL / CDSL depository CAS",
+    _lines_interpreter(make_classifier({FOLIO, TRANSACTION, SUMMARY}, isin_rows=True)),
+    markers=(r'Consolidated Account Statement', r'\b(?:NSDL|CDSL)\b', r'\bDP\s*Id|\bBO\s*ID|Depository Participant'),
+))
+register_format(StatementFormat(
+    "cams_summary", "CAMS / KFintech consolidated account summary",
+    _interpret_summary_lines,
+    markers=(r'Consolidated Account Summary',),
+))
+register_format(StatementFormat(
+    "kfintech", "KFintech detailed CAS",
+    _lines_interpreter(make_classifier({FOLIO, ISIN_HEADER, FUND_NAME, TRANSACTION, CLOSING_BALANCE, SUMMARY})),
+    markers=(r'Consolidated Account Statement', r'KFin\s*Technologies|kfintech\.com|Karvy'),
+    exclude=(r'camsonline|Computer Age Management',),
+))
+register_format(StatementFormat(
+    "cams_detailed", "CAMS detailed CAS",
+    _lines_interpreter(make_classifier({FOLIO, ISIN_HEADER, FUND_NAME, TRANSACTION, CLOSING_BALANCE, SUMMARY})),
+    markers=(r'Consolidated Account Statement',),
+))
+register_format(StatementFormat(GENERIC, "Unrecognised layout (all heuristics)", _interpret_lines))
+
+async def _apply_official_names(items: list, isins) -> None:
+    """Resolve all distinct ISINs in one batch (see get_scheme_details_many) and patch official names into the items."""
+    names = await get_scheme_names(list(isins))
+    for item in items:
+        name = names.get(item.get("isin"))
+        if name:
+            item["description"] = name
+
+async def iter_cam_pdf(source, password: str = None, workers: int = None, resolve_names: bool = True,
+                       backend: str = None, statement_type: str = None, stats: dict = None,
+                       pooled: bool = False):
+    """
+    Async generator yielding the parsed items of each page as soon as that page is done.
+
+    `source` is a file path, an in-memory buffer (bytes / bytearray / memoryview,
+    e.g. the upload body, read without a temp file) or a seekable file object.
+    Page text comes from the `backend` text extractor, or the one configured
+    for `statement_type` (see pdf_text.get_backend). Unless `statement_type`
+    names a registered format, the layout is fingerprinted from the first page
+    and lines go through that format's specialised interpreter (see
+    statement_formats). Boilerplate pages (no
+    folio, ISIN, dated line or amount) are found by a cheap pre-scan and never
+    laid out; page counts are written into `stats` if a dict is given.
+
+    Each page's layout and object caches are released once its text has been
+    extracted, so memory stays flat as statement size grows. Long statements
+    have their page text extracted in a process pool (`workers` processes,
+    default PDF_PARSE_WORKERS); the stateful line interpretation always runs
+    sequentially over the ordered page texts. With `pooled`, extraction goes to
+    the pool whatever the length (several statements parsed side by side then
+    each get their own worker instead of sharing this process).
+
+    ISIN -> official scheme name lookups never run inside the page loop: the
+    distinct ISINs are resolved in one batch once the last page is read, and
+    the names are patched into the already-yielded item dicts in place.
+    """
+    print(f"Opening PDF: {describe_source(source)}")
+    workers = workers or PDF_PARSE_WORKERS
+    
+    stats = stats if stats is not None else {}
     
     try:
-        with pdfplumber.open(file_path, password=password) as pdf:
-            current_fund = "Unknown Scheme"
-            current_isin = None
-            current_folio = None  # Track Folio Number
-            pending_fund_name = None  # Track multi-line fund names
+        started = time.perf_counter()
+        if statement_type:
+            fmt = get_format(statement_type)
+        else:
+            fmt = detect_format(await asyncio.to_thread(first_page_text, source, password))
+        text_backend = get_backend(backend, fmt.name)
+        page_count = await asyncio.to_thread(text_backend.page_count, source, password)
+        pages = list(range(page_count))
+        # PDFium's text is already the cheapest extraction; pre-scanning would read every page twice
+        if PDF_PRESCAN and text_backend.name != "pdfium":
+            pages = await asyncio.to_thread(scan_data_pages, source, password)
+        stats.update(format=fmt.name, backend=text_backend.name, pages=page_count,
+                     skipped_pages=page_count - len(pages))
+
+        if use_parallel(source, len(pages), workers) or (pooled and pages and worker_source(source) is not None):
+            print(f"DEBUG: Extracting {len(pages)} pages with {workers} workers ({text_backend.name})")
+            page_texts = _as_async(await extract_pages_parallel(source, password, pages, workers, text_backend.name))
+        else:
+            page_texts = _iter_page_texts(text_backend.iter_pages(source, password, pages))
+        
+        state = _new_parse_state()
+        items = []
+        async for text in page_texts:
+            if not is_data_page(text):
+                stats["skipped_pages"] += 1
+                continue
             
-            for page in pdf.pages:
-                text = page.extract_text()
-                if not text:
-                    continue
-                
-                lines = text.split('\n')
-                for line in lines:
-                    line_strip = line.strip()
-                    line_lower = line_strip.lower()
-                    
-                    # 0. Detect Folio Number (e.g., "Folio No: 21961126 / 89")
-                    folio_match = re.search(r'Folio\s*(?:No)?:?\s*(\d+\s*/\s*\d+|\d+)', line_strip, re.IGNORECASE)
-                    if folio_match:
-                        current_folio = folio_match.group(1).replace(" ", "")
-                        pending_fund_name = None  # Reset pending on new folio
-                        continue
-                    
-                    # 1. Detect Fund Header (ISIN/Name)
-                    isin_match = re.search(r'(INF\w{9})', line_strip)
-                    if isin_match:
-                        current_isin = isin_match.group(1)
-                        # Extract Name: Try to combine pending (previous line) + current line
-                        clean_name = line_strip
-                        
-                        # If line starts with (Demat) or similar, use pending fund name
-                        if pending_fund_name and line_strip.startswith("("):
-                            clean_name = pending_fund_name + " " + line_strip
-                        
-                        if "Advisor" in clean_name:
-                            clean_name = clean_name.split("Advisor")[0]
-                        # Remove ISIN from name
-                        clean_name = re.sub(r'ISIN:?\s*INF\w{9}', '', clean_name)
-                        # Remove trailing brackets (Demat/Advisor info)
-                        clean_name = re.sub(r'\([^)]*\)\s*$', '', clean_name)
-                        clean_name = re.sub(r'\([^)]*\)\s*$', '', clean_name)  # Double pass for nested
-                        
-                        current_fund = clean_name.strip().rstrip('-').strip()
-                        
-                        # Always try to get official name from AMFI data
-                        amfi_name = await lookup_isin_name(current_isin)
-                        if amfi_name:
-                            current_fund = amfi_name
-                        
-                        pending_fund_name = None
-                        continue # Header processed
-                    
-                    # Check if this line looks like a fund name (for next ISIN line)
-                    # Patterns: "XXXX-Fund Name" OR lines containing fund keywords
-                    if 'INF' not in line_strip and not line_strip.startswith("("):
-                        is_fund_name = False
-                        # Pattern 1: Starts with "XXXX-"
-                        if re.match(r'^[A-Z0-9]{3,8}-', line_strip):
-                            is_fund_name = True
-                        # Pattern 2: Contains fund-related keywords
-                        fund_keywords = ['equity', 'debt', 'hybrid', 'balanced', 'bluechip', 
-                                         'flexi', 'growth', 'liquid', 'overnight', 'gilt',
-                                         'arbitrage', 'elss', 'index']
-                        if any(kw in line_lower for kw in fund_keywords):
-                            is_fund_name = True
-                        
-                        if is_fund_name:
-                            pending_fund_name = line_strip
-                            continue
-                    
-                    # 2. Skip Noise
-                    if "statement" in line_lower or "page" in line_lower:
-                        continue
-                    if line_lower.startswith("total"):
-                        # Capture Global Summary if it looks like the main table total
-                        # "Total 2,636,705.02 2,834,204.06"
-                        numbers = re.findall(r'([\d,]+\.\d+)', line_strip)
-                        if len(numbers) >= 2:
-                             clean_nums = [float(n.replace(',', '')) for n in numbers]
-                             items.append({
-                                "type": "portfolio_summary",
-                                "description": "Portfolio Total",
-                                "amount": clean_nums[0], # Cost
-                                "current_value": clean_nums[1] if len(clean_nums) > 1 else 0 # Value
-                             })
-                        continue
-                    if "mutual fund" in line_lower and "fund" in line_lower:
-                        continue
-
-                    # 3. Detect Transactions (Date Start)
-                    # Regex: Start with Date (DD-Mon-YYYY or DD/MM/YYYY)
-                    date_match = re.search(r'^\s*(\d{2}[-./](?:[A-Za-z]{3}|\d{2})[-./]\d{4})', line_strip)
-                    if date_match and "stamp duty" not in line_lower and "charges" not in line_lower:
-                        # It's a transaction!
-                        date_str = date_match.group(1)
-                        
-                        numbers = re.findall(r'(-?[\d,]+\.\d{2,4})', line_strip)
-                        if numbers:
-                            clean_nums = [float(n.replace(',', '')) for n in numbers]
-                            amount = clean_nums[0] # Fallback
-                            amount = clean_nums[0]
-                            
-                            # Flow Direction
-                            if any(x in line_lower for x in ["redemption", "sell", "switch out", "dividend payout"]):
-                                amount = abs(amount) # Inflow (+)
-                            elif any(x in line_lower for x in ["purchase", "sip", "switch in", "reinvestment", "systematic", "investment"]):
-                                amount = -abs(amount) # Outflow (-)
-                            
-                            items.append({
-                                "date": date_str,
-                                "description": current_fund, # Link to Fund!
-                                "isin": current_isin,
-                                "folio": current_folio,  # Add Folio
-                                "amount": amount,
-                                "type": "transaction",
-                                "raw_desc": line_strip # Keep original details
-                            })
-                        continue
-
-                    # 4. Detect Holdings (Closing Balance OR Row Summary)
-                    # Strategy A: Closing Unit Balance
-                    if "closing unit balance" in line_lower:
-                        # Try to extract "Total Cost Value" and "Market Value" from the line
-                        # Format: "Total Cost Value: 41,605.00" or "Market Value on DATE: INR 43,499.20"
-                        cost_match = re.search(r'Total\s*Cost\s*Value:?\s*([\d,]+\.?\d*)', line_strip, re.IGNORECASE)
-                        value_match = re.search(r'Market\s*Value[^:]*:\s*(?:INR\s*)?([\d,]+\.?\d*)', line_strip, re.IGNORECASE)
-                        
-                        cost = 0.0
-                        val = 0.0
-                        
-                        if cost_match:
-                            cost = float(cost_match.group(1).replace(',', ''))
-                        if value_match:
-                            val = float(value_match.group(1).replace(',', ''))
-                        
-                        # Fallback: use last number as value if patterns didn't match
-                        if val == 0:
-                            numbers = re.findall(r'([\d,]+\.\d+)', line_strip)
-                            if numbers:
-                                val = float(numbers[-1].replace(',', ''))
-                        
-                        if val > 0:
-                            items.append({
-                                "date": "Current",
-                                "description": current_fund,
-                                "isin": current_isin,
-                                "folio": current_folio,
-                                "amount": cost,  # Now using extracted Total Cost Value!
-                                "current_value": val,
-                                "type": "holding"
-                            })
-                        continue
-
-                    # Strategy B: Row-based Holding (for non-Transaction PDFs)
-                    if not date_match:
-                         numbers = re.findall(r'([\d,]+\.\d+)', line_strip)
-                         if len(numbers) >= 2 and len(line_strip) > 15:
-                             # Check blacklist again
-                             if any(x in line_lower for x in ["purchase", "sip", "redemption", "switch", "dividend", "stt", "stamp", "advisor", "registra", "sys. investment", "charges"]):
-                                 continue
-                             
-                             # Extract potential ISIN from THIS line (if not captured in header loop)
-                             # This handles "one-liner" holdings in Summary PDF
-                             row_isin_match = re.search(r'(INF\w{9})', line_strip)
-                             row_fund_name = current_fund
-                             
-                             if row_isin_match:
-                                 # Override current context for this line
-                                 current_isin = row_isin_match.group(1)
-                                 row_fund_name = line_strip.replace(current_isin, "")
-                                 row_fund_name = re.sub(r'[\d,]+\.\d+.*$', '', row_fund_name).strip()
-                            
-                             # Values
-                             clean_nums = [float(n.replace(',', '')) for n in numbers]
-                             sorted_nums = sorted(clean_nums, reverse=True)
-                             current_value = sorted_nums[0]
-                             cost = sorted_nums[1] if len(sorted_nums) > 1 else 0.0
-                             
-                             items.append({
-                                "date": "Current",
-                                "description": row_fund_name,
-                                "isin": current_isin,
-                                "folio": current_folio,  # Add Folio
-                                "amount": cost,
-                                "current_value": current_value,
-                                "type": "holding"
-                             })
+            page_items = []
+            fmt.interpret(text.split('\n'), state, page_items)
+            if page_items:
+                items.extend(page_items)
+                yield page_items
+
+        fmt.record(page_count, time.perf_counter() - started)  # Parse throughput, excluding name lookups
+        if resolve_names and state["isins"]:
+            await _apply_official_names(items, state["isins"])
+        print(f"DEBUG: Parsed {stats['pages']} pages as {fmt.name}, skipped {stats['skipped_pages']} boilerplate pages")
 
+    except asyncio.CancelledError:
+        raise  # The caller went away; not a parse failure
     except Exception as e:
         import traceback
         print(f"Error parsing PDF: {repr(e)}")
         print(traceback.format_exc())
         raise ValueError(f"Failed to parse PDF: {str(e)}")
-        
+
+_PAGES_DONE = object()
+
+async def _iter_page_texts(pages):
+    """
+    Drive a backend's blocking page iterator on a dedicated thread, one page at a time.
+
+    Every next() and the final close() run on that one thread, in order: if the
+    consumer is cancelled while a page is being laid out, the close is queued
+    behind it instead of hitting a generator that is still executing.
+    """
+    loop = asyncio.get_running_loop()
+    thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-pages")
+    try:
+        while True:
+            # Layout analysis is blocking; keep the event loop free while it runs
+            text = await loop.run_in_executor(thread, next, pages, _PAGES_DONE)
+            if text is _PAGES_DONE:
+                break
+            yield text
+    finally:
+        thread.submit(pages.close)  # Release the document even if the consumer stops early
+        thread.shutdown(wait=False)
+
+async def _as_async(texts: list):
+    for text in texts:
+        yield text
+
+async def parse_cam_pdf(source, password: str = None, workers: int = None, resolve_names: bool = True,
+                        backend: str = None, statement_type: str = None, stats: dict = None):
+    """Parse a CAS PDF (path, bytes or file object) into a list of transaction / holding / summary items."""
+    items = []
+    async for page_items in iter_cam_pdf(source, password, workers, resolve_names, backend, statement_type, stats):
+        items.extend(page_items)
     return items
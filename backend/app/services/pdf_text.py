@@ -0,0 +1,277 @@
+"""
+PDF page-text extraction.
+
+Text extraction is pluggable. Every backend turns a statement source into
+one text string per page, one statement line per text line:
+
+- "pdfplumber": `page.extract_text()`, full character clustering (the original path)
+- "pdfminer":   raw pdfminer layout with tuned LAParams (no reading-order
+                analysis, no vertical text), lines regrouped by baseline
+- "pdfium":     PDFium's native character stream, no Python layout at all
+
+The backend is chosen per call, per statement type (PDF_TEXT_BACKENDS) or
+globally (PDF_TEXT_BACKEND); bench_pdf_backends.py checks which backends give
+identical items on a statement corpus. Layout analysis dominates the cost of
+parsing long statements, so large PDFs can also be split into page ranges and
+extracted in a process pool.
+
+Consolidated statements also carry pages of disclaimers, nominee details and
+glossary text. Before a layout-heavy backend runs, a PDFium pre-scan (native
+text, milliseconds per page) finds the pages that carry no folio, ISIN, dated
+line or amount; those pages cannot produce items or change parser state, so
+they are never laid out. This module deliberately imports nothing from the
+rest of the app, so pool workers start without touching the database or config.
+"""
+import io
+import os
+import re
+import asyncio
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+import pdfplumber
+import pypdfium2 as pdfium
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LAParams, LTTextContainer, LTTextLine
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+
+# Number of worker processes for page-parallel extraction (0 = one per CPU)
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", "0")) or (os.cpu_count() or 1)
+# Statements shorter than this are extracted in-process (pool overhead dominates)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+# Default text backend, and per statement type overrides ("cams_summary=pdfium,kfintech=pdfminer")
+PDF_TEXT_BACKEND = os.getenv("PDF_TEXT_BACKEND", "pdfplumber")
+PDF_TEXT_BACKENDS = dict(
+    pair.split("=", 1) for pair in os.getenv("PDF_TEXT_BACKENDS", "").replace(" ", "").split(",") if "=" in pair
+)
+# Skip boilerplate pages (no folio / ISIN / dated line / amount) before full extraction
+PDF_PRESCAN = os.getenv("PDF_PRESCAN", "1") != "0"
+
+# Anything the line parser acts on: folio number, ISIN, line starting with a date, decimal amount
+DATA_PAGE_RE = re.compile(
+    r'folio\s*(?:no)?:?\s*\d|INF\w{9}|^\s*\d{2}[-./](?:[A-Za-z]{3}|\d{2})[-./]\d{4}|\d\.\d',
+    re.IGNORECASE | re.MULTILINE,
+)
+
+_pool = None
+
+
+def as_pdf_input(source):
+    """
+    Turn a statement source into something pdfplumber.open accepts.
+
+    Paths are passed through; in-memory buffers (bytes / bytearray / memoryview)
+    are wrapped in a BytesIO, which shares an immutable bytes object's buffer
+    rather than copying it; file objects (e.g. a spooled upload) are rewound
+    and used directly.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def describe_source(source) -> str:
+    if isinstance(source, (str, os.PathLike)):
+        return str(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f"<in-memory PDF, {len(source)} bytes>"
+    return f"<{type(source).__name__}>"
+
+
+def worker_source(source):
+    """Picklable form of `source` for pool workers (path or bytes), or None if it has none."""
+    if isinstance(source, (str, os.PathLike, bytes)):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    return None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Shared extraction pool, created on first use."""
+    global _pool
+    if _pool is None:
+        # 'spawn' avoids forking a process that already runs an event loop and threads
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+@contextmanager
+def _binary_stream(source):
+    pdf_input = as_pdf_input(source)
+    if isinstance(pdf_input, (str, os.PathLike)):
+        with open(pdf_input, "rb") as fp:
+            yield fp
+    else:
+        yield pdf_input
+
+
+class PdfplumberBackend:
+    """pdfplumber's full character clustering (the original extraction path)."""
+    name = "pdfplumber"
+
+    def page_count(self, source, password: str = None) -> int:
+        with pdfplumber.open(as_pdf_input(source), password=password) as pdf:
+            return len(pdf.pages)
+
+    def iter_pages(self, source, password: str = None, pages: list = None):
+        numbers = [i + 1 for i in pages] if pages is not None else None
+        with pdfplumber.open(as_pdf_input(source), password=password, pages=numbers) as pdf:
+            for page in pdf.pages:
+                text = page.extract_text()
+                page.close()  # Drop this page's cached chars/layout before moving on
+                yield text
+
+
+class PdfminerBackend:
+    """Raw pdfminer layout with tuned LAParams; text lines are regrouped by baseline."""
+    name = "pdfminer"
+    # boxes_flow=None skips the reading-order analysis; statements have no vertical text
+    laparams = dict(line_overlap=0.5, char_margin=2.0, word_margin=0.1, line_margin=0.5,
+                    boxes_flow=None, detect_vertical=False, all_texts=False)
+    y_tolerance = 3
+
+    def page_count(self, source, password: str = None) -> int:
+        with _binary_stream(source) as fp:
+            doc = PDFDocument(PDFParser(fp), password or "")
+            return sum(1 for _ in PDFPage.create_pages(doc))
+
+    def iter_pages(self, source, password: str = None, pages: list = None):
+        wanted = set(pages) if pages is not None else None
+        with _binary_stream(source) as fp:
+            doc = PDFDocument(PDFParser(fp), password or "")
+            rsrcmgr = PDFResourceManager(caching=True)
+            device = PDFPageAggregator(rsrcmgr, laparams=LAParams(**self.laparams))
+            interpreter = PDFPageInterpreter(rsrcmgr, device)
+            for i, page in enumerate(PDFPage.create_pages(doc)):
+                if wanted is not None and i not in wanted:
+                    continue
+                interpreter.process_page(page)
+                yield self._layout_text(device.get_result())
+
+    def _layout_text(self, layout) -> str:
+        fragments = []
+        stack = list(layout)
+        while stack:
+            obj = stack.pop()
+            if isinstance(obj, LTTextLine):
+                text = obj.get_text().strip()
+                if text:
+                    fragments.append((-obj.y1, obj.x0, text))
+            elif isinstance(obj, LTTextContainer):
+                stack.extend(obj)
+        # Fragments whose tops are within y_tolerance share a printed line
+        lines = []
+        last_top = None
+        for top, x0, text in sorted(fragments):
+            if last_top is None or top - last_top > self.y_tolerance:
+                lines.append([])
+                last_top = top
+            lines[-1].append((x0, text))
+        return "\n".join(" ".join(t for _, t in sorted(line)) for line in lines)
+
+
+class PdfiumBackend:
+    """PDFium's native text stream (C++), no Python-side layout analysis."""
+    name = "pdfium"
+
+    def page_count(self, source, password: str = None) -> int:
+        doc = pdfium.PdfDocument(as_pdf_input(source), password=password)
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+
+    def iter_pages(self, source, password: str = None, pages: list = None):
+        doc = pdfium.PdfDocument(as_pdf_input(source), password=password)
+        try:
+            for i in (range(len(doc)) if pages is None else pages):
+                page = doc[i]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                yield text.replace("\r\n", "\n").replace("\r", "\n")
+        finally:
+            doc.close()
+
+
+TEXT_BACKENDS = {b.name: b for b in (PdfplumberBackend(), PdfminerBackend(), PdfiumBackend())}
+
+
+def get_backend(name: str = None, statement_type: str = None):
+    """Backend by explicit name, else the statement type's configured backend, else the default."""
+    name = name or PDF_TEXT_BACKENDS.get(statement_type) or PDF_TEXT_BACKEND
+    if name not in TEXT_BACKENDS:
+        raise ValueError(f"Unknown PDF text backend: {name}")
+    return TEXT_BACKENDS[name]
+
+
+def is_data_page(text: str) -> bool:
+    return bool(text) and DATA_PAGE_RE.search(text) is not None
+
+
+def scan_data_pages(source, password: str = None) -> list:
+    """0-based indices of the pages worth a full extraction, from PDFium's native text."""
+    return [i for i, text in enumerate(TEXT_BACKENDS["pdfium"].iter_pages(source, password)) if is_data_page(text)]
+
+
+def first_page_text(source, password: str = None) -> str:
+    """First page's PDFium text, for fingerprinting the statement layout."""
+    return next(TEXT_BACKENDS["pdfium"].iter_pages(source, password, [0]), "") or ""
+
+
+def extract_pages(source, password: str, pages: list, backend: str = PDF_TEXT_BACKEND) -> list:
+    """Extract text for the given pages (0-based) of a path or bytes. Runs inside a pool worker."""
+    return [text or "" for text in get_backend(backend).iter_pages(source, password, pages)]
+
+
+def page_chunks(pages: list, chunks: int) -> list:
+    """Split an ordered page list into at most `chunks` contiguous, ordered runs."""
+    chunks = max(1, min(chunks, len(pages)))
+    size, extra = divmod(len(pages), chunks)
+    runs = []
+    start = 0
+    for i in range(chunks):
+        end = start + size + (1 if i < extra else 0)
+        runs.append(pages[start:end])
+        start = end
+    return runs
+
+
+def use_parallel(source, page_count: int, workers: int) -> bool:
+    # File objects cannot be handed to another process; they stay in-process
+    return workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES and worker_source(source) is not None
+
+
+async def extract_pages_parallel(source, password: str, pages: list, workers: int = None,
+                                 backend: str = PDF_TEXT_BACKEND) -> list:
+    """Extract the given page texts of a path or bytes source across the process pool, in page order."""
+    workers = workers or PDF_PARSE_WORKERS
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    source = worker_source(source)
+    futures = [
+        loop.run_in_executor(pool, extract_pages, source, password, run, backend)
+        for run in page_chunks(pages, workers)
+    ]
+    texts = []
+    for chunk in await asyncio.gather(*futures):
+        texts.extend(chunk)
+    return texts
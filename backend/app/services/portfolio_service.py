@@ -1,29 +1,24 @@
 
+import asyncio
 import pandas as pd
 from pyxirr import xirr
 from datetime import date, timedelta
 import numpy as np
-from .isin_lookup import get_scheme_details, clean_scheme_name
+from .isin_lookup import get_scheme_details, get_scheme_details_many, clean_scheme_name
+from .transactions import ItemType, to_transaction_frame, transactions_of, scheme_keys, to_day, today
+from .scheme_name_index import match_scheme_names
 
-def calculate_portfolio_xirr(transactions: list, current_value: float = 0.0):
-    """Calculates XIRR given a list of transactions."""
-    dates = []
-    amounts = []
-    
-    for t in transactions:
-        try:
-            d = pd.to_datetime(t['date']).date()
-            dates.append(d)
-            amounts.append(float(t['amount']))
-        except Exception as e:
-            continue
-            
-    if not dates:
+def calculate_portfolio_xirr(transactions: pd.DataFrame, current_value: float = 0.0):
+    """Calculates XIRR given a typed transaction frame."""
+    tx = transactions[transactions['date'].notna() & transactions['amount'].notna()]
+    if tx.empty:
         return 0.0
         
+    dates = to_day(tx['date'])
+    amounts = tx['amount'].to_numpy(dtype=float)
     if current_value > 0:
-        dates.append(date.today())
-        amounts.append(current_value)
+        dates = np.append(dates, today())
+        amounts = np.append(amounts, current_value)
         
     try:
         result = xirr(dates, amounts)
@@ -34,23 +29,22 @@ def calculate_portfolio_xirr(transactions: list, current_value: float = 0.0):
         print(f"XIRR calculation error: {e}")
         return 0.0
 
-def is_sip_active(transactions: list) -> bool:
+def is_sip_active(transactions: pd.DataFrame) -> bool:
     """Determine if a scheme has an active SIP (Systematic Investment Plan)."""
-    if not transactions:
+    if transactions.empty:
         return False
         
-    purchases = [t for t in transactions if float(t['amount']) < 0]
+    purchases = transactions[transactions['amount'] < 0]
     
     if len(purchases) < 3:
         return False
         
-    try:
-        dates = sorted([pd.to_datetime(t['date']).date() for t in purchases])
-    except:
+    dates = np.sort(to_day(purchases['date'].dropna()))
+    if len(dates) == 0:
         return False
         
     last_date = dates[-1]
-    days_since_last = (date.today() - last_date).days
+    days_since_last = int((today() - last_date).astype(int))
     
     if days_since_last > 45:
         return False
@@ -59,10 +53,7 @@ def is_sip_active(transactions: list) -> bool:
     if len(recent_dates) < 3:
         return False
         
-    intervals = []
-    for i in range(1, len(recent_dates)):
-        delta = (recent_dates[i] - recent_dates[i-1]).days
-        intervals.append(delta)
+    intervals = np.diff(recent_dates).astype(int)
         
     avg_interval = np.mean(intervals)
     std_dev_interval = np.std(intervals)
@@ -74,18 +65,54 @@ def is_sip_active(transactions: list) -> bool:
             
     return False
 
-async def analyze_portfolio(df: pd.DataFrame):
+async def prefetch_scheme_data(isin: str):
+    """Warm the ISIN and NAV caches for a scheme while the rest of a statement is still being parsed."""
+    try:
+        details = await get_scheme_details(isin)
+        if details and details.get('code'):
+            from .analytics_service import fetch_fund_nav
+            await fetch_fund_nav(details['code'])
+    except Exception as e:
+        print(f"DEBUG: Prefetch failed for {isin}: {e}")
+
+def infer_missing_isins(df: pd.DataFrame) -> tuple:
+    """
+    Match the fund names of ISIN-less rows against the AMFI scheme names.
+    Confident matches fill in the ISIN; returns (frame, {description: match}).
+    """
+    missing = df['isin'].isna() & df['description'].notna() & (df['type'] != ItemType.PORTFOLIO_SUMMARY.value)
+    if not missing.any():
+        return df, {}
+    descriptions = df.loc[missing, 'description'].astype(object)
+    matches = {d: m for d, m in match_scheme_names(descriptions).items() if m}
+    confident = {d: m['isin'] for d, m in matches.items() if m['confident']}
+    if confident:
+        isin = df['isin'].astype(object)
+        isin[missing] = descriptions.map(confident)
+        df = to_transaction_frame(df.assign(isin=isin))
+    print(f"DEBUG: Name matching for {descriptions.nunique()} ISIN-less schemes: "
+          f"{len(confident)} confident, {len(matches) - len(confident)} flagged")
+    return df, matches
+
+async def analyze_portfolio(df: pd.DataFrame, reuse: dict = None):
     """
     Performs basic analysis on the portfolio dataframe.
+
+    `reuse` maps scheme keys (ISIN, else description) to holding entries of a
+    previous analysis; those schemes are taken as-is instead of recomputed.
     """
     if df.empty:
         return {}
     
+    # Typed columns (parsed dates, float amounts, categorical ISIN / type); a no-op if already typed
+    df = to_transaction_frame(df)
+    
     if 'current_value' in df.columns:
-        if 'isin' not in df.columns:
-             df['isin'] = None
-        
-        df['group_key'] = df['isin'].fillna(df['description'])
+        # Rows without an ISIN get one from a confident fund-name match (index built off the event loop)
+        df, name_matches = await asyncio.to_thread(infer_missing_isins, df)
+        df['group_key'] = scheme_keys(df)
+        # Every ISIN of the portfolio resolved up front: one DB query, misses fetched concurrently
+        scheme_details = await get_scheme_details_many(df['isin'].dropna().unique())
         
         all_groups = df.groupby('group_key')
         
@@ -93,51 +120,55 @@ async def analyze_portfolio(df: pd.DataFrame):
         total_invested_calc = 0.0
         
         for key, group in all_groups:
-            if group['type'].iloc[0] == 'portfolio_summary':
+            if group['type'].iloc[0] == ItemType.PORTFOLIO_SUMMARY.value:
+                continue
+            if reuse and key in reuse:
+                # Untouched by the latest upload (incremental ingestion)
+                scheme_data = dict(reuse[key])
+                scheme_data.pop('score', None)  # Scores are relative to the whole portfolio
+                total_invested_calc += max(scheme_data.get('amount', 0), 0)
+                held_schemes.append(scheme_data)
                 continue
                 
-            scheme_txs = group[group['type'] == 'transaction'].to_dict('records')
-            scheme_holdings = group[group['type'] == 'holding']
+            scheme_txs = transactions_of(group)
+            scheme_holdings = group[group['type'] == ItemType.HOLDING.value]
             
             scheme_current_val = scheme_holdings['current_value'].sum()
             
             holdings_cost = scheme_holdings['amount'].sum()
             
             tx_net_invested = 0.0
-            if scheme_txs:
-                tx_net_invested = -sum(t['amount'] for t in scheme_txs)
+            if not scheme_txs.empty:
+                tx_net_invested = -scheme_txs['amount'].sum()
             
             net_invested = holdings_cost if holdings_cost > 0 else tx_net_invested
                 
             total_invested_calc += max(net_invested, 0)
             
             scheme_xirr = 0.0
-            if scheme_txs and scheme_current_val > 0:
+            if not scheme_txs.empty and scheme_current_val > 0:
                  scheme_xirr = calculate_portfolio_xirr(scheme_txs, scheme_current_val)
             if scheme_xirr != scheme_xirr:  # NaN check
                 scheme_xirr = 0.0
             
             best_desc = group['description'].iloc[0]
-            best_isin = group['isin'].iloc[0] if 'isin' in group.columns else None
+            best_isin = group['isin'].iloc[0]
+            if pd.isna(best_isin):
+                best_isin = None
             
             if best_desc == "Unknown Scheme":
                 continue
             
             days_invested = 0
-            if scheme_txs:
-                try:
-                    dates = [pd.to_datetime(t['date']).date() for t in scheme_txs]
-                    if dates:
-                        first_tx_date = min(dates)
-                        days_invested = (date.today() - first_tx_date).days
-                except Exception as e:
-                    print(f"Date calculation error: {e}")
+            if not scheme_txs.empty:
+                first_tx_date = scheme_txs['date'].iloc[0]  # Sorted oldest first
+                days_invested = (pd.Timestamp(date.today()) - first_tx_date).days
 
             if scheme_current_val > 0 or net_invested > 0:
                 scheme_name = clean_scheme_name(best_desc)  # Clean the fallback name
                 try:
                     if best_isin:
-                        details = await get_scheme_details(best_isin)
+                        details = scheme_details.get(best_isin)
                         if details and details.get('name'):
                             scheme_name = details['name'] # Already cleaned by get_scheme_details
                 except:
@@ -153,14 +184,21 @@ async def analyze_portfolio(df: pd.DataFrame):
                     "days_invested": days_invested,
                     "is_sip": is_sip_active(scheme_txs)
                 }
+                match = name_matches.get(best_desc)
+                if match:
+                    # Inferred from the fund name; low-confidence matches are reported, not used
+                    scheme_data['name_match'] = {
+                        "scheme_name": match['name'], "isin": match['isin'], "code": match['code'],
+                        "confidence": match['confidence'], "confident": match['confident'],
+                    }
                 
                 try:
                     from .analytics_service import calculate_analytics
                     
                     if best_isin:
-                        details = await get_scheme_details(best_isin)
+                        details = scheme_details.get(best_isin)
                         if details and details.get('code'):
-                            analytics = calculate_analytics(details['code'])
+                            analytics = await calculate_analytics(details['code'])
                             if analytics:
                                 scheme_data['analytics'] = analytics
                 except Exception as e:
@@ -180,28 +218,29 @@ async def analyze_portfolio(df: pd.DataFrame):
         
         allocation = {}
         try:
-            from .analytics_service import fetch_fund_nav, classify_fund_category
+            from .scheme_metadata import get_scheme_metadata_many
+            # One scheme_metadata query (AMFI master for the gaps); no NAV downloads
+            unclassified = [s['isin'] for s in held_schemes if s.get('isin') and not s.get('asset_class')]
+            codes = {isin: (scheme_details.get(isin) or {}).get('code') for isin in unclassified}
+            metadata = await get_scheme_metadata_many(unclassified, codes)
             for s in held_schemes:
-                isin = s.get('isin')
-                if isin:
-                    details = await get_scheme_details(isin)
-                    if details and details.get('code'):
-                        fund_result = fetch_fund_nav(details['code'])
-                        if fund_result:
-                            category_raw = fund_result.get('category', 'Unknown')
-                            asset_class = classify_fund_category(category_raw)
-                            current_value = s.get('current_value', 0)
-                            allocation[asset_class] = allocation.get(asset_class, 0) + current_value
-                            s['asset_class'] = asset_class
+                if not s.get('asset_class'):
+                    asset_class = (metadata.get(s.get('isin')) or {}).get('asset_class')
+                    if not asset_class:
+                        continue
+                    s['asset_class'] = asset_class
+                # Reused entries are already classified
+                allocation[s['asset_class']] = allocation.get(s['asset_class'], 0) + s.get('current_value', 0)
         except Exception as e:
             print(f"Allocation aggregation error: {e}")
         
         current_val = sum(s['current_value'] for s in held_schemes)
         
-        summary_item = next((r for r in df.to_dict('records') if r.get('type') == 'portfolio_summary'), None)
-        if summary_item:
+        summary_rows = df[df['type'] == ItemType.PORTFOLIO_SUMMARY.value]
+        if not summary_rows.empty:
+            summary_item = summary_rows.iloc[0]
             print(f"Using PDF Summary: Inv {summary_item['amount']}, Val {summary_item['current_value']}")
-            total_invested_calc = summary_item['amount']
+            total_invested_calc = float(summary_item['amount'])
         
         global_xirr = 0.0
         benchmark_xirr = 0.0
@@ -210,17 +249,17 @@ async def analyze_portfolio(df: pd.DataFrame):
         benchmark_stats = {}
         
         if 'type' in df.columns:
-            tx_rows = df[df['type'] == 'transaction'].to_dict('records')
-            if tx_rows:
+            tx_rows = transactions_of(df)
+            if not tx_rows.empty:
                 global_xirr = calculate_portfolio_xirr(tx_rows, current_val)
                 print(f"Calculated Global XIRR: {global_xirr}")
                 
                 try:
                     from .analytics_service import calculate_benchmark_xirr, calculate_growth_comparison
-                    benchmark_xirr = calculate_benchmark_xirr(tx_rows)
+                    benchmark_xirr = await calculate_benchmark_xirr(tx_rows)
                     print(f"Calculated Benchmark XIRR: {benchmark_xirr}")
                     
-                    growth_data = await calculate_growth_comparison(tx_rows)
+                    growth_data = await calculate_growth_comparison(tx_rows, scheme_details=scheme_details)
                     growth_chart = growth_data.get('chart', [])
                     portfolio_stats = growth_data.get('portfolio_stats', {})
                     benchmark_stats = growth_data.get('benchmark_stats', {})
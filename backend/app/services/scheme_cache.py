@@ -0,0 +1,96 @@
+"""
+In-process cache for ISIN -> scheme details, in front of isin_mappings.
+
+Resolved ISINs are remembered for SCHEME_CACHE_TTL_SECONDS, so repeated
+lookups skip the AMFI master / DB / mfapi chain. ISINs nobody could resolve are
+remembered as misses for the shorter SCHEME_CACHE_NEGATIVE_TTL_SECONDS, so an
+unknown or legacy ISIN does not repeat the remote search on every upload but
+is retried soon. Entries are evicted LRU-first past SCHEME_CACHE_MAX_ENTRIES
+and invalidated whenever ISINMapping rows are written or the AMFI master is
+reloaded. Safe to use from the event loop and from worker threads.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+SCHEME_CACHE_MAX_ENTRIES = int(os.getenv("SCHEME_CACHE_MAX_ENTRIES", "20000"))
+SCHEME_CACHE_TTL_SECONDS = int(os.getenv("SCHEME_CACHE_TTL_SECONDS", str(6 * 3600)))
+SCHEME_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("SCHEME_CACHE_NEGATIVE_TTL_SECONDS", str(15 * 60)))
+
+_MISSING = object()
+
+
+class SchemeCache:
+    def __init__(self, max_entries: int, ttl_seconds: int, negative_ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries = OrderedDict()  # isin -> (expires_at, details or None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, isin: str):
+        """Cached details, None for a cached miss, or _MISSING when the ISIN must be looked up."""
+        with self._lock:
+            entry = self._entries.get(isin)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[isin]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(isin)
+            if entry[1] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[1]
+
+    def get_many(self, isins) -> tuple:
+        """(found {isin: details or None}, pending [isin]) for a batch."""
+        found, pending = {}, []
+        for isin in isins:
+            value = self.get(isin)
+            if value is _MISSING:
+                pending.append(isin)
+            else:
+                found[isin] = value
+        return found, pending
+
+    def put(self, isin: str, details: dict):
+        """Remember a lookup result; `details` None records a miss (shorter TTL)."""
+        ttl = self.ttl_seconds if details is not None else self.negative_ttl_seconds
+        with self._lock:
+            self._entries[isin] = (time.monotonic() + ttl, details)
+            self._entries.move_to_end(isin)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, isins=None):
+        """Drop the given ISINs, or everything when `isins` is None."""
+        with self._lock:
+            if isins is None:
+                self._entries.clear()
+            else:
+                for isin in isins:
+                    self._entries.pop(isin, None)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 3) if lookups else 0.0,
+            "miss_rate": round(self.misses / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+scheme_cache = SchemeCache(SCHEME_CACHE_MAX_ENTRIES, SCHEME_CACHE_TTL_SECONDS, SCHEME_CACHE_NEGATIVE_TTL_SECONDS)
@@ -0,0 +1,138 @@
+"""
+Per-ISIN scheme metadata: category, asset class, AMC, plan, option, benchmark.
+
+Asset allocation used to download each scheme's full NAV history just to read
+its category. The scheme_metadata table keeps that classification instead and
+is read with one query per portfolio. It is filled from:
+
+- the local AMFI master (category, AMC, plan, option) for ISINs the table
+  does not have yet;
+- mfapi.in NAV metadata (category, AMC) whenever a NAV history is downloaded
+  anyway;
+- ISIN resolution (scheme code, plan, option), alongside ISINMapping.
+
+Writes go through the batched upsert buffer in isin_mapping_store.
+"""
+from sqlalchemy import select
+from ..core.database import SessionLocal, IN_CLAUSE_CHUNK
+from ..models import SchemeMetadata
+from .amfi_master import amfi_master, scheme_plan, scheme_option
+from .analytics_service import classify_fund_category
+from .isin_mapping_store import metadata_buffer
+
+# Columns shared by every ISIN of a scheme code (plan / option differ per ISIN)
+_SCHEME_COLUMNS = ("scheme_code", "category", "asset_class", "amc", "benchmark")
+
+
+def _classified(category: str) -> dict:
+    return {"category": category, "asset_class": classify_fund_category(category)} if category else {}
+
+
+def metadata_from_name(isin: str, scheme_code: str, name: str) -> dict:
+    """Row for a freshly resolved ISIN: only what its scheme name tells."""
+    return {"isin": isin, "scheme_code": scheme_code,
+            "plan": scheme_plan(name) or None, "option": scheme_option(name) or None}
+
+
+def metadata_from_master(isin: str, entry: dict) -> dict:
+    return {"isin": isin, "scheme_code": entry.get("code"), "amc": entry.get("amc") or None,
+            "plan": entry.get("plan") or scheme_plan(entry.get("name")) or None,
+            "option": scheme_option(entry.get("name")) or None,
+            **_classified(entry.get("category"))}
+
+
+def metadata_from_nav(meta: dict) -> list:
+    """Rows from the `meta` block of an mfapi.in /mf/{code} response (one per ISIN it lists)."""
+    isins = [meta.get(key) for key in ("isin_growth", "isin_div_reinvestment")]
+    name = meta.get("scheme_name")
+    return [{"isin": isin, "scheme_code": str(meta.get("scheme_code") or "") or None,
+             "amc": meta.get("fund_house") or None,
+             "plan": scheme_plan(name) or None, "option": scheme_option(name) or None,
+             **_classified(meta.get("scheme_category"))}
+            for isin in isins if isin and isin.startswith("INF")]
+
+
+def record_scheme_metadata(rows):
+    """Queue metadata rows for the next batched upsert."""
+    metadata_buffer.add(rows)
+
+
+def _as_dict(row: SchemeMetadata) -> dict:
+    return {"isin": row.isin, "scheme_code": row.scheme_code, "category": row.category,
+            "asset_class": row.asset_class, "amc": row.amc, "plan": row.plan,
+            "option": row.option, "benchmark": row.benchmark}
+
+
+def _merge(found: dict, isin: str, row: dict):
+    found[isin] = {**found.get(isin, {}), **{k: v for k, v in row.items() if v is not None}, "isin": isin}
+
+
+async def _classified_by_code(codes: dict) -> dict:
+    """
+    {isin: metadata} for ISINs classified only under another ISIN of the same
+    scheme code (mfapi.in lists just the growth / reinvestment ISINs, so
+    lineage-mapped and payout ISINs never get rows of their own).
+    """
+    by_code = {}
+    try:
+        async with SessionLocal() as db:
+            wanted = list(dict.fromkeys(codes.values()))
+            for start in range(0, len(wanted), IN_CLAUSE_CHUNK):
+                res = await db.execute(
+                    select(SchemeMetadata).filter(SchemeMetadata.scheme_code.in_(wanted[start:start + IN_CLAUSE_CHUNK]),
+                                                  SchemeMetadata.asset_class.isnot(None))
+                )
+                for row in res.scalars().all():
+                    by_code.setdefault(row.scheme_code, _as_dict(row))
+    except Exception as e:
+        print(f"DEBUG: Scheme metadata query by code failed: {e}")
+    for row in metadata_buffer.pending_by("scheme_code", codes.values()):
+        if row.get("asset_class"):
+            by_code[row["scheme_code"]] = row
+    return {isin: {"isin": isin, **{k: by_code[code].get(k) for k in _SCHEME_COLUMNS}}
+            for isin, code in codes.items() if code in by_code}
+
+
+async def get_scheme_metadata_many(isins, codes: dict = None) -> dict:
+    """
+    {isin: metadata dict} for the given ISINs, from one scheme_metadata query.
+    ISINs the table cannot classify yet are filled from the local AMFI master,
+    then (with `codes`, {isin: scheme code}) from another ISIN of the same
+    scheme, and stored; ISINs none of these know are left out. Never
+    downloads anything.
+    """
+    isins = list(dict.fromkeys(i for i in isins if i))
+    found = {}
+    if not isins:
+        return found
+    try:
+        async with SessionLocal() as db:
+            for start in range(0, len(isins), IN_CLAUSE_CHUNK):
+                res = await db.execute(
+                    select(SchemeMetadata).filter(SchemeMetadata.isin.in_(isins[start:start + IN_CLAUSE_CHUNK]))
+                )
+                for row in res.scalars().all():
+                    found[row.isin] = _as_dict(row)
+    except Exception as e:
+        print(f"DEBUG: Scheme metadata query failed: {e}")
+
+    # Rows learnt moments ago (e.g. by this request's NAV downloads) may still be queued
+    for isin, row in metadata_buffer.pending(isins).items():
+        _merge(found, isin, row)
+
+    unclassified = [i for i in isins if not (found.get(i) or {}).get("asset_class")]
+    if unclassified:
+        learnt = [metadata_from_master(isin, entry) for isin, entry in amfi_master.lookup_many(unclassified).items()]
+        learnt = [row for row in learnt if row.get("asset_class")]
+        for row in learnt:
+            _merge(found, row["isin"], row)
+        record_scheme_metadata(learnt)
+
+    codes = {i: (codes or {}).get(i) for i in isins if not (found.get(i) or {}).get("asset_class")}
+    codes = {isin: code for isin, code in codes.items() if code}
+    if codes:
+        learnt = list((await _classified_by_code(codes)).values())
+        for row in learnt:
+            _merge(found, row["isin"], row)
+        record_scheme_metadata(learnt)
+    return found
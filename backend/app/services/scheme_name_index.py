@@ -0,0 +1,161 @@
+"""
+Fuzzy scheme-name resolution for holdings without an ISIN.
+
+Older statements and some Excel exports only carry a (noisy) fund name. This
+index maps such a name to the most likely AMFI scheme using trigram similarity
+over the cleaned scheme names of the AMFI master:
+
+- names are cleaned (clean_scheme_name), lower-cased and stripped of filler
+  words, then split into trigrams with spaces ignored;
+- candidates come from an inverted trigram index, using only the query's
+  rarer trigrams, and are scored by Dice similarity on the full sets;
+- among the plan / option variants of the best name, the one matching the
+  query's Direct/Regular and Growth/IDCW wording is chosen.
+
+Every match carries a confidence (the Dice score). Matches below
+SCHEME_MATCH_MIN_CONFIDENCE, too close to a different runner-up name, or
+disagreeing on numbers / series numerals ("Series II" vs "Series I") are
+returned with confident=False and must not be used silently.
+"""
+import os
+import re
+import threading
+from collections import Counter
+from .amfi_master import amfi_master, scheme_plan, scheme_option
+from .isin_lookup import clean_scheme_name
+
+SCHEME_MATCH_MIN_CONFIDENCE = float(os.getenv("SCHEME_MATCH_MIN_CONFIDENCE", "0.75"))
+# A different scheme scoring within this margin of the best makes the match ambiguous
+SCHEME_MATCH_MIN_MARGIN = float(os.getenv("SCHEME_MATCH_MIN_MARGIN", "0.05"))
+
+_CANDIDATES = 25
+# Plan / option words are matched separately (scheme_plan, scheme_option), not by similarity
+_FILLER = {"fund", "scheme", "plan", "the", "mutual", "mf", "option", "opt", "direct", "regular",
+           "growth", "idcw", "dividend", "payout", "reinvestment", "bonus", "dir", "reg", "gr", "div"}
+
+
+def normalize_name(name: str) -> str:
+    name = clean_scheme_name(name or "").lower().replace("&", " and ")
+    tokens = re.sub(r"[^a-z0-9]+", " ", name).split()
+    return " ".join(t for t in tokens if t not in _FILLER)
+
+
+def trigrams(normalized: str) -> frozenset:
+    # Spaces are dropped so "Flexicap" and "Flexi Cap" share every trigram
+    padded = f" {normalized.replace(' ', '')} "
+    if len(padded) < 3:
+        return frozenset()
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+_ROMAN = {"i", "ii", "iii", "iv", "v", "vi", "vii", "viii", "ix", "x", "xi", "xii"}
+
+
+def markers(normalized: str) -> frozenset:
+    """Numbers and series numerals: names differing only in these are different schemes."""
+    found = set(re.findall(r"\d+", normalized))
+    found.update(t for t in normalized.split() if t in _ROMAN)
+    return frozenset(found)
+
+
+class SchemeNameIndex:
+    def __init__(self, rows):
+        """`rows`: (isin, code, name, category, plan, ...) tuples, as stored in the AMFI master."""
+        variants = {}  # normalized name -> [row dicts]
+        for isin, code, name, category, plan, *_ in rows:
+            key = normalize_name(name)
+            if key:
+                variants.setdefault(key, []).append({
+                    "isin": isin, "code": code, "name": name, "category": category,
+                    "plan": plan or scheme_plan(name), "option": scheme_option(name),
+                })
+        self.names = list(variants)
+        self.variants = [variants[n] for n in self.names]
+        self.grams = [trigrams(n) for n in self.names]
+        self.markers = [markers(n) for n in self.names]
+        self.postings = {}  # trigram -> [name ids]
+        for name_id, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(name_id)
+        # Trigrams shared by more names than this carry little signal for candidate generation
+        self.common = max(50, len(self.names) // 20)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _ranked(self, query_grams: frozenset) -> list:
+        grams = sorted((g for g in query_grams if g in self.postings), key=lambda g: len(self.postings[g]))
+        rare = [g for g in grams if len(self.postings[g]) <= self.common] or grams[:3]
+        counts = Counter()
+        for gram in rare:
+            counts.update(self.postings[gram])
+        scored = []
+        for name_id, _ in counts.most_common(_CANDIDATES):
+            other = self.grams[name_id]
+            scored.append((2 * len(query_grams & other) / (len(query_grams) + len(other)), name_id))
+        scored.sort(reverse=True)
+        return scored
+
+    def match(self, name: str) -> dict:
+        """
+        Best scheme for a free-text fund name, or None when nothing shares a trigram.
+
+        Returns {"isin", "code", "name", "category", "plan", "confidence", "confident"}.
+        """
+        normalized = normalize_name(name)
+        query_grams = trigrams(normalized)
+        if not query_grams:
+            return None
+        ranked = self._ranked(query_grams)
+        if not ranked:
+            return None
+        confidence, best = ranked[0]
+        runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+
+        plan, option = scheme_plan(name), scheme_option(name)
+        variant = max(self.variants[best], key=lambda v: (bool(plan) and v["plan"] == plan,
+                                                          bool(option) and v["option"] == option,
+                                                          v["plan"] == "Direct", v["option"] == "Growth"))
+        confident = confidence >= SCHEME_MATCH_MIN_CONFIDENCE and markers(normalized) == self.markers[best] and \
+            (confidence >= 1.0 or confidence - runner_up >= SCHEME_MATCH_MIN_MARGIN)
+        return {
+            "isin": variant["isin"], "code": variant["code"], "name": clean_scheme_name(variant["name"]),
+            "category": variant["category"], "plan": variant["plan"],
+            "confidence": round(confidence, 3), "confident": confident,
+        }
+
+
+_index = None
+_index_generation = 0  # Bumped on every master reload
+_index_lock = threading.Lock()
+
+
+def get_scheme_name_index() -> SchemeNameIndex:
+    """The index over the current AMFI master, built on first use and after every master reload."""
+    global _index
+    with _index_lock:
+        index, generation = _index, _index_generation
+    if index is None:
+        # Built outside the lock: reading the master may open it, which runs _reset_index
+        index = SchemeNameIndex(amfi_master.rows())
+        print(f"DEBUG: Scheme name index built ({len(index)} names)")
+        with _index_lock:
+            if generation == _index_generation:
+                _index = index
+    return index
+
+
+def _reset_index():
+    global _index, _index_generation
+    with _index_lock:
+        _index = None
+        _index_generation += 1
+
+
+amfi_master.listeners.append(_reset_index)
+
+
+def match_scheme_names(names) -> dict:
+    """{name: match or None} for a batch of free-text fund names; see SchemeNameIndex.match."""
+    index = get_scheme_name_index()
+    return {name: index.match(name) for name in dict.fromkeys(names) if name}
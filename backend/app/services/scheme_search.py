@@ -0,0 +1,147 @@
+"""
+Scheme search / autocomplete over the AMFI universe.
+
+An in-memory index built from the AMFI master (one entry per scheme code):
+names are split into lower-case tokens, the distinct tokens are kept sorted so
+every token starting with a query prefix is one bisect range, and each token
+has a set of scheme ids (prefixes of one or two characters, whose ranges are
+the widest, have their sets precomputed). Each query word must prefix some
+word of the name, so "hdfc flex dir" finds "HDFC Flexi Cap Fund - Direct Plan";
+the candidates are the intersection of the words' sets.
+
+Scheme ids are assigned shorter names first, so ranking is: more exact-word
+matches, then the first query word prefixing the name's first word, then id.
+Broad queries (more than _FULL_RANK_LIMIT candidates, e.g. a single letter)
+skip the exact-word count and are ranked with set operations alone.
+
+The index is rebuilt whenever the AMFI master is (re)loaded, off the event
+loop, and swapped in atomically.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+from .amfi_master import amfi_master, scheme_option
+
+SEARCH_MAX_RESULTS = 50
+
+# Prefixes up to this length have precomputed id sets (their vocabulary ranges are the widest)
+_SHORT_PREFIX = 2
+# Above this many candidates, ranking skips the per-candidate exact-word score
+_FULL_RANK_LIMIT = 2000
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN_RE.findall((text or "").lower().replace("&", " and "))
+
+
+class SchemeSearchIndex:
+    def __init__(self, rows):
+        """`rows`: (isin, code, name, category, plan, ...) tuples, as stored in the AMFI master."""
+        schemes = {}  # code -> entry (first ISIN listed for the code)
+        for isin, code, name, category, plan, *_ in rows:
+            if code not in schemes:
+                schemes[code] = {"isin": isin, "code": code, "name": name, "category": category,
+                                 "plan": plan, "option": scheme_option(name)}
+        # Scheme ids follow the static rank (shorter names first), so the smallest ids are the best
+        ranked = sorted(schemes.values(), key=lambda s: (len(tokenize(s["name"])), s["name"]))
+        self.schemes = ranked
+        names = [tokenize(s["name"]) for s in ranked]
+        self.words = self._build([set(tokens) for tokens in names])
+        self.leading = self._build([set(tokens[:1]) for tokens in names])
+
+    @staticmethod
+    def _build(token_sets: list) -> dict:
+        """Sorted vocabulary, posting sets, and precomputed sets for 1-2 character prefixes."""
+        postings = {}
+        for scheme_id, tokens in enumerate(token_sets):
+            for token in tokens:
+                postings.setdefault(token, set()).add(scheme_id)
+        short = {}
+        for token, ids in postings.items():
+            for n in range(1, min(len(token), _SHORT_PREFIX) + 1):
+                short.setdefault(token[:n], set()).update(ids)
+        vocab = sorted(postings)
+        return {"vocab": vocab, "postings": [frozenset(postings[t]) for t in vocab],
+                "short": {p: frozenset(ids) for p, ids in short.items()}}
+
+    def __len__(self):
+        return len(self.schemes)
+
+    @staticmethod
+    def _prefix_set(index: dict, prefix: str) -> frozenset:
+        """Ids of schemes with a word starting with `prefix`."""
+        if len(prefix) <= _SHORT_PREFIX:
+            return index["short"].get(prefix, frozenset())
+        vocab = index["vocab"]
+        lo = bisect.bisect_left(vocab, prefix)
+        hi = bisect.bisect_left(vocab, prefix + "\uffff", lo)
+        if hi - lo == 1:
+            return index["postings"][lo]
+        return frozenset().union(*index["postings"][lo:hi])
+
+    @staticmethod
+    def _word_set(index: dict, word: str) -> frozenset:
+        """Ids of schemes with `word` as a whole word."""
+        vocab = index["vocab"]
+        i = bisect.bisect_left(vocab, word)
+        return index["postings"][i] if i < len(vocab) and vocab[i] == word else frozenset()
+
+    def search(self, query: str, limit: int = 10) -> list:
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        # Every query word must prefix some word of the name
+        sets = sorted((self._prefix_set(self.words, w) for w in words), key=len)
+        candidates = sets[0].intersection(*sets[1:])
+        if not candidates:
+            return []
+        leading = self._prefix_set(self.leading, words[0])
+
+        if len(candidates) > _FULL_RANK_LIMIT:
+            # Broad query (e.g. one letter): leading-word matches first, then static rank; set ops only
+            lead = candidates & leading
+            top = heapq.nsmallest(limit, lead)
+            if len(top) < limit:
+                top += heapq.nsmallest(limit - len(top), candidates - lead)
+            return [self.schemes[i] for i in top]
+
+        exact = [self._word_set(self.words, w) for w in words]
+        scored = sorted(candidates, key=lambda i: (-sum(i in ids for ids in exact), i not in leading, i))
+        return [self.schemes[i] for i in scored[:limit]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def reload_scheme_search():
+    """(Re)build the index from the AMFI master and swap it in."""
+    global _index
+    started = time.perf_counter()
+    index = SchemeSearchIndex(amfi_master.rows())
+    with _index_lock:
+        _index = index
+    print(f"DEBUG: Scheme search index built ({len(index)} schemes, "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms)")
+    return index
+
+
+def get_scheme_search_index() -> SchemeSearchIndex:
+    index = _index
+    return index if index is not None else reload_scheme_search()
+
+
+def scheme_search_ready() -> bool:
+    return _index is not None
+
+
+# Runs in the thread that (re)loaded the master, so searches keep using the old index meanwhile
+amfi_master.listeners.append(reload_scheme_search)
+
+
+def search_schemes(query: str, limit: int = 10) -> list:
+    return get_scheme_search_index().search(query, max(1, min(limit, SEARCH_MAX_RESULTS)))
@@ -0,0 +1,72 @@
+"""
+Request coalescing ("single-flight") for upstream lookups.
+
+Concurrent callers asking for the same key share one in-flight call instead of
+each hitting mfapi.in: the first caller (the leader) runs the call, everyone
+arriving while it runs awaits the leader's result. The in-flight table holds
+concurrent.futures.Futures behind a threading.Lock, so followers may be other
+asyncio tasks or code running on another event loop in a worker thread.
+Results are not kept once the call finishes; caching is the caller's job.
+A cancelled leader (e.g. a request whose client went away) does not cancel
+its followers: they retry, and one of them runs the call.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+# Result handed to followers when the leader is cancelled, telling them to retry
+_LEADER_CANCELLED = object()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}  # key -> concurrent.futures.Future
+        self._lock = threading.Lock()
+        self.calls = 0  # Every do() call
+        self.upstream = 0  # Calls that actually ran
+        self.shared = 0  # Calls served by another caller's in-flight call (saved upstream calls)
+
+    async def do(self, key, call):
+        """Return `await call()`, running it at most once per key at a time."""
+        with self._lock:
+            self.calls += 1
+        while True:
+            with self._lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[key] = Future()
+                    self.upstream += 1
+                else:
+                    self.shared += 1
+            if leader:
+                break
+            # shield: a cancelled follower must not cancel the leader's call
+            result = await asyncio.shield(asyncio.wrap_future(future))
+            if result is not _LEADER_CANCELLED:
+                return result
+            # The leader's caller went away mid-call: retry, one follower becomes the new leader
+            with self._lock:
+                self.shared -= 1
+
+        try:
+            result = await call()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            if isinstance(e, asyncio.CancelledError):
+                # Not future.cancel(): that would cancel every follower along with this caller
+                future.set_result(_LEADER_CANCELLED)
+            else:
+                future.set_exception(e)
+                future.exception()  # Mark retrieved; followers (if any) still receive it
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(result)
+        return result
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "upstream": self.upstream, "saved": self.shared,
+                "in_flight": len(self._inflight)}
@@ -0,0 +1,89 @@
+"""
+Statement-format registry.
+
+Each CAS layout (CAMS detailed, CAMS summary, KFintech, NSDL / CDSL
+depository) is a StatementFormat: first-page markers that fingerprint it and
+the line interpreter specialised for it. `detect_format` runs over the first
+page's text only, in registration order; statements nothing recognises get
+the generic interpreter. Formats also keep running throughput numbers
+(statements, pages, seconds) so slow layouts show up in `format_benchmarks()`.
+
+New layouts are added with `register_format` (optionally `before=` an
+existing format, since the first match wins).
+"""
+import re
+
+GENERIC = "generic"
+
+
+class StatementFormat:
+    def __init__(self, name: str, label: str, interpret, markers: tuple = (), exclude: tuple = ()):
+        self.name = name
+        self.label = label
+        self.interpret = interpret  # (lines, state, items) -> None
+        # All `markers` must match the first page and none of `exclude` may
+        self.markers = tuple(re.compile(m, re.IGNORECASE) for m in markers)
+        self.exclude = tuple(re.compile(m, re.IGNORECASE) for m in exclude)
+        self.statements = 0
+        self.pages = 0
+        self.seconds = 0.0
+
+    def matches(self, first_page: str) -> bool:
+        return bool(self.markers) \
+            and all(m.search(first_page) for m in self.markers) \
+            and not any(m.search(first_page) for m in self.exclude)
+
+    def record(self, pages: int, seconds: float):
+        self.statements += 1
+        self.pages += pages
+        self.seconds += seconds
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+
+_formats = {}  # name -> StatementFormat, in detection order
+
+
+def register_format(fmt: StatementFormat, before: str = None):
+    """Add (or replace) a format. With `before`, it is tried ahead of that format."""
+    global _formats
+    _formats.pop(fmt.name, None)
+    if before is None or before not in _formats:
+        _formats[fmt.name] = fmt
+        return
+    reordered = {}
+    for name, existing in _formats.items():
+        if name == before:
+            reordered[fmt.name] = fmt
+        reordered[name] = existing
+    _formats = reordered
+
+
+def get_format(name: str) -> StatementFormat:
+    if name not in _formats:
+        raise ValueError(f"Unknown statement format: {name}")
+    return _formats[name]
+
+
+def detect_format(first_page: str) -> StatementFormat:
+    """The first registered format whose markers match the first page, else the generic one."""
+    first_page = first_page or ""
+    for fmt in _formats.values():
+        if fmt.name != GENERIC and fmt.matches(first_page):
+            return fmt
+    return get_format(GENERIC)
+
+
+def format_benchmarks() -> dict:
+    return {
+        name: {
+            "label": fmt.label,
+            "statements": fmt.statements,
+            "pages": fmt.pages,
+            "seconds": round(fmt.seconds, 3),
+            "pages_per_sec": round(fmt.pages_per_sec, 1),
+        }
+        for name, fmt in _formats.items()
+    }
@@ -0,0 +1,149 @@
+"""
+Typed columnar transaction model.
+
+Parser output (PDF items or Excel rows) is converted once into a DataFrame with
+fixed dtypes, and every analysis function works on that frame:
+
+- date:           datetime64, parsed with the statement date formats only
+                  ('Current' and anything unparseable become NaT)
+- amount, current_value: float64
+- units, nav, unit_balance: float64, from the statement line when printed
+                  (units signed by effect on the holding: purchases +,
+                  redemptions -); NaN when the source has no unit columns
+- isin, folio:    categorical
+- type:           categorical over ItemType
+"""
+from enum import Enum
+import numpy as np
+import pandas as pd
+
+
+class ItemType(str, Enum):
+    TRANSACTION = "transaction"
+    HOLDING = "holding"
+    PORTFOLIO_SUMMARY = "portfolio_summary"
+
+
+ITEM_TYPE_DTYPE = pd.CategoricalDtype([t.value for t in ItemType])
+
+# Every date layout the line classifier's DATE_RE accepts, plus ISO for Excel text cells
+DATE_FORMATS = ("%d-%b-%Y", "%d/%b/%Y", "%d.%b.%Y", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%Y-%m-%d")
+
+COLUMNS = ("date", "description", "isin", "folio", "amount", "current_value", "type", "raw_desc",
+           "units", "nav", "unit_balance")
+FLOAT_COLUMNS = ("amount", "current_value", "units", "nav", "unit_balance")
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """
+    Vectorised one-shot date parsing. Date / datetime values pass through;
+    strings are tried against each of DATE_FORMATS in turn (day first, as
+    printed on Indian statements).
+    """
+    raw = values.to_numpy(dtype=object)
+    parsed = np.full(len(raw), np.datetime64("NaT"), dtype="datetime64[ns]")
+    is_text = np.fromiter((isinstance(v, str) for v in raw), dtype=bool, count=len(raw))
+    objects = ~is_text & pd.notna(raw)
+    if objects.any():
+        parsed[objects] = pd.to_datetime(pd.Series(raw[objects]), errors="coerce").to_numpy("datetime64[ns]")
+
+    pending = np.flatnonzero(is_text)
+    text = pd.Series(raw[pending], dtype=object).str.strip()
+    for fmt in DATE_FORMATS:
+        if not len(pending):
+            break
+        attempt = pd.to_datetime(text, format=fmt, errors="coerce")
+        hit = attempt.notna().to_numpy()
+        parsed[pending[hit]] = attempt[hit].to_numpy("datetime64[ns]")
+        pending = pending[~hit]
+        text = text[~hit].reset_index(drop=True)
+    return pd.Series(parsed, index=values.index)
+
+
+def is_transaction_frame(df: pd.DataFrame) -> bool:
+    return "type" in df.columns and isinstance(df["type"].dtype, pd.CategoricalDtype) \
+        and pd.api.types.is_datetime64_any_dtype(df["date"])
+
+
+def to_transaction_frame(data) -> pd.DataFrame:
+    """Typed frame from parser items (list of dicts or a raw DataFrame). Typed frames are returned as-is."""
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    if is_transaction_frame(df):
+        return df
+    df = df.copy()
+    for col in COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+
+    df["date"] = parse_dates(df["date"])
+    for col in FLOAT_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    isin = df["isin"].where(df["isin"].notna(), None)
+    df["isin"] = isin.map(lambda v: v.strip().upper() if isinstance(v, str) and v.strip() else None).astype("category")
+    df["folio"] = df["folio"].map(lambda v: str(v) if v is not None and v == v else None).astype("category")
+    df["type"] = df["type"].astype(ITEM_TYPE_DTYPE)
+    return df
+
+
+def transactions_of(df: pd.DataFrame) -> pd.DataFrame:
+    """Dated transaction rows, oldest first."""
+    tx = df[(df["type"] == ItemType.TRANSACTION.value) & df["date"].notna() & df["amount"].notna()]
+    return tx.sort_values("date", kind="stable")
+
+
+def merge_statements(frames: list) -> tuple:
+    """
+    Consolidate typed frames parsed from several statements into one.
+
+    An item found in more than one statement (overlapping periods, or the same
+    folio on a CAMS and a KFintech CAS) is kept once. Transactions match on
+    folio + scheme + date + amount and are kept from the first statement.
+    Holdings match on folio + scheme and are kept from the statement with the
+    latest transaction in that folio (its as-of date; ties go to the first
+    statement), so an older CAS never overrides newer units and valuation.
+    Duplicates within one statement are left alone. Per-statement
+    portfolio totals only cover their own file and are dropped.
+    Returns (frame, duplicates_dropped).
+    """
+    frames = [to_transaction_frame(f) for f in frames]
+    if len(frames) == 1:
+        return frames[0], 0
+    tagged = [f.astype({"isin": object, "folio": object, "type": object}).assign(_source=i)
+              for i, f in enumerate(frames)]
+    df = pd.concat(tagged, ignore_index=True)
+    df = df[df["type"] != ItemType.PORTFOLIO_SUMMARY.value]
+
+    is_tx = df["type"] == ItemType.TRANSACTION.value
+    key = pd.DataFrame({
+        "type": df["type"],
+        "folio": df["folio"].fillna(""),
+        "scheme": scheme_keys(df).fillna(""),
+        "date": df["date"].where(is_tx),
+        "amount": df["amount"].round(2).where(is_tx),
+    })
+    # Preference per row, lowest wins: the statement index for transactions; for holdings,
+    # newest folio as-of date first (statements without dated rows in the folio last)
+    as_of = df["date"].where(is_tx).groupby([df["_source"], key["folio"]]).transform("max")
+    as_of_days = ((as_of - pd.Timestamp(0)).dt.days).fillna(-(10 ** 6))
+    preference = df["_source"].where(is_tx, -as_of_days * len(frames) + df["_source"])
+    best = preference.groupby([key[c] for c in key.columns], dropna=False).transform("min")
+    merged = df[preference == best].drop(columns="_source").reset_index(drop=True)
+    dropped = len(df) - len(merged)
+    merged["isin"] = merged["isin"].astype("category")
+    merged["folio"] = merged["folio"].astype("category")
+    merged["type"] = merged["type"].astype(ITEM_TYPE_DTYPE)
+    return merged, dropped
+
+
+def scheme_keys(df: pd.DataFrame) -> pd.Series:
+    """Per-row scheme key: the ISIN, or the description for rows without one."""
+    return df["isin"].astype(object).fillna(df["description"])
+
+
+def to_day(dates) -> np.ndarray:
+    """datetime64 values -> datetime64[D] array (calendar days)."""
+    return np.asarray(dates, dtype="datetime64[ns]").astype("datetime64[D]")
+
+
+def today() -> np.datetime64:
+    return np.datetime64(pd.Timestamp.today().date(), "D")
@@ -4,6 +4,7 @@ ISIN to Fund Name lookup using AMFI NAV data
 import requests
 import re
 from functools import lru_cache
+from backend.app.services.isin_lineage import isin_lineage
 
 AMFI_NAV_URL = "https://www.amfiindia.com/spages/NAVAll.txt"
 
@@ -32,12 +33,6 @@ def _fetch_isin_mapping():
     return isin_map
 
 
-# Static mapping for old/legacy ISINs that might not be in the current AMFI file
-STATIC_MAPPING = {
-    "INF740K01031": {"name": "Parag Parikh Flexi Cap (Direct)", "code": "122639"},
-    # Add more as discovered
-}
-
 def get_scheme_details(isin: str) -> dict:
     """
     Get scheme details (name, code) for an ISIN.
@@ -48,10 +43,12 @@ def get_scheme_details(isin: str) -> dict:
         
     isin = isin.strip().upper()
         
-    # Check static mapping first or last? 
-    # Maybe first is faster for known issues.
-    if isin in STATIC_MAPPING:
-        return STATIC_MAPPING[isin]
+    # Legacy / merged ISINs (shared lineage index, see app/data/isin_lineage.json)
+    lineage = isin_lineage.resolve(isin)
+    if lineage is not None:
+        if lineage['code']:
+            return {"name": lineage['name'], "code": lineage['code']}
+        isin = lineage['isin']  # Look up the successor instead
 
     isin_map = _fetch_isin_mapping()
     details = isin_map.get(isin)
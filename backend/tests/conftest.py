@@ -0,0 +1,23 @@
+"""
+Test setup: the app package is imported as `app` (run from backend/), against
+throwaway local stores so tests never touch finance.db, the AMFI master or
+the lineage overlay of a working checkout. Set before any app import, since
+those modules read their configuration at import time.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+REPO_DIR = BACKEND_DIR.parent
+
+_scratch = tempfile.mkdtemp(prefix="finance-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_scratch}/test.db")
+os.environ.setdefault("AMFI_MASTER_PATH", os.path.join(_scratch, "amfi_master.db"))
+os.environ.setdefault("AMFI_MASTER_REFRESH", "0")
+os.environ.setdefault("ISIN_LINEAGE_LOCAL_PATH", os.path.join(_scratch, "isin_lineage_local.json"))
+
+for path in (BACKEND_DIR, REPO_DIR):  # `app`, and synthetic_cas.py at the repository root
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
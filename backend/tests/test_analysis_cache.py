@@ -0,0 +1,93 @@
+import asyncio
+import io
+from datetime import date
+
+import pytest
+
+from app.services.analysis_cache import AnalysisCache, analysis_key
+
+
+def _cache(**overrides):
+    return AnalysisCache(**{"max_entries": 10, "max_bytes": 10 ** 6, "ttl_seconds": 60, **overrides})
+
+
+def _counting_compute(delay=0.05):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return {"run": len(calls)}
+
+    return compute, calls
+
+
+def test_key_covers_bytes_password_and_date():
+    day = date(2026, 1, 29)
+    key = analysis_key(b"pdf", "a.pdf", "pw", as_of=day)
+    assert key == analysis_key(io.BytesIO(b"pdf"), "b.PDF", "pw", as_of=day)
+    assert key != analysis_key(b"pdf", "a.pdf", "other", as_of=day)
+    assert key != analysis_key(b"pdf", "a.xlsx", "pw", as_of=day)
+    assert key != analysis_key(b"pdf", "a.pdf", "pw", as_of=date(2026, 1, 30))
+
+
+def test_identical_concurrent_uploads_share_one_computation():
+    cache = _cache()
+    compute, calls = _counting_compute()
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert [r for r, _ in results] == [{"run": 1}] * 3
+    assert sorted(cached for _, cached in results) == [False, True, True]
+    assert len(calls) == 1
+    assert asyncio.run(cache.get_or_compute("k", compute)) == ({"run": 1}, True)
+
+
+def test_exception_reaches_waiters_and_is_not_cached():
+    cache = _cache()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad statement")
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute("k", fail) for _ in range(2)), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(main()))
+    assert cache.stats()["entries"] == 0
+
+
+def test_cancelled_computation_is_recomputed_by_a_waiter():
+    cache = _cache()
+    compute, calls = _counting_compute()
+
+    async def main():
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_compute("k", compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(main())
+    assert [r for r, _ in results] == [{"run": 2}] * 2
+    assert len(calls) == 2
+    assert cache.get("k") == {"run": 2}
+
+
+def test_lru_eviction_by_entries_and_size():
+    cache = _cache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"v": key})
+    assert cache.get("a") is None and cache.get("c") == {"v": "c"}
+
+    small = _cache(max_bytes=30)
+    small.put("a", {"v": "x" * 10})
+    small.put("b", {"v": "y" * 10})
+    assert small.get("a") is None and small.get("b") is not None
+    small.put("big", {"v": "z" * 100})  # Larger than the whole budget: not cached
+    assert small.get("big") is None
@@ -0,0 +1,60 @@
+import io
+from datetime import datetime
+
+import openpyxl
+
+from app.services.excel_parser import map_header, read_excel_statement
+
+
+def _workbook(rows) -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def test_header_aliases():
+    columns = map_header(["Txn Date", "Scheme Name", "ISIN Code", "Folio No.", "Amount (INR)",
+                          "Transaction Type", "No. of Units", "Market Value"])
+    assert columns == {"date": 0, "description": 1, "isin": 2, "folio": 3, "amount": 4,
+                       "tx_type": 5, "units": 6, "current_value": 7}
+    # First matching column wins
+    assert map_header(["Amount", "Net Amount", "Scheme"])["amount"] == 0
+
+
+def test_registrar_export_rows():
+    source = _workbook([
+        ["Consolidated Account Statement"],
+        ["Investor: A. Investor"],
+        [],
+        ["Txn Date", "Scheme Name", "ISIN Code", "Folio No.", "Amount (INR)", "Transaction Type",
+         "Units", "Current Value"],
+        [datetime(2024, 1, 5), "HDFC Flexi Cap Fund", "inf179k01xy1", "123 456", "1,000.00", "Purchase", 10, None],
+        [datetime(2024, 6, 5), "HDFC Flexi Cap Fund", "INF179K01XY1", "123 456", 500, "Redemption", 4, None],
+        [None, "HDFC Flexi Cap Fund", "INF179K01XY1", "123 456", 500, None, None, 720.5],
+        [None, "Total", None, None, 500, None, None, 720.5],
+        ["Note: values as of today"],
+    ])
+    df = read_excel_statement(source)
+    assert df["type"].tolist() == ["transaction", "transaction", "holding", "portfolio_summary"]
+    purchase, redemption, holding, total = df.to_dict("records")
+    assert purchase["amount"] == -1000.0 and purchase["units"] == 10.0  # Outflow negative, units added
+    assert redemption["amount"] == 500.0 and redemption["units"] == -4.0
+    assert purchase["isin"] == "INF179K01XY1" and purchase["folio"] == "123456"
+    assert holding["date"] == "Current" and holding["current_value"] == 720.5
+    assert total["description"] == "Portfolio Total"
+
+
+def test_broker_type_column_is_a_transaction_type():
+    source = _workbook([
+        ["Date", "Fund Name", "Type", "Amount"],
+        ["2024-02-01", "Parag Parikh Flexi Cap Fund", "BUY", 2000],
+        ["2024-03-01", "Parag Parikh Flexi Cap Fund", "SELL", 300],
+    ])
+    df = read_excel_statement(source)
+    assert df["type"].tolist() == ["transaction", "transaction"]
+    assert df["amount"].tolist() == [-2000.0, 300.0]
+    assert df["raw_desc"].tolist() == ["BUY", "SELL"]
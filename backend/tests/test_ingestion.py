@@ -0,0 +1,85 @@
+import asyncio
+import itertools
+
+from app.core.database import SessionLocal, init_db
+from app.services.ingestion import fingerprints, ingest_statement, load_history, reusable_schemes
+from app.services.transactions import ItemType, to_transaction_frame
+
+_users = itertools.count(5001)
+
+
+def _tx(date, amount, folio="F1", isin="INF179K01XY1"):
+    return {"date": date, "description": "HDFC Flexi Cap Fund", "isin": isin, "folio": folio,
+            "amount": amount, "current_value": None, "type": ItemType.TRANSACTION.value,
+            "raw_desc": "SIP Purchase"}
+
+
+def _holding(value, folio="F1", isin="INF179K01XY1"):
+    return {"date": "Current", "description": "HDFC Flexi Cap Fund", "isin": isin, "folio": folio,
+            "amount": 0.0, "current_value": value, "type": ItemType.HOLDING.value,
+            "raw_desc": "Closing Balance"}
+
+
+def _ingest(user_id, items):
+    async def main():
+        await init_db()
+        async with SessionLocal() as db:
+            return await ingest_statement(db, user_id, to_transaction_frame(items))
+    return asyncio.run(main())
+
+
+def _history(user_id):
+    async def main():
+        async with SessionLocal() as db:
+            return await load_history(db, user_id)
+    return asyncio.run(main())
+
+
+def test_identical_rows_get_distinct_fingerprints():
+    prints = fingerprints(to_transaction_frame([_tx("05-Jan-2024", -500.0)] * 3 + [_tx("05-Feb-2024", -500.0)]))
+    assert prints.nunique() == 4
+    # The first occurrence keeps the plain fingerprint, so rows stored before numbering still match
+    single = fingerprints(to_transaction_frame([_tx("05-Jan-2024", -500.0)]))
+    assert prints.iloc[0] == single.iloc[0]
+
+
+def test_holding_fingerprints_cover_the_valuation():
+    assert fingerprints(to_transaction_frame([_holding(100.0)])).iloc[0] != \
+        fingerprints(to_transaction_frame([_holding(101.0)])).iloc[0]
+
+
+def test_same_day_instalments_are_stored_and_reuploads_skipped():
+    user = next(_users)
+    statement = [_tx("05-Jan-2024", -500.0), _tx("05-Jan-2024", -500.0)]
+    first = _ingest(user, statement)
+    assert (first["new_items"], first["duplicate_items"]) == (2, 0)
+    again = _ingest(user, statement)
+    assert (again["new_items"], again["duplicate_items"]) == (0, 2)
+    assert again["affected_schemes"] == []
+    assert len(_history(user)) == 2
+
+
+def test_stale_holdings_of_uploaded_folios_are_replaced():
+    user = next(_users)
+    _ingest(user, [_tx("05-Jan-2024", -1000.0), _holding(1000.0),
+                   _tx("05-Jan-2024", -200.0, folio="F2", isin="INF204K01AB2"),
+                   _holding(210.0, folio="F2", isin="INF204K01AB2")])
+    # Next month's statement covers folio F1 only (e.g. one registrar's CAS)
+    stats = _ingest(user, [_tx("05-Jan-2024", -1000.0), _tx("05-Feb-2024", -1000.0), _holding(2100.0)])
+    assert stats["new_items"] == 2 and stats["replaced_items"] == 1
+    assert stats["affected_schemes"] == ["INF179K01XY1"]
+
+    history = _history(user)
+    holdings = history[history["type"] == ItemType.HOLDING.value]
+    assert sorted(holdings["current_value"]) == [210.0, 2100.0]  # F2's holding is kept
+    assert len(history[history["type"] == ItemType.TRANSACTION.value]) == 3
+
+
+def test_reusable_schemes_skip_affected_by_isin_or_description():
+    previous = {"holdings": [
+        {"isin": "INF179K01XY1", "description": "HDFC Flexi Cap Fund"},
+        {"isin": "INF740K01031", "description": "Parag Parikh Flexi Cap Fund"},
+        {"isin": None, "description": "Unlisted Scheme"},
+    ]}
+    reuse = reusable_schemes(previous, ["INF179K01XY1", "Parag Parikh Flexi Cap Fund"])
+    assert list(reuse) == ["Unlisted Scheme"]
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from synthetic_cas import generate_cas
+from app.services.pdf_parser import iter_cam_pdf, parse_cam_pdf
+
+
+@pytest.fixture(scope="module")
+def statement(tmp_path_factory):
+    path = tmp_path_factory.mktemp("cas") / "statement.pdf"
+    page_count, items = generate_cas(str(path), pages=30, seed=7)
+    return str(path), page_count, items
+
+
+def test_parse_synthetic_statement(statement):
+    path, _, expected = statement
+    items = asyncio.run(parse_cam_pdf(path, resolve_names=False, backend="pdfplumber"))
+    assert len(items) == len(expected)
+
+
+def test_cancel_mid_parse_raises_cancelled(statement):
+    """Cancelling while a page is being laid out must surface as CancelledError, not a parse error."""
+    path, _, _ = statement
+
+    async def main():
+        first_page = asyncio.Event()
+
+        async def consume():
+            async for _ in iter_cam_pdf(path, resolve_names=False, backend="pdfplumber"):
+                first_page.set()
+
+        task = asyncio.create_task(consume())
+        await first_page.wait()  # The next page's next() is now running on the page thread
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
@@ -0,0 +1,21 @@
+import asyncio
+
+from app.core.database import SessionLocal, init_db
+from app.models import PortfolioSnapshot
+from app.routers.portfolio import _latest_ingested_snapshot
+
+
+def test_reuse_base_is_latest_incremental_snapshot():
+    """A later plain upload (another statement) must not become the base for incremental reuse."""
+    async def main():
+        await init_db()
+        async with SessionLocal() as db:
+            db.add(PortfolioSnapshot(user_id=9001, data={"holdings": ["X"], "ingest_stats": {"new_items": 3}}))
+            await db.commit()
+            db.add(PortfolioSnapshot(user_id=9001, data={"holdings": ["Y"]}))
+            await db.commit()
+            snapshot = await _latest_ingested_snapshot(db, 9001)
+            assert snapshot.data["holdings"] == ["X"]
+            assert await _latest_ingested_snapshot(db, 9002) is None
+
+    asyncio.run(main())
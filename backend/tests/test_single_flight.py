@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def _counting_call(delay=0.05):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return len(calls)
+
+    return call, calls
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight("test")
+    call, calls = _counting_call()
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", call) for _ in range(5)))
+
+    assert asyncio.run(main()) == [1] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 5, "upstream": 1, "saved": 4, "in_flight": 0}
+
+
+def test_exception_reaches_every_caller():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight("test")
+    call, calls = _counting_call()
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(flight.do("k", call)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == [2, 2, 2]  # One follower re-ran the call for all of them
+    assert len(calls) == 2
+    stats = flight.stats()
+    assert stats["calls"] == stats["upstream"] + stats["saved"] == 4
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    flight = SingleFlight("test")
+    call, calls = _counting_call()
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == 1
+    assert len(calls) == 1
+
+
+def test_follower_on_another_event_loop():
+    flight = SingleFlight("test")
+    call, calls = _counting_call(delay=0.2)
+    results = []
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0.01)
+        thread = threading.Thread(target=lambda: results.append(asyncio.run(flight.do("k", call))))
+        thread.start()
+        results.append(await leader)
+        await asyncio.to_thread(thread.join)
+
+    asyncio.run(main())
+    assert results == [1, 1]
+    assert len(calls) == 1
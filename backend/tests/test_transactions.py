@@ -0,0 +1,60 @@
+from app.services.transactions import ItemType, merge_statements, to_transaction_frame
+
+
+def _tx(date, amount, folio="F1", isin="INF179K01XY1", units=None):
+    return {"date": date, "description": "HDFC Flexi Cap Fund", "isin": isin, "folio": folio,
+            "amount": amount, "current_value": None, "type": ItemType.TRANSACTION.value,
+            "raw_desc": "SIP Purchase", "units": units}
+
+
+def _holding(value, units, folio="F1", isin="INF179K01XY1"):
+    return {"date": "Current", "description": "HDFC Flexi Cap Fund", "isin": isin, "folio": folio,
+            "amount": 0.0, "current_value": value, "type": ItemType.HOLDING.value,
+            "raw_desc": "Closing Balance", "unit_balance": units}
+
+
+def _summary(value):
+    return {"date": "Current", "description": "Portfolio Summary", "isin": None, "folio": None,
+            "amount": 0.0, "current_value": value, "type": ItemType.PORTFOLIO_SUMMARY.value}
+
+
+def test_overlapping_transactions_are_kept_once():
+    older = to_transaction_frame([_tx("05-Jan-2024", -1000.0), _tx("05-Feb-2024", -1000.0)])
+    newer = to_transaction_frame([_tx("05-Feb-2024", -1000.0), _tx("05-Mar-2024", -1000.0)])
+    merged, dropped = merge_statements([older, newer])
+    assert dropped == 1
+    assert sorted(merged["date"].dt.strftime("%Y-%m-%d")) == ["2024-01-05", "2024-02-05", "2024-03-05"]
+
+
+def test_identical_rows_within_one_statement_are_kept():
+    first = to_transaction_frame([_tx("05-Jan-2024", -500.0), _tx("05-Jan-2024", -500.0)])
+    second = to_transaction_frame([_tx("05-Jan-2024", -500.0), _tx("05-Mar-2024", -700.0)])
+    merged, dropped = merge_statements([first, second])
+    assert dropped == 1  # Only the other statement's copy goes
+    assert (merged["amount"] == -500.0).sum() == 2
+
+
+def test_portfolio_summaries_are_dropped():
+    merged, _ = merge_statements([to_transaction_frame([_tx("05-Jan-2024", -1.0), _summary(10.0)]),
+                                  to_transaction_frame([_tx("05-Feb-2024", -1.0), _summary(20.0)])])
+    assert not (merged["type"] == ItemType.PORTFOLIO_SUMMARY.value).any()
+
+
+def test_holding_comes_from_the_latest_statement_whatever_the_order():
+    older = to_transaction_frame([_tx("05-Jan-2024", -1000.0), _holding(1100.0, 10.0)])
+    newer = to_transaction_frame([_tx("05-Jan-2024", -1000.0), _tx("05-Jun-2024", -1000.0),
+                                  _holding(2500.0, 20.0)])
+    for frames in ([older, newer], [newer, older]):
+        merged, _ = merge_statements(frames)
+        holdings = merged[merged["type"] == ItemType.HOLDING.value]
+        assert holdings["current_value"].tolist() == [2500.0]
+        assert holdings["unit_balance"].tolist() == [20.0]
+
+
+def test_holdings_of_other_folios_are_untouched():
+    cams = to_transaction_frame([_tx("05-Jun-2024", -1.0), _holding(100.0, 1.0)])
+    kfin = to_transaction_frame([_tx("05-Jan-2024", -1.0, folio="F2", isin="INF204K01AB2"),
+                                 _holding(50.0, 1.0, folio="F2", isin="INF204K01AB2")])
+    merged, dropped = merge_statements([cams, kfin])
+    assert dropped == 0
+    assert sorted(merged.loc[merged["type"] == ItemType.HOLDING.value, "current_value"]) == [50.0, 100.0]
@@ -0,0 +1,213 @@
+"""
+Benchmark: compiled line classifier vs the original per-line regex loop in parse_cam_pdf.
+
+Usage:
+    python bench_line_classifier.py                      # uses the page text in dump.txt
+    BENCH_DUMP=pages.txt python bench_line_classifier.py # any text in dump.txt format
+    python bench_line_classifier.py statement.pdf [password]
+
+Page text is extracted once up front; only line interpretation is timed, and the
+items produced by both implementations are compared for equality.
+"""
+import asyncio
+import re
+import sys
+import os
+import time
+sys.path.append(os.getcwd())
+
+from backend.app.services.pdf_parser import _interpret_lines, _new_parse_state
+
+REPEAT = 50
+
+
+async def _no_lookup(isin):
+    return ""
+
+
+async def legacy_interpret(pages, lookup_isin_name=_no_lookup):
+    """Verbatim copy of the original parse_cam_pdf page loop (reference implementation)."""
+    items = []
+    current_fund = "Unknown Scheme"
+    current_isin = None
+    current_folio = None
+    pending_fund_name = None
+    for text in pages:
+        if not text:
+            continue
+        lines = text.split('\n')
+        for line in lines:
+            line_strip = line.strip()
+            line_lower = line_strip.lower()
+            folio_match = re.search(r'Folio\s*(?:No)?:?\s*(\d+\s*/\s*\d+|\d+)', line_strip, re.IGNORECASE)
+            if folio_match:
+                current_folio = folio_match.group(1).replace(" ", "")
+                pending_fund_name = None
+                continue
+            isin_match = re.search(r'(INF\w{9})', line_strip)
+            if isin_match:
+                current_isin = isin_match.group(1)
+                clean_name = line_strip
+                if pending_fund_name and line_strip.startswith("("):
+                    clean_name = pending_fund_name + " " + line_strip
+                if "Advisor" in clean_name:
+                    clean_name = clean_name.split("Advisor")[0]
+                clean_name = re.sub(r'ISIN:?\s*INF\w{9}', '', clean_name)
+                clean_name = re.sub(r'\([^)]*\)\s*$', '', clean_name)
+                clean_name = re.sub(r'\([^)]*\)\s*$', '', clean_name)
+                current_fund = clean_name.strip().rstrip('-').strip()
+                amfi_name = await lookup_isin_name(current_isin)
+                if amfi_name:
+                    current_fund = amfi_name
+                pending_fund_name = None
+                continue
+            if 'INF' not in line_strip and not line_strip.startswith("("):
+                is_fund_name = False
+                if re.match(r'^[A-Z0-9]{3,8}-', line_strip):
+                    is_fund_name = True
+                fund_keywords = ['equity', 'debt', 'hybrid', 'balanced', 'bluechip',
+                                 'flexi', 'growth', 'liquid', 'overnight', 'gilt',
+                                 'arbitrage', 'elss', 'index']
+                if any(kw in line_lower for kw in fund_keywords):
+                    is_fund_name = True
+                if is_fund_name:
+                    pending_fund_name = line_strip
+                    continue
+            if "statement" in line_lower or "page" in line_lower:
+                continue
+            if line_lower.startswith("total"):
+                numbers = re.findall(r'([\d,]+\.\d+)', line_strip)
+                if len(numbers) >= 2:
+                    clean_nums = [float(n.replace(',', '')) for n in numbers]
+                    items.append({
+                        "type": "portfolio_summary",
+                        "description": "Portfolio Total",
+                        "amount": clean_nums[0],
+                        "current_value": clean_nums[1] if len(clean_nums) > 1 else 0
+                    })
+                continue
+            if "mutual fund" in line_lower and "fund" in line_lower:
+                continue
+            date_match = re.search(r'^\s*(\d{2}[-./](?:[A-Za-z]{3}|\d{2})[-./]\d{4})', line_strip)
+            if date_match and "stamp duty" not in line_lower and "charges" not in line_lower:
+                date_str = date_match.group(1)
+                numbers = re.findall(r'(-?[\d,]+\.\d{2,4})', line_strip)
+                if numbers:
+                    clean_nums = [float(n.replace(',', '')) for n in numbers]
+                    amount = clean_nums[0]
+                    if any(x in line_lower for x in ["redemption", "sell", "switch out", "dividend payout"]):
+                        amount = abs(amount)
+                    elif any(x in line_lower for x in ["purchase", "sip", "switch in", "reinvestment", "systematic", "investment"]):
+                        amount = -abs(amount)
+                    items.append({
+                        "date": date_str,
+                        "description": current_fund,
+                        "isin": current_isin,
+                        "folio": current_folio,
+                        "amount": amount,
+                        "type": "transaction",
+                        "raw_desc": line_strip
+                    })
+                continue
+            if "closing unit balance" in line_lower:
+                cost_match = re.search(r'Total\s*Cost\s*Value:?\s*([\d,]+\.?\d*)', line_strip, re.IGNORECASE)
+                value_match = re.search(r'Market\s*Value[^:]*:\s*(?:INR\s*)?([\d,]+\.?\d*)', line_strip, re.IGNORECASE)
+                cost = 0.0
+                val = 0.0
+                if cost_match:
+                    cost = float(cost_match.group(1).replace(',', ''))
+                if value_match:
+                    val = float(value_match.group(1).replace(',', ''))
+                if val == 0:
+                    numbers = re.findall(r'([\d,]+\.\d+)', line_strip)
+                    if numbers:
+                        val = float(numbers[-1].replace(',', ''))
+                if val > 0:
+                    items.append({
+                        "date": "Current",
+                        "description": current_fund,
+                        "isin": current_isin,
+                        "folio": current_folio,
+                        "amount": cost,
+                        "current_value": val,
+                        "type": "holding"
+                    })
+                continue
+            if not date_match:
+                numbers = re.findall(r'([\d,]+\.\d+)', line_strip)
+                if len(numbers) >= 2 and len(line_strip) > 15:
+                    if any(x in line_lower for x in ["purchase", "sip", "redemption", "switch", "dividend", "stt", "stamp", "advisor", "registra", "sys. investment", "charges"]):
+                        continue
+                    row_isin_match = re.search(r'(INF\w{9})', line_strip)
+                    row_fund_name = current_fund
+                    if row_isin_match:
+                        current_isin = row_isin_match.group(1)
+                        row_fund_name = line_strip.replace(current_isin, "")
+                        row_fund_name = re.sub(r'[\d,]+\.\d+.*$', '', row_fund_name).strip()
+                    clean_nums = [float(n.replace(',', '')) for n in numbers]
+                    sorted_nums = sorted(clean_nums, reverse=True)
+                    items.append({
+                        "date": "Current",
+                        "description": row_fund_name,
+                        "isin": current_isin,
+                        "folio": current_folio,
+                        "amount": sorted_nums[1] if len(sorted_nums) > 1 else 0.0,
+                        "current_value": sorted_nums[0],
+                        "type": "holding"
+                    })
+    return items
+
+
+async def compiled_interpret(pages):
+    items = []
+    state = _new_parse_state()
+    for text in pages:
+        if not text:
+            continue
+        _interpret_lines(text.split('\n'), state, items)
+    return items
+
+
+def load_dump(path=os.environ.get("BENCH_DUMP", "dump.txt")):
+    """Page texts from dump.txt ('--- Page N ---' headers, 'N: ' line prefixes)."""
+    pages = []
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith("--- Page"):
+                pages.append([])
+            elif pages:
+                pages[-1].append(re.sub(r'^\d+:\s?', '', line))
+    return ['\n'.join(p) for p in pages]
+
+
+def load_pdf(path, password=None):
+    import pdfplumber
+    with pdfplumber.open(path, password=password) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+
+def bench(fn, pages):
+    start = time.perf_counter()
+    items = asyncio.run(fn(pages))
+    return items, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pages = load_pdf(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        pages = load_dump()
+    pages = pages * REPEAT
+    line_count = sum(p.count('\n') + 1 for p in pages)
+    print(f"Corpus: {len(pages)} pages, {line_count} lines")
+
+    legacy_items, legacy_t = bench(legacy_interpret, pages)
+    new_items, new_t = bench(compiled_interpret, pages)
+
+    print(f"Legacy   : {legacy_t:.3f}s  {len(pages) / legacy_t:,.0f} pages/sec")
+    print(f"Compiled : {new_t:.3f}s  {len(pages) / new_t:,.0f} pages/sec")
+    print(f"Speedup  : {legacy_t / new_t:.2f}x")
+
+    assert new_items == legacy_items, "Compiled classifier output differs from legacy parser"
+    print(f"Output identical ({len(new_items)} items)")
@@ -0,0 +1,78 @@
+"""
+Benchmark: peak RSS of the streaming CAS parser vs eager whole-document extraction.
+
+Usage:
+    python bench_parser_memory.py small.pdf medium.pdf large.pdf [--password PW]
+
+Each measurement runs in a fresh subprocess so ru_maxrss reflects one parse only.
+'eager' reproduces the old behaviour (every page's layout cache kept alive until
+the document is closed); 'streaming' is iter_cam_pdf. Streaming peak RSS should
+stay flat as page count grows.
+"""
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+sys.path.append(os.getcwd())
+
+
+def run_eager(path, password):
+    import pdfplumber
+    with pdfplumber.open(path, password=password) as pdf:
+        texts = [page.extract_text() for page in pdf.pages]
+        return len(pdf.pages), sum(len(t or "") for t in texts)
+
+
+def run_streaming(path, password):
+    from backend.app.services.pdf_parser import iter_cam_pdf
+
+    async def consume():
+        count = 0
+        async for page_items in iter_cam_pdf(path, password, workers=1, resolve_names=False):
+            count += len(page_items)
+        return count
+
+    return asyncio.run(consume())
+
+
+def child(mode, path, password):
+    start = time.perf_counter()
+    (run_eager if mode == "eager" else run_streaming)(path, password)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{elapsed:.3f} {peak_kb}")
+
+
+def page_count(path, password):
+    import pdfplumber
+    with pdfplumber.open(path, password=password) as pdf:
+        return len(pdf.pages)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "--child":
+        child(args[1], args[2], args[3] or None)
+        sys.exit(0)
+
+    password = ""
+    if "--password" in args:
+        i = args.index("--password")
+        password = args[i + 1]
+        args = args[:i] + args[i + 2:]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    print(f"{'PDF':<30} {'pages':>6} {'mode':>10} {'time (s)':>9} {'peak RSS (MB)':>14}")
+    for path in args:
+        pages = page_count(path, password or None)
+        for mode in ("eager", "streaming"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, path, password],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            elapsed, peak_kb = out.split()
+            print(f"{os.path.basename(path):<30} {pages:>6} {mode:>10} {float(elapsed):>9.2f} {int(peak_kb) / 1024:>14.1f}")
@@ -0,0 +1,82 @@
+"""
+Benchmark: PDF text-extraction backends over a statement corpus.
+
+Usage:
+    python bench_pdf_backends.py statements/            # every *.pdf in a directory
+    python bench_pdf_backends.py a.pdf b.pdf [--password PW] [--backends pdfium,pdfminer]
+
+Each backend parses every statement in-process (workers=1, no ISIN name
+lookups). The items it produces are compared with the pdfplumber reference, so
+a backend is only safe to enable for a statement type (PDF_TEXT_BACKENDS) when
+it is reported identical on that type's corpus.
+"""
+import asyncio
+import glob
+import os
+import sys
+import time
+sys.path.append(os.getcwd())
+
+from backend.app.services.pdf_parser import parse_cam_pdf
+from backend.app.services.pdf_text import TEXT_BACKENDS
+
+REFERENCE = "pdfplumber"
+
+
+def parse(path, password, backend):
+    start = time.perf_counter()
+    items = asyncio.run(parse_cam_pdf(path, password, workers=1, resolve_names=False, backend=backend))
+    return items, time.perf_counter() - start
+
+
+def first_difference(items, reference):
+    for i, (a, b) in enumerate(zip(items, reference)):
+        if a != b:
+            return f"item {i}: {a} != {b}"
+    return f"{len(items)} items vs {len(reference)}"
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    password = None
+    backends = list(TEXT_BACKENDS)
+    if "--password" in args:
+        i = args.index("--password")
+        password = args[i + 1]
+        args = args[:i] + args[i + 2:]
+    if "--backends" in args:
+        i = args.index("--backends")
+        backends = [REFERENCE] + [b for b in args[i + 1].split(",") if b != REFERENCE]
+        args = args[:i] + args[i + 2:]
+    paths = []
+    for arg in args:
+        paths.extend(sorted(glob.glob(os.path.join(arg, "*.pdf"))) if os.path.isdir(arg) else [arg])
+    if not paths:
+        print(__doc__)
+        sys.exit(1)
+
+    totals = {b: [0, 0.0, True] for b in backends}  # pages, seconds, identical
+    print(f"{'PDF':<30} {'backend':>10} {'pages':>6} {'time (s)':>9} {'pages/sec':>10} {'identical':>10}")
+    for path in paths:
+        pages = TEXT_BACKENDS[REFERENCE].page_count(path, password)
+        reference = None
+        for backend in backends:
+            items, elapsed = parse(path, password, backend)
+            if reference is None:
+                reference = items
+            identical = items == reference
+            totals[backend][0] += pages
+            totals[backend][1] += elapsed
+            totals[backend][2] &= identical
+            print(f"{os.path.basename(path):<30} {backend:>10} {pages:>6} {elapsed:>9.2f} {pages / elapsed:>10.1f} {str(identical):>10}")
+            if not identical:
+                print(f"    first difference: {first_difference(items, reference)}")
+
+    print()
+    ref_rate = totals[REFERENCE][0] / totals[REFERENCE][1]
+    for backend, (pages, elapsed, identical) in totals.items():
+        rate = pages / elapsed
+        print(f"{backend:>10}: {rate:10.1f} pages/sec  {rate / ref_rate:6.1f}x  identical={identical}")
+    safe = [b for b in backends if totals[b][2]]
+    fastest = max(safe, key=lambda b: totals[b][0] / totals[b][1])
+    print(f"Fastest backend with identical output: {fastest}")
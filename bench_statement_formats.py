@@ -0,0 +1,75 @@
+"""
+Benchmark: per-format statement parsers vs the generic heuristics.
+
+Usage:
+    python bench_statement_formats.py statements/ [--password PW] [--backend pdfium]
+
+Each statement is fingerprinted, then parsed with its specialised format and
+again with the generic interpreter (no ISIN name lookups, in-process). The
+registry's per-format throughput (pages/sec) is printed at the end, and
+statements whose specialised output differs from the generic output are
+listed so layout changes can be reviewed.
+"""
+import asyncio
+import glob
+import os
+import sys
+import time
+sys.path.append(os.getcwd())
+
+from backend.app.services.pdf_parser import parse_cam_pdf
+from backend.app.services.pdf_text import first_page_text
+from backend.app.services.statement_formats import GENERIC, detect_format, format_benchmarks
+
+REPEAT = 3
+
+
+def parse(path, password, backend, statement_type):
+    stats = {}
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        items = asyncio.run(parse_cam_pdf(path, password, workers=1, resolve_names=False,
+                                          backend=backend, statement_type=statement_type, stats=stats))
+    return items, (time.perf_counter() - start) / REPEAT, stats
+
+
+def item_totals(items):
+    holdings = [i for i in items if i.get("type") == "holding"]
+    return len(holdings), round(sum(i["current_value"] for i in holdings), 2)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    password = backend = None
+    for flag in ("--password", "--backend"):
+        if flag in args:
+            i = args.index(flag)
+            if flag == "--password":
+                password = args[i + 1]
+            else:
+                backend = args[i + 1]
+            args = args[:i] + args[i + 2:]
+    paths = []
+    for arg in args:
+        paths.extend(sorted(glob.glob(os.path.join(arg, "*.pdf"))) if os.path.isdir(arg) else [arg])
+    if not paths:
+        print(__doc__)
+        sys.exit(1)
+
+    print(f"{'PDF':<28} {'format':>14} {'pages':>6} {'format (s)':>11} {'generic (s)':>12} {'holdings':>9} {'value':>14}")
+    for path in paths:
+        fmt = detect_format(first_page_text(path, password))
+        items, elapsed, stats = parse(path, password, backend, fmt.name)
+        generic_items, generic_elapsed, _ = parse(path, password, backend, GENERIC)
+        count, value = item_totals(items)
+        print(f"{os.path.basename(path):<28} {fmt.name:>14} {stats['pages']:>6} {elapsed:>11.3f} "
+              f"{generic_elapsed:>12.3f} {count:>9} {value:>14,.2f}")
+        if fmt.name != GENERIC and items != generic_items:
+            print(f"    differs from generic: {len(items)} items vs {len(generic_items)} "
+                  f"(generic holdings/value: {item_totals(generic_items)})")
+
+    print()
+    print(f"{'format':>14} {'statements':>11} {'pages':>7} {'pages/sec':>10}")
+    for name, bench in format_benchmarks().items():
+        if bench["statements"]:
+            print(f"{name:>14} {bench['statements']:>11} {bench['pages']:>7} {bench['pages_per_sec']:>10.1f}")
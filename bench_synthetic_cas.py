@@ -0,0 +1,76 @@
+"""
+Benchmark: CAS parser latency, throughput and peak memory on synthetic statements.
+
+Usage:
+    python bench_synthetic_cas.py [--pages 2,10,50,100,250,500] [--password PW] [--backend pdfium] [--workers N]
+
+Statements are written by synthetic_cas.py (fixed seed, so runs are
+comparable). Each size is parsed in a fresh subprocess so ru_maxrss reflects
+one parse only, and the parsed items must equal the generator's ground truth:
+a size that parses fast but wrong fails the run.
+"""
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.getcwd())
+
+from synthetic_cas import generate_cas, synthetic_statement
+
+DEFAULT_PAGES = (2, 10, 50, 100, 250, 500)
+SEED = 7
+
+
+def child(path, pages, password, backend, workers):
+    from backend.app.services.pdf_parser import parse_cam_pdf
+
+    start = time.perf_counter()
+    items = asyncio.run(parse_cam_pdf(path, password, workers=workers, resolve_names=False, backend=backend))
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    _, truth = synthetic_statement(pages, seed=SEED)
+    print(f"{elapsed:.3f} {peak_kb} {len(items)} {int(items == truth)}")
+
+
+def option(args, name, default=None):
+    if name not in args:
+        return args, default
+    i = args.index(name)
+    return args[:i] + args[i + 2:], args[i + 1]
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "--child":
+        path, pages, password, backend, workers = args[1:6]
+        child(path, int(pages), password or None, backend or None, int(workers) if workers else None)
+        sys.exit(0)
+
+    args, sizes = option(args, "--pages")
+    args, password = option(args, "--password", "")
+    args, backend = option(args, "--backend", "")
+    args, workers = option(args, "--workers", "1")
+    if args:
+        print(__doc__)
+        sys.exit(1)
+    sizes = [int(s) for s in sizes.split(",")] if sizes else DEFAULT_PAGES
+
+    failed = False
+    print(f"{'target':>6} {'pages':>6} {'items':>6} {'time (s)':>9} {'pages/sec':>10} {'peak RSS (MB)':>14} {'correct':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for target in sizes:
+            path = os.path.join(tmp, f"cas_{target}.pdf")
+            pages, truth = generate_cas(path, pages=target, password=password or None, seed=SEED)
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", path, str(target), password, backend, workers],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            elapsed, peak_kb, count, correct = out.split()
+            elapsed = float(elapsed)
+            failed |= correct != "1"
+            print(f"{target:>6} {pages:>6} {count:>6} {elapsed:>9.2f} {pages / elapsed:>10.1f} "
+                  f"{int(peak_kb) / 1024:>14.1f} {'yes' if correct == '1' else 'NO':>8}")
+    sys.exit(1 if failed else 0)
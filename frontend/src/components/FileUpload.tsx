@@ -6,7 +6,7 @@ import { useRouter } from 'next/navigation';
 import { useSession } from "next-auth/react";
 
 export default function FileUpload() {
-    const [file, setFile] = useState<File | null>(null);
+    const [files, setFiles] = useState<File[]>([]);
     const [password, setPassword] = useState('');
     const [isLoading, setIsLoading] = useState(false);
     const [error, setError] = useState('');
@@ -14,15 +14,15 @@ export default function FileUpload() {
     const { data: session } = useSession();
 
     const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
-        if (e.target.files && e.target.files[0]) {
-            setFile(e.target.files[0]);
+        if (e.target.files && e.target.files.length > 0) {
+            setFiles(Array.from(e.target.files));
             setError('');
         }
     };
 
     const handleSubmit = async (e: React.FormEvent) => {
         e.preventDefault();
-        if (!file) {
+        if (files.length === 0) {
             setError('Please select a file');
             return;
         }
@@ -36,7 +36,8 @@ export default function FileUpload() {
         setError('');
 
         const formData = new FormData();
-        formData.append('file', file);
+        // Several statements (e.g. CAMS + KFintech) are merged into one portfolio
+        files.forEach((f) => formData.append('files', f));
         if (password) {
             formData.append('password', password);
         }
@@ -101,6 +102,7 @@ export default function FileUpload() {
                                         name="file-upload"
                                         type="file"
                                         accept=".pdf,.xls,.xlsx"
+                                        multiple
                                         className="sr-only"
                                         onChange={handleFileChange}
                                     />
@@ -108,7 +110,7 @@ export default function FileUpload() {
                                 <p className="pl-1">or drag and drop</p>
                             </div>
                             <p className="text-xs text-gray-500">
-                                {file ? file.name : "PDF or Excel files up to 10MB"}
+                                {files.length > 0 ? files.map((f) => f.name).join(', ') : "PDF or Excel files up to 10MB"}
                             </p>
                         </div>
                     </div>
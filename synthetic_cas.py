@@ -0,0 +1,277 @@
+"""
+Synthetic CAS (Consolidated Account Statement) generator.
+
+Writes realistic CAMS-style detailed statements as PDFs, with no third-party
+dependencies (a minimal PDF writer with the standard Helvetica font and
+optional 128-bit RC4 password protection), and returns the items
+parse_cam_pdf(..., resolve_names=False) must produce for it.
+
+Statements are configurable: folios, schemes per folio, years of monthly
+SIPs, occasional redemptions, stamp-duty rows, fund names that wrap onto a
+"(Demat)" / "(Non-Demat)" line, and single-line headers.
+
+Usage:
+    python synthetic_cas.py out.pdf [--pages 50] [--folios 3] [--schemes 2] [--years 5] [--password PW] [--seed 1]
+"""
+import hashlib
+import os
+import random
+import sys
+import zlib
+from datetime import date
+
+LINES_PER_PAGE = 64
+FONT_SIZE = 7
+LINE_HEIGHT = 11.5
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+
+AMCS = (
+    ("HDFC", "INF179K", "H"), ("ICICI Prudential", "INF109K", "P"), ("Axis", "INF846K", "A"),
+    ("Kotak", "INF174K", "K"), ("Nippon India", "INF204K", "R"), ("Parag Parikh", "INF879O", "PP"),
+    ("Motilal Oswal", "INF247L", "M"), ("Aditya Birla Sun Life", "INF209K", "B"),
+)
+STRATEGIES = (
+    "Flexi Cap Fund", "Midcap Fund", "Small Cap Fund", "Nifty 50 Index Fund", "Large Cap Fund",
+    "Balanced Advantage Fund", "Banking and PSU Debt Fund", "Liquid Fund", "ELSS Tax Saver Fund",
+    "Multi Asset Allocation Fund", "Gilt Fund", "Arbitrage Fund",
+)
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+STATEMENT_DATE = date(2026, 1, 29)
+
+
+def _fmt_date(d: date) -> str:
+    return f"{d.day:02d}-{MONTHS[d.month - 1]}-{d.year}"
+
+
+def _money(x: float) -> str:
+    return f"{x:,.2f}"
+
+
+def _isin(prefix: str, rng: random.Random) -> str:
+    chars = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return prefix + "".join(rng.choice(chars) for _ in range(4)) + str(rng.randint(0, 9))
+
+
+def _scheme(rng: random.Random) -> dict:
+    amc, prefix, code_prefix = rng.choice(AMCS)
+    name = f"{amc} {rng.choice(STRATEGIES)} - Direct Plan - Growth"
+    code = code_prefix + "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(5 - len(code_prefix)))
+    return {"code": code, "name": f"{code}-{name}", "isin": _isin(prefix, rng),
+            "nav": round(rng.uniform(10, 600), 4), "demat": rng.random() < 0.5}
+
+
+def _scheme_block(scheme: dict, folio: str, years: int, rng: random.Random):
+    """Statement lines for one scheme in one folio, and the items they must parse to."""
+    lines, items = [], []
+    suffix = "(Demat)" if scheme["demat"] else "(Non-Demat)"
+    isin = scheme["isin"]
+    if rng.random() < 0.5:
+        # Name wrapped onto a second line that starts with the Demat marker
+        lines.append(scheme["name"])
+        lines.append(f"{suffix} ISIN: {isin}")
+    else:
+        lines.append(f"{scheme['name']} ISIN: {isin} {suffix}")
+    lines.append("Opening Unit Balance: 0.000")
+
+    def tx(d, text, amount, units, nav, balance):
+        line = f"{_fmt_date(d)} {text} {_money(abs(amount))} {units:,.3f} {nav:.4f} {balance:,.3f}"
+        lines.append(line)
+        units_signed = float(f"{units:.3f}") * (1 if amount < 0 else -1)
+        items.append({"date": _fmt_date(d), "description": scheme["name"], "isin": isin, "folio": folio,
+                      "amount": amount, "type": "transaction", "raw_desc": line,
+                      "units": units_signed, "nav": float(f"{nav:.4f}"), "unit_balance": float(f"{balance:.3f}")})
+
+    sip = rng.choice((1000, 2500, 5000, 10000))
+    day = rng.randint(1, 28)
+    start_year = STATEMENT_DATE.year - years
+    units = cost = 0.0
+    nav = scheme["nav"] / (1.12 ** years)
+    for m in range(years * 12):
+        year, month = start_year + (STATEMENT_DATE.month - 1 + m) // 12, (STATEMENT_DATE.month - 1 + m) % 12 + 1
+        d = date(year, month, day)
+        nav *= 1 + rng.uniform(-0.03, 0.05)
+        bought = round(sip / nav, 3)
+        units += bought
+        cost += sip
+        tx(d, "Purchase - Systematic Investment", -float(sip), bought, nav, units)
+        lines.append(f"{_fmt_date(d)} *** Stamp Duty *** {sip * 0.00005:.2f}")
+        if m % 17 == 16:
+            amount = round(sip * 1.5, 2)
+            sold = round(amount / nav, 3)
+            units -= sold
+            cost *= max(0.0, 1 - sold / (units + sold))
+            tx(d, "Redemption", amount, sold, nav, units)
+
+    cost = round(cost, 2)
+    value = round(units * scheme["nav"], 2)
+    lines.append(f"Closing Unit Balance: {units:,.3f} NAV on {_fmt_date(STATEMENT_DATE)}: INR {scheme['nav']:.4f} "
+                 f"Total Cost Value: {_money(cost)} Market Value on {_fmt_date(STATEMENT_DATE)}: INR {_money(value)}")
+    items.append({"date": "Current", "description": scheme["name"], "isin": isin, "folio": folio,
+                  "amount": cost, "current_value": value, "type": "holding"})
+    return lines, items
+
+
+def synthetic_statement(pages: int = None, folios: int = None, schemes: int = 2, years: int = 5, seed: int = 1):
+    """
+    (pages_of_lines, items). With `pages`, folios are added until the
+    statement fills at least that many pages;
+    `folios` is then a minimum rather than the count (default 3 without `pages`).
+    """
+    if folios is None:
+        folios = 1 if pages else 3
+    rng = random.Random(seed)
+    lines, items = [], []
+    body_lines = LINES_PER_PAGE - 4  # Header and footer lines on every page
+    f = 0
+    while f < folios or (pages and len(lines) < (pages - 1) * body_lines + 1):
+        folio = f"{rng.randint(10_000_000, 99_999_999)} / {rng.randint(10, 99)}"
+        lines.append(f"Folio No: {folio} PAN: ABCDE1234F KYC: OK PAN: OK")
+        for _ in range(schemes):
+            block, block_items = _scheme_block(_scheme(rng), folio.replace(" ", ""), years, rng)
+            lines.extend(block)
+            items.extend(block_items)
+        f += 1
+
+    chunks = [lines[i:i + body_lines] for i in range(0, len(lines), body_lines)]
+    page_lines = []
+    for n, chunk in enumerate(chunks, 1):
+        header = ["Consolidated Account Statement",
+                  f"CAMS / KFINTECH 01-Jan-{STATEMENT_DATE.year - years} To {_fmt_date(STATEMENT_DATE)}"]
+        page_lines.append(header + chunk + ["", f"Page {n} of {len(chunks)}"])
+    return page_lines, items
+
+
+# --- Minimal PDF writer ---
+
+_PAD = bytes.fromhex("28BF4E5E4E758A4164004E56FFFA01082E2E00B6D0683E802F0CA9FE6453697A")
+
+
+def _rc4(key: bytes, data: bytes) -> bytes:
+    s = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + s[i] + key[i % len(key)]) & 0xFF
+        s[i], s[j] = s[j], s[i]
+    out = bytearray(len(data))
+    i = j = 0
+    for n, byte in enumerate(data):
+        i = (i + 1) & 0xFF
+        j = (j + s[i]) & 0xFF
+        s[i], s[j] = s[j], s[i]
+        out[n] = byte ^ s[(s[i] + s[j]) & 0xFF]
+    return bytes(out)
+
+
+class _Rc4Security:
+    """PDF standard security handler, revision 3 (128-bit RC4), same user and owner password."""
+    PERMISSIONS = -3904  # Print / copy allowed
+
+    def __init__(self, password: str, doc_id: bytes):
+        pw = (password.encode("latin-1") + _PAD)[:32]
+        # Algorithm 3: owner entry
+        key = hashlib.md5(pw).digest()
+        for _ in range(50):
+            key = hashlib.md5(key).digest()
+        owner = _rc4(key, pw)
+        for i in range(1, 20):
+            owner = _rc4(bytes(b ^ i for b in key), owner)
+        self.owner = owner
+        # Algorithm 2: file key
+        key = hashlib.md5(pw + owner + self.PERMISSIONS.to_bytes(4, "little", signed=True) + doc_id).digest()
+        for _ in range(50):
+            key = hashlib.md5(key).digest()
+        self.key = key
+        # Algorithm 5: user entry
+        user = _rc4(key, hashlib.md5(_PAD + doc_id).digest())
+        for i in range(1, 20):
+            user = _rc4(bytes(b ^ i for b in key), user)
+        self.user = user + bytes(16)
+
+    def encrypt(self, num: int, data: bytes) -> bytes:
+        obj_key = hashlib.md5(self.key + num.to_bytes(3, "little") + (0).to_bytes(2, "little")).digest()
+        return _rc4(obj_key[:16], data)
+
+    def dictionary(self) -> bytes:
+        return (b"<< /Filter /Standard /V 2 /R 3 /Length 128 /P %d /O <%s> /U <%s> >>"
+                % (self.PERMISSIONS, self.owner.hex().encode(), self.user.hex().encode()))
+
+
+def _escape(text: str) -> bytes:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace")
+
+
+def write_pdf(path: str, page_lines: list, password: str = None):
+    """Write one page per list of text lines (Helvetica, top to bottom)."""
+    doc_id = hashlib.md5(f"{path}{len(page_lines)}".encode()).digest()
+    security = _Rc4Security(password, doc_id) if password else None
+    objects = {}  # num -> bytes body (without "obj" wrapper)
+    page_nums = []
+    num = 4  # 1 catalog, 2 pages, 3 font
+    for lines in page_lines:
+        ops = [b"BT /F1 %d Tf" % FONT_SIZE]
+        y = PAGE_HEIGHT - 30
+        for line in lines:
+            if line:
+                ops.append(b"1 0 0 1 20 %.1f Tm (%s) Tj" % (y, _escape(line)))
+            y -= LINE_HEIGHT
+        ops.append(b"ET")
+        stream = zlib.compress(b"\n".join(ops))
+        content_num, page_num = num, num + 1
+        num += 2
+        if security:
+            stream = security.encrypt(content_num, stream)
+        objects[content_num] = b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream)
+        objects[page_num] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                             b"/Resources << /Font << /F1 3 0 R >> >> >>" % (PAGE_WIDTH, PAGE_HEIGHT, content_num))
+        page_nums.append(page_num)
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % n for n in page_nums), len(page_nums))
+    objects[3] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    encrypt_num = None
+    if security:
+        encrypt_num = num
+        objects[encrypt_num] = security.dictionary()
+        num += 1
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for n in sorted(objects):
+        offsets[n] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (n, objects[n])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % num
+    for n in range(1, num):
+        out += b"%010d 00000 n \n" % offsets[n]
+    trailer = b"<< /Size %d /Root 1 0 R /ID [<%s> <%s>]" % (num, doc_id.hex().encode(), doc_id.hex().encode())
+    if encrypt_num:
+        trailer += b" /Encrypt %d 0 R" % encrypt_num
+    out += b"trailer\n%s >>\nstartxref\n%d\n%%%%EOF\n" % (trailer, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_cas(path: str, pages: int = None, folios: int = None, schemes: int = 2, years: int = 5,
+                 password: str = None, seed: int = 1):
+    """Write a synthetic statement to `path`; returns (page_count, ground-truth items)."""
+    page_lines, items = synthetic_statement(pages, folios, schemes, years, seed)
+    write_pdf(path, page_lines, password)
+    return len(page_lines), items
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    path, options = args[0], dict(zip(args[1::2], args[2::2]))
+    count, items = generate_cas(
+        path,
+        pages=int(options["--pages"]) if "--pages" in options else None,
+        folios=int(options["--folios"]) if "--folios" in options else None,
+        schemes=int(options.get("--schemes", 2)),
+        years=int(options.get("--years", 5)),
+        password=options.get("--password"),
+        seed=int(options.get("--seed", 1)),
+    )
+    print(f"Wrote {os.path.abspath(path)}: {count} pages, {len(items)} items")